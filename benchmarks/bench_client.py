@@ -0,0 +1,44 @@
+"""
+Compares the per-push latency of ntfy_lite.push (one new connection
+per notification) with the one of ntfy_lite.NtfyClient.push (pooled
+keep-alive connections), against a local stub server.
+
+    python benchmarks/bench_client.py [number of pushes]
+"""
+
+import sys
+import time
+import statistics
+import typing
+import ntfy_lite as ntfy
+from ntfy_lite.testing import NtfyStubServer
+
+
+def _measure(
+    push: typing.Callable[..., None], url: str, nb_pushes: int
+) -> typing.List[float]:
+    durations = []
+    for index in range(nb_pushes):
+        start = time.perf_counter()
+        push("benchmark", "benchmark", message=f"message {index}", url=url)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def _report(label: str, durations: typing.List[float]) -> None:
+    durations = sorted(durations)
+    p50 = statistics.median(durations) * 1e3
+    p99 = durations[int(0.99 * (len(durations) - 1))] * 1e3
+    print(f"{label:<20} p50: {p50:.3f} ms  p99: {p99:.3f} ms")
+
+
+def run(nb_pushes: int = 500) -> None:
+    with NtfyStubServer(max_stored=0) as server:
+        url = server.url
+        _report("push", _measure(ntfy.push, url, nb_pushes))
+        with ntfy.NtfyClient(url=url) as client:
+            _report("NtfyClient.push", _measure(client.push, url, nb_pushes))
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
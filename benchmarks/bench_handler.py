@@ -0,0 +1,45 @@
+"""
+Measures the CPU cost of NtfyHandler.emit per record, compared to calling
+push with the arguments corresponding to the logging level of the record
+(i.e. rebuilding and validating the headers for each record).
+Notifications are not sent (DryRun.on).
+
+    python benchmarks/bench_handler.py [number of records]
+"""
+
+import sys
+import time
+import logging
+import ntfy_lite as ntfy
+
+
+def run(nb_records: int = 20000) -> None:
+    records = [
+        logging.LogRecord("benchmark", level, "", -1, f"message {index}", None, None)
+        for index, level in enumerate([logging.INFO, logging.WARNING] * nb_records)
+    ][:nb_records]
+
+    start = time.process_time()
+    for record in records:
+        ntfy.push(
+            "benchmark",
+            record.name,
+            message=record.msg,
+            priority=ntfy.level2priority[record.levelno],
+            tags=ntfy.level2tags.get(record.levelno, tuple()),
+            dry_run=ntfy.DryRun.on,
+        )
+    per_push = (time.process_time() - start) / nb_records
+
+    handler = ntfy.NtfyHandler("benchmark", dry_run=ntfy.DryRun.on)
+    start = time.process_time()
+    for record in records:
+        handler.emit(record)
+    per_emit = (time.process_time() - start) / nb_records
+
+    print(f"push (per record headers)  {per_push * 1e6:8.2f} us / record")
+    print(f"NtfyHandler.emit           {per_emit * 1e6:8.2f} us / record")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
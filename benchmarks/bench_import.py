@@ -0,0 +1,62 @@
+"""
+Measures the duration of 'import ntfy_lite' (in a fresh interpreter,
+minus the startup duration of the interpreter), and checks that
+the modules which are slow to import are not imported.
+
+    python benchmarks/bench_import.py [number of runs]
+"""
+
+import sys
+import time
+import statistics
+import subprocess
+
+# modules which should be imported only when used: the slow imports,
+# and the optional features (see ntfy_lite/__init__.py)
+_lazy = (
+    "requests",
+    "validators",
+    "asyncio",
+    "aiohttp",
+    "importlib.metadata",
+    "mmap",
+    "multiprocessing",
+    "concurrent.futures",
+    "ntfy_lite.multiprocess",
+    "ntfy_lite.fanout",
+    "ntfy_lite.batch",
+    "ntfy_lite.template",
+    "ntfy_lite.metrics",
+    "ntfy_lite.async_client",
+    "ntfy_lite.subscription",
+)
+
+
+def duration(code: str, runs: int) -> float:
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def run(runs: int = 20) -> None:
+    startup = duration("pass", runs)
+    imported = duration("import ntfy_lite", runs)
+    print(f"import ntfy_lite: {(imported - startup) * 1e3:.1f} ms (median of {runs})")
+
+    check = (
+        "import sys, ntfy_lite; "
+        f"print(' '.join(m for m in {_lazy!r} if m in sys.modules))"
+    )
+    eager = subprocess.run(
+        [sys.executable, "-c", check], check=True, capture_output=True, text=True
+    ).stdout.strip()
+    if eager:
+        print(f"modules imported eagerly: {eager}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
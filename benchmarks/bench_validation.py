@@ -0,0 +1,62 @@
+"""
+Measures the per-push cost of the validation of the click, attach
+and icon URLs (and of the URLs of the actions), with and without the
+memoization of the validation results, and with pre-validated URLs.
+Notifications are not sent (DryRun.on).
+
+    python benchmarks/bench_validation.py [number of pushes]
+"""
+
+import sys
+import time
+import typing
+import ntfy_lite as ntfy
+from ntfy_lite import utils
+
+_click = "https://github.com/MPI-IS/ntfy_lite"
+_icon = "https://ntfy.sh/static/images/favicon.ico"
+_attach = "https://ntfy.sh/static/images/ntfy.png"
+
+
+def _measure(nb_pushes: int, urls: typing.Sequence[str]) -> float:
+    click, icon, attach = urls
+    start = time.perf_counter()
+    for _ in range(nb_pushes):
+        ntfy.push(
+            "benchmark",
+            "benchmark",
+            message="message",
+            click=click,
+            icon=icon,
+            attach=attach,
+            actions=ntfy.ViewAction("open", click),
+            dry_run=ntfy.DryRun.on,
+        )
+    return (time.perf_counter() - start) / nb_pushes
+
+
+def run(nb_pushes: int = 10000) -> None:
+    urls = (_click, _icon, _attach)
+
+    # no memoization: using the undecorated validation function
+    original = utils._is_url
+    uncached = original.__wrapped__  # type: ignore
+    utils._is_url = uncached  # type: ignore
+    try:
+        no_cache = _measure(nb_pushes, urls)
+    finally:
+        utils._is_url = original
+
+    ntfy.clear_url_cache()
+    cached = _measure(nb_pushes, urls)
+    info = ntfy.url_cache_info()
+
+    validated = _measure(nb_pushes, [ntfy.ValidatedUrl(url) for url in urls])
+
+    print(f"no memoization     {no_cache * 1e6:8.2f} us / push")
+    print(f"memoization        {cached * 1e6:8.2f} us / push  ({info})")
+    print(f"pre-validated urls {validated * 1e6:8.2f} us / push")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
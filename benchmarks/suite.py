@@ -0,0 +1,168 @@
+"""
+Benchmark suite of ntfy_lite, run against a local stub server
+(see ntfy_lite.testing), so that it requires no network access.
+
+Measured:
+
+- push: pushes per second, p50 and p99 latencies, for notifications
+  with a message, with a file attachment and with actions (with and
+  without a NtfyClient)
+- NtfyHandler.emit: cost per record, for records resulting in a notification
+  and for records suppressed as duplicates
+- import ntfy_lite: duration
+
+The results are printed as JSON, and optionally written to a file. If a
+baseline file (results of a previous run) is passed, the relative change
+of each metric is printed as well.
+
+    python benchmarks/suite.py [--pushes N] [--output results.json] [--baseline previous.json]
+"""
+
+import json
+import time
+import typing
+import logging
+import platform
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+import ntfy_lite as ntfy
+from ntfy_lite.testing import NtfyStubServer
+from bench_import import duration
+
+_Results = typing.Dict[str, typing.Dict[str, float]]
+
+
+def _summary(durations: typing.List[float]) -> typing.Dict[str, float]:
+    durations = sorted(durations)
+    return {
+        "per_second": len(durations) / sum(durations),
+        "p50_ms": statistics.median(durations) * 1e3,
+        "p99_ms": durations[int(0.99 * (len(durations) - 1))] * 1e3,
+    }
+
+
+def _latencies(push: typing.Callable[[int], None], nb: int) -> typing.Dict[str, float]:
+    # a few warmup pushes (e.g. for opening connections)
+    for index in range(min(nb, 10)):
+        push(index)
+    durations = []
+    for index in range(nb):
+        start = time.perf_counter()
+        push(index)
+        durations.append(time.perf_counter() - start)
+    return _summary(durations)
+
+
+def _push_benchmarks(url: str, nb: int, tmp: Path) -> _Results:
+    attachment = tmp / "attachment.txt"
+    with open(attachment, "wb") as f:
+        f.write(b"log line\n" * 8192)
+    actions = [
+        ntfy.ViewAction("open website", "https://ntfy.sh"),
+        ntfy.HttpAction(
+            "close door",
+            "https://api.example.com/door",
+            method=ntfy.HttpMethod.POST,
+            headers={"Authorization": "Bearer token"},
+            body='{"action": "close"}',
+        ),
+    ]
+    results: _Results = {}
+    results["push_message"] = _latencies(
+        lambda i: ntfy.push("benchmark", "title", message=f"message {i}", url=url), nb
+    )
+    with ntfy.NtfyClient(url=url) as client:
+        results["client_push_message"] = _latencies(
+            lambda i: client.push("benchmark", "title", message=f"message {i}"), nb
+        )
+        results["client_push_attachment"] = _latencies(
+            lambda i: client.push("benchmark", "title", filepath=attachment), nb
+        )
+        results["client_push_actions"] = _latencies(
+            lambda i: client.push(
+                "benchmark", "title", message=f"message {i}", actions=actions
+            ),
+            nb,
+        )
+    return results
+
+
+def _emit_cost(
+    handler: logging.Handler, records: typing.List[logging.LogRecord]
+) -> float:
+    start = time.perf_counter()
+    for record in records:
+        handler.emit(record)
+    return (time.perf_counter() - start) / len(records) * 1e6
+
+
+def _handler_benchmarks(url: str, nb: int) -> _Results:
+    records = [
+        logging.LogRecord("benchmark", logging.INFO, "", -1, f"message {i}", None, None)
+        for i in range(nb)
+    ]
+    duplicates = [
+        logging.LogRecord("benchmark", logging.INFO, "", -1, "message", None, None)
+        for _ in range(nb * 10)
+    ]
+    with ntfy.NtfyClient(url=url) as client:
+        handler = ntfy.NtfyHandler(
+            "benchmark", client=client, deduplication=ntfy.Deduplication()
+        )
+        emitted = _emit_cost(handler, records)
+        # the first record is emitted, all the other ones suppressed
+        suppressed = _emit_cost(handler, duplicates)
+    return {
+        "handler_emit": {"us_per_record": emitted},
+        "handler_emit_suppressed": {"us_per_record": suppressed},
+    }
+
+
+def _compare(results: _Results, baseline: _Results) -> None:
+    for benchmark, metrics in results.items():
+        for metric, value in metrics.items():
+            try:
+                previous = baseline[benchmark][metric]
+            except KeyError:
+                continue
+            change = (value - previous) / previous * 100 if previous else 0.0
+            print(
+                f"{benchmark}.{metric}: {previous:.3f} -> {value:.3f} ({change:+.1f}%)"
+            )
+
+
+def run(
+    nb: int, output: typing.Optional[Path], baseline: typing.Optional[Path]
+) -> None:
+    results: _Results = {}
+    with NtfyStubServer(max_stored=0) as server, tempfile.TemporaryDirectory() as tmp:
+        results.update(_push_benchmarks(server.url, nb, Path(tmp)))
+        results.update(_handler_benchmarks(server.url, nb))
+    startup = duration("pass", 10)
+    results["import"] = {"ms": (duration("import ntfy_lite", 10) - startup) * 1e3}
+
+    report = {
+        "ntfy_lite": ntfy.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+    if baseline is not None:
+        with open(baseline) as f:
+            _compare(results, json.load(f)["results"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ntfy_lite benchmark suite")
+    parser.add_argument("--pushes", type=int, default=500)
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None)
+    args = parser.parse_args()
+    run(args.pushes, args.output, args.baseline)
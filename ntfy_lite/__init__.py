@@ -1,8 +1,73 @@
 # flake8: noqa
 
+import typing
+
 from .ntfy2logging import LoggingLevel, Priority, level2priority
 from .defaults import level2tags
 from .handler import NtfyHandler
+from .background import Overflow
+from .coalesce import Coalescing
+from .dedup import Deduplication
+from .throttle import Throttling, ThrottlingStats
+from .spool import Spool
 from .actions import Action, HttpMethod, HttpAction, ViewAction
 from .ntfy import DryRun, push
-from .version import __version__
+from .tail import Tail
+from .size import MessageSize, Oversize
+from .utils import ValidatedUrl, url_cache_info, clear_url_cache
+from .client import NtfyClient
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy, RetryStats
+from .profiling import Profiler, StageStats, CallProfile
+
+if typing.TYPE_CHECKING:
+    from .multiprocess import NtfyQueueHandler, NtfyQueueListener
+    from .fanout import PushResult, push_many
+    from .batch import Notification, push_batch
+    from .template import NotificationTemplate
+    from .metrics import Metrics, MetricsSnapshot, HistogramSnapshot
+    from .async_client import AsyncNtfyClient, async_push
+    from .subscription import ReceivedMessage, subscribe, async_subscribe
+
+# the optional features, imported only when used (so that importing
+# ntfy_lite remains fast): attribute -> module defining it
+_lazy = {
+    "NtfyQueueHandler": "multiprocess",
+    "NtfyQueueListener": "multiprocess",
+    "PushResult": "fanout",
+    "push_many": "fanout",
+    "Notification": "batch",
+    "push_batch": "batch",
+    "NotificationTemplate": "template",
+    "Metrics": "metrics",
+    "MetricsSnapshot": "metrics",
+    "HistogramSnapshot": "metrics",
+    "AsyncNtfyClient": "async_client",
+    "async_push": "async_client",
+    "ReceivedMessage": "subscription",
+    "subscribe": "subscription",
+    "async_subscribe": "subscription",
+}
+
+
+def __getattr__(name: str):
+    # __version__ is looked up only when requested (see version.py)
+    if name == "__version__":
+        from . import version
+
+        return version.__version__
+    import importlib
+
+    if name in _lazy:
+        value = getattr(importlib.import_module(f".{_lazy[name]}", __name__), name)
+        # (__getattr__ is not called again for this name)
+        globals()[name] = value
+        return value
+    if name in _lazy.values():
+        # e.g. ntfy_lite.subscription, before it is imported
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> typing.List[str]:
+    return sorted(set(globals()) | set(_lazy))
@@ -15,6 +15,9 @@ class Action:
 
     See: [ntfy button action documentation](https://ntfy.sh/docs/publish/#action-buttons)
 
+    The serialized form of an action (see __str__) is computed once,
+    and computed again only if an attribute is set.
+
     Args:
       action: name of the action (e.g. 'view', 'http')
       label: description of the action
@@ -22,6 +25,10 @@ class Action:
       clear: if true, the notification is deleted upon click
     """
 
+    __slots__ = ("action", "label", "url", "clear", "_serialized")
+
+    _serialized: typing.Optional[str]
+
     def __init__(self, action: str, label: str, url: str, clear: bool = False):
         validate_url("Action.url", url)
 
@@ -33,6 +40,22 @@ class Action:
         else:
             self.clear = "false"
 
+    def _json(self) -> typing.Dict[str, typing.Any]:
+        # representation of the action in JSON publishing
+        # (see https://ntfy.sh/docs/publish/#publish-as-json)
+        return {
+            "action": self.action,
+            "label": self.label,
+            "url": self.url,
+            "clear": self.clear == "true",
+        }
+
+    def __setattr__(self, name: str, value: typing.Any) -> None:
+        object.__setattr__(self, name, value)
+        if name != "_serialized":
+            # the serialized form is outdated
+            object.__setattr__(self, "_serialized", None)
+
     def _str(self, attrs: typing.Tuple[str, ...]) -> str:
         values = {attr: getattr(self, attr) for attr in attrs}
         return ", ".join(
@@ -40,6 +63,17 @@ class Action:
             + [f"{attr}={value}" for attr, value in values.items() if value is not None]
         )
 
+    def _serialize(self) -> str:
+        # (extended by the subclasses with further attributes)
+        return self._str(("label", "url", "clear"))
+
+    def __str__(self) -> str:
+        serialized = self._serialized
+        if serialized is None:
+            serialized = self._serialize()
+            self._serialized = serialized
+        return serialized
+
 
 class ViewAction(Action):
     """
@@ -48,13 +82,11 @@ class ViewAction(Action):
     For arguments: see documentation of the [ntfy_lite.actions.Action][] superclass
     """
 
+    __slots__ = ()
+
     def __init__(self, label: str, url: str, clear: bool = False) -> None:
         super().__init__("view", label, url, clear)
 
-    def __str__(self) -> str:
-        _attrs = ("label", "url", "clear")
-        return self._str(_attrs)
-
 
 class HttpMethod(Enum):
     """
@@ -83,10 +115,13 @@ class HttpAction(Action):
       clear: if the ntfy notification should be cleared after the request succeeds
       method: GET, POST or PUT
       headers: HTTP headers to be passed in the request
+        (modifying the mapping once the action is serialized has no effect)
       body: HTTP body
 
     """
 
+    __slots__ = ("method", "headers", "body")
+
     def __init__(
         self,
         label: str,
@@ -101,7 +136,16 @@ class HttpAction(Action):
         self.headers = headers
         self.body = body
 
-    def __str__(self) -> str:
+    def _json(self) -> typing.Dict[str, typing.Any]:
+        values = super()._json()
+        values["method"] = HttpMethod(self.method).name
+        if self.headers:
+            values["headers"] = dict(self.headers)
+        if self.body is not None:
+            values["body"] = self.body
+        return values
+
+    def _serialize(self) -> str:
         _attrs = ("label", "url", "clear", "method", "body")
         main = self._str(_attrs)
         if not self.headers:
@@ -0,0 +1,280 @@
+"""
+Module defining the async_push function and the AsyncNtfyClient class,
+i.e. the asyncio counterparts of [ntfy_lite.ntfy.push][] and
+[ntfy_lite.client.NtfyClient][].
+
+This module requires [aiohttp](https://docs.aiohttp.org), an optional
+dependency of ntfy_lite, which can be installed with the 'async' extra:
+
+```bash
+pip install ntfy_lite[async]
+```
+
+``` python
+# Basic usage
+
+import asyncio
+import ntfy_lite as ntfy
+
+async def main():
+    async with ntfy.AsyncNtfyClient(max_concurrency=20) as client:
+        await asyncio.gather(
+            *[
+                client.push("my topic", "my title", message=f"message {index}")
+                for index in range(100)
+            ]
+        )
+
+asyncio.run(main())
+```
+"""
+
+import types
+import typing
+from pathlib import Path
+from .ntfy2logging import Priority
+from .actions import Action
+from .ntfy import DryRun, _headers, _validate_data
+from .error import NtfyError
+from .tail import Tail, _read_tail
+
+if typing.TYPE_CHECKING:
+    import asyncio
+    import aiohttp
+
+
+def _aiohttp() -> types.ModuleType:
+    # aiohttp is an optional dependency
+    try:
+        import aiohttp
+    except ImportError as e:
+        raise ImportError(
+            "the asyncio API of ntfy_lite requires aiohttp, "
+            "which can be installed with: pip install ntfy_lite[async]"
+        ) from e
+    return aiohttp
+
+
+def _read(filepath: Path, tail: typing.Optional[Tail]) -> bytes:
+    if tail is not None:
+        return _read_tail(filepath, tail)
+    with open(filepath, "rb") as f:
+        return f.read()
+
+
+class AsyncNtfyClient:
+    """
+    Pushes ntfy notifications from coroutines, reusing the HTTP connections
+    between pushes. Several notifications may be in flight at the same
+    time (up to max_concurrency).
+
+    The underlying aiohttp session is created at the first push, and
+    is bound to the running event loop.
+
+    Requires aiohttp, an optional dependency of ntfy_lite
+    (installed with the 'async' extra: `pip install ntfy_lite[async]`).
+
+    Args:
+      url: the ntfy server to which notifications are pushed, unless
+        another url is passed to the push method.
+      max_concurrency: maximal number of notifications in flight at the same time
+        (further pushes wait for a connection to be available).
+      timeout: timeout (in seconds) of each request. None: no timeout.
+    """
+
+    def __init__(
+        self,
+        url: str = "https://ntfy.sh",
+        max_concurrency: int = 10,
+        timeout: typing.Optional[float] = None,
+    ) -> None:
+        if max_concurrency < 1:
+            raise ValueError(
+                "AsyncNtfyClient: max_concurrency should be strictly positive "
+                f"(got {max_concurrency})"
+            )
+        # raising an ImportError early if aiohttp is not installed
+        _aiohttp()
+        self._url = url
+        self._max_concurrency = max_concurrency
+        self._timeout = timeout
+        self._session: typing.Optional["aiohttp.ClientSession"] = None
+        self._semaphore: typing.Optional["asyncio.Semaphore"] = None
+
+    @property
+    def url(self) -> str:
+        """
+        The default ntfy server of this client
+        """
+        return self._url
+
+    def _get_session(
+        self,
+    ) -> typing.Tuple["aiohttp.ClientSession", "asyncio.Semaphore"]:
+        # asyncio is imported only when used, as it is slow to import
+        import asyncio
+
+        if self._session is None or self._semaphore is None or self._session.closed:
+            aiohttp = _aiohttp()
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._max_concurrency),
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+            )
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        return self._session, self._semaphore
+
+    async def put(
+        self,
+        url: str,
+        data: typing.Union[str, bytes],
+        headers: typing.Mapping[str, str],
+    ) -> "aiohttp.ClientResponse":
+        """
+        Sends a PUT request over the pooled connections, and returns
+        the (fully read) response.
+
+        Args:
+          url: the full url (i.e. including the topic)
+          data: the body of the request
+          headers: the headers of the request
+        """
+        session, semaphore = self._get_session()
+        async with semaphore:
+            async with session.put(url, data=data, headers=headers) as response:
+                await response.read()
+                return response
+
+    async def push(
+        self,
+        topic: str,
+        title: str,
+        message: typing.Optional[str] = None,
+        priority: Priority = Priority.DEFAULT,
+        tags: typing.Union[str, typing.Iterable[str]] = [],
+        click: typing.Optional[str] = None,
+        email: typing.Optional[str] = None,
+        filepath: typing.Optional[Path] = None,
+        attach: typing.Optional[str] = None,
+        icon: typing.Optional[str] = None,
+        actions: typing.Union[Action, typing.Sequence[Action]] = [],
+        at: typing.Optional[str] = None,
+        url: typing.Optional[str] = None,
+        dry_run: DryRun = DryRun.off,
+        tail: typing.Optional[Tail] = None,
+    ) -> None:
+        """
+        Pushes a notification. Same as [ntfy_lite.async_client.async_push][],
+        except that the url argument defaults to the url of the client.
+        """
+        await async_push(
+            topic,
+            title,
+            message=message,
+            priority=priority,
+            tags=tags,
+            click=click,
+            email=email,
+            filepath=filepath,
+            attach=attach,
+            icon=icon,
+            actions=actions,
+            at=at,
+            url=url,
+            dry_run=dry_run,
+            client=self,
+            tail=tail,
+        )
+
+    async def close(self) -> None:
+        """
+        Closes all the connections kept alive by the client.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> "AsyncNtfyClient":
+        return self
+
+    async def __aexit__(self, _, __, ___) -> None:
+        await self.close()
+
+
+async def async_push(
+    topic: str,
+    title: str,
+    message: typing.Optional[str] = None,
+    priority: Priority = Priority.DEFAULT,
+    tags: typing.Union[str, typing.Iterable[str]] = [],
+    click: typing.Optional[str] = None,
+    email: typing.Optional[str] = None,
+    filepath: typing.Optional[Path] = None,
+    attach: typing.Optional[str] = None,
+    icon: typing.Optional[str] = None,
+    actions: typing.Union[Action, typing.Sequence[Action]] = [],
+    at: typing.Optional[str] = None,
+    url: typing.Optional[str] = None,
+    dry_run: DryRun = DryRun.off,
+    client: typing.Optional[AsyncNtfyClient] = None,
+    tail: typing.Optional[Tail] = None,
+) -> None:
+    """
+    Pushes a notification without blocking the event loop. The arguments
+    are the same as for [ntfy_lite.ntfy.push][].
+
+    ```python
+    import ntfy_lite as ntfy
+
+    await ntfy.async_push(
+        "my topic", "my title", priority=ntfy.Priority.DEFAULT, message="my message"
+    )
+    ```
+
+    File attachments are read in the default executor of the event loop.
+
+    Args:
+      client: if not None, the notification is sent over the pooled connections
+        of the client, otherwise a new connection is opened.
+      tail: if not None, only the end of the file (filepath argument) is attached,
+        see [ntfy_lite.tail.Tail][]
+    """
+
+    if url is None:
+        url = client.url if client is not None else "https://ntfy.sh"
+
+    # same checks as performed by the synchronous push
+    _validate_data(message, filepath)
+    headers = _headers(
+        title,
+        priority=priority,
+        tags=tags,
+        click=click,
+        email=email,
+        attach=attach,
+        icon=icon,
+        actions=actions,
+        at=at,
+    )
+
+    if dry_run == DryRun.error:
+        raise NtfyError(-1, "DryRun.error passed as argument")
+    if dry_run != DryRun.off:
+        return
+
+    data: bytes
+    if filepath is not None:
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(None, _read, filepath, tail)
+    elif message is not None:
+        # same encoding as the one used by requests for str bodies
+        data = message.encode(encoding="latin-1", errors="replace")
+
+    if client is not None:
+        response = await client.put(f"{url}/{topic}", data, headers)
+    else:
+        async with AsyncNtfyClient(url=url, max_concurrency=1) as one_shot:
+            response = await one_shot.put(f"{url}/{topic}", data, headers)
+    if not response.ok:
+        raise NtfyError(response.status, str(response.reason))
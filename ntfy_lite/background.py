@@ -0,0 +1,200 @@
+"""
+Module defining the Overflow enumeration and the (private) _BackgroundSender
+class, used by [ntfy_lite.handler.NtfyHandler][] to push notifications from
+background threads (see the 'queue_size' argument of the handler).
+"""
+
+import os
+import time
+import traceback
+import queue
+import typing
+import threading
+from enum import Enum, auto
+
+
+class Overflow(Enum):
+    """
+    What to do when a record is emitted while the queue of
+    an asynchronous [ntfy_lite.handler.NtfyHandler][] is full.
+
+    - 'block': the logging thread waits until there is room in the queue.
+
+    - 'drop_newest': the new record is dropped.
+
+    - 'drop_oldest': the oldest queued record is dropped to make room for the new one.
+    """
+
+    block = auto()
+    drop_newest = auto()
+    drop_oldest = auto()
+
+
+_T = typing.TypeVar("_T")
+
+# put in the queue to request a worker to exit
+_STOP = object()
+
+
+class _BackgroundSender(typing.Generic[_T]):
+    """
+    Bounded queue consumed by worker threads, each item of the
+    queue being passed to the 'send' function.
+
+    Args:
+      send: called by the workers on each queued item
+      queue_size: maximal number of items waiting in the queue
+      workers: number of worker threads
+      overflow: policy applied when an item is put while the queue is full
+      name: used to name the worker threads
+      dropped: if not None, called on the items which are dropped
+      waited: if not None, called on each item before it is sent, with the
+        duration (in seconds) it waited in the queue
+      failed: if not None, called on the items for which 'send' (or 'waited')
+        raised, within the except clause (e.g. so that logging.Handler.handleError
+        may report the exception). If None, the traceback is printed to stderr.
+        Either way, the worker goes on with the next items.
+    """
+
+    def __init__(
+        self,
+        send: typing.Callable[[_T], None],
+        queue_size: int,
+        workers: int,
+        overflow: Overflow,
+        name: str,
+        dropped: typing.Optional[typing.Callable[[_T], None]] = None,
+        waited: typing.Optional[typing.Callable[[_T, float], None]] = None,
+        failed: typing.Optional[typing.Callable[[_T], None]] = None,
+    ) -> None:
+        if queue_size < 1:
+            raise ValueError(
+                f"queue_size should be strictly positive (got {queue_size})"
+            )
+        if workers < 1:
+            raise ValueError(f"workers should be strictly positive (got {workers})")
+        self._send = send
+        self._overflow = overflow
+        self._queue_size = queue_size
+        self._workers = workers
+        self._name = name
+        self._dropped = dropped
+        self._waited = waited
+        self._failed = failed
+        self._closed = False
+        self.dropped = 0
+        """number of items dropped because the queue was full"""
+        self._start()
+
+    def _start(self) -> None:
+        self._pid = os.getpid()
+        self._queue: queue.Queue = queue.Queue(maxsize=self._queue_size)
+        self._threads = [
+            threading.Thread(
+                target=self._run, name=f"{self._name}-{index}", daemon=True
+            )
+            for index in range(self._workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _check_fork(self) -> None:
+        # the worker threads do not survive a fork, and the queue (and its locks)
+        # may have been copied in an inconsistent state: the child process starts
+        # its own queue and workers (the items queued before the fork are sent
+        # by the parent process)
+        if self._pid != os.getpid() and not self._closed:
+            self._start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                if self._waited is not None:
+                    item, queued = item
+                    self._waited(item, time.monotonic() - queued)
+                self._send(item)
+            except Exception:
+                # (the worker must survive, or the queue would fill up)
+                if self._failed is not None:
+                    self._failed(item)
+                else:
+                    traceback.print_exc()
+            finally:
+                self._queue.task_done()
+
+    def put(self, item: _T) -> bool:
+        """
+        Queues the item, applying the overflow policy if the queue is full.
+        Returns False if an item (the new one or the oldest one) was dropped.
+        """
+        self._check_fork()
+        if self._closed:
+            self._drop(item)
+            return False
+        # the items are queued with the time they are queued at, if needed
+        queued: typing.Any = item if self._waited is None else (item, time.monotonic())
+        if self._overflow == Overflow.block:
+            self._queue.put(queued)
+            return True
+        dropped = False
+        while True:
+            try:
+                self._queue.put_nowait(queued)
+                return not dropped
+            except queue.Full:
+                pass
+            dropped = True
+            if self._overflow == Overflow.drop_newest:
+                self._drop(item)
+                return False
+            try:
+                oldest = self._queue.get_nowait()
+                self._queue.task_done()
+            except queue.Empty:
+                continue
+            if oldest is _STOP:
+                # can not happen (items are not queued after close)
+                continue
+            self._drop(oldest if self._waited is None else oldest[0])
+
+    def _drop(self, item: _T) -> None:
+        self.dropped += 1
+        if self._dropped is not None:
+            self._dropped(item)
+
+    def flush(self, timeout: float) -> bool:
+        """
+        Waits (at most timeout seconds) for all the queued items
+        to be sent. Returns False if the timeout was reached.
+        """
+        self._check_fork()
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: float) -> bool:
+        """
+        Waits (at most timeout seconds) for the queued items
+        to be sent, then stops the workers. Items queued afterwards
+        are dropped. Returns False if the timeout was reached.
+        """
+        self._check_fork()
+        deadline = time.monotonic() + timeout
+        self._closed = True
+        flushed = self.flush(timeout)
+        for _ in self._threads:
+            try:
+                self._queue.put(_STOP, timeout=max(deadline - time.monotonic(), 0))
+            except queue.Full:
+                return False
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        return flushed
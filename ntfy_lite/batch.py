@@ -0,0 +1,150 @@
+"""
+Module defining the push_batch function, which pushes many notifications
+using the JSON publishing endpoint of ntfy
+(see [publish as JSON](https://ntfy.sh/docs/publish/#publish-as-json)).
+"""
+
+import json
+import typing
+from .ntfy2logging import Priority
+from .actions import Action
+from .utils import validate_url
+from .ntfy import DryRun, _publish_data
+from .fanout import PushResult, _push_all
+
+if typing.TYPE_CHECKING:
+    from .client import NtfyClient
+    from .ratelimit import RateLimiter
+    from .retry import RetryPolicy
+    from .metrics import Metrics
+
+
+class Notification(typing.NamedTuple):
+    """
+    A notification pushed by [ntfy_lite.batch.push_batch][].
+    For the attributes, see [ntfy_lite.ntfy.push][] (attach: URL
+    of a file hosted elsewhere, to be attached to the notification).
+
+    Unlike [ntfy_lite.ntfy.push][], the message is not restricted to
+    latin-1 characters, but files can not be attached (only URLs).
+    """
+
+    topic: str
+    title: str
+    message: str
+    priority: Priority = Priority.DEFAULT
+    tags: typing.Union[str, typing.Sequence[str]] = ()
+    click: typing.Optional[str] = None
+    email: typing.Optional[str] = None
+    attach: typing.Optional[str] = None
+    icon: typing.Optional[str] = None
+    actions: typing.Union[Action, typing.Sequence[Action]] = ()
+    at: typing.Optional[str] = None
+
+    def _json(self) -> bytes:
+        # the body of the request publishing the notification, raising
+        # a ValueError if click, attach or icon is not a valid url
+        for attr in ("click", "attach", "icon"):
+            validate_url(attr, getattr(self, attr))
+        values: typing.Dict[str, typing.Any] = {
+            "topic": self.topic,
+            "title": self.title,
+            "message": self.message,
+            "priority": int(self.priority.value),
+        }
+        optional = {
+            "click": self.click,
+            "email": self.email,
+            "attach": self.attach,
+            "icon": self.icon,
+            "delay": self.at,
+        }
+        values.update({key: value for key, value in optional.items() if value})
+        if self.tags:
+            tags = (self.tags,) if isinstance(self.tags, str) else self.tags
+            values["tags"] = [str(tag) for tag in tags]
+        if self.actions:
+            actions = (
+                [self.actions] if isinstance(self.actions, Action) else self.actions
+            )
+            values["actions"] = [action._json() for action in actions]
+        return json.dumps(values).encode("utf-8")
+
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def push_batch(
+    notifications: typing.Iterable[Notification],
+    url: typing.Optional[str] = None,
+    dry_run: DryRun = DryRun.off,
+    client: typing.Optional["NtfyClient"] = None,
+    rate_limiter: typing.Optional["RateLimiter"] = None,
+    retry: typing.Optional["RetryPolicy"] = None,
+    workers: int = 8,
+    metrics: typing.Optional["Metrics"] = None,
+) -> typing.List[PushResult]:
+    """
+    Pushes notifications, each serialized to JSON and sent to the
+    root of the ntfy server (rather than to {url}/{topic} with headers).
+    The notifications are sent concurrently by at most 'workers' threads,
+    sharing the kept-alive connections of a client.
+
+    ```python
+    import ntfy_lite as ntfy
+
+    results = ntfy.push_batch(
+        ntfy.Notification(f"host-{index}", "backup done", message=summary)
+        for index, summary in enumerate(summaries)
+    )
+    failed = [result for result in results if not result.ok]
+    ```
+
+    Args:
+      notifications: the notifications to push
+      url: ntfy server. If None, the url of the client (or https://ntfy.sh if no client is passed).
+      dry_run: for testing purposes, see [ntfy_lite.ntfy.DryRun][]
+      client: the client sending the notifications (see [ntfy_lite.client.NtfyClient][]).
+        If None, a client is created for the duration of the call.
+      rate_limiter: see [ntfy_lite.ntfy.push][]
+      retry: see [ntfy_lite.ntfy.push][]
+      workers: maximal number of notifications sent at the same time
+      metrics: see [ntfy_lite.ntfy.push][]
+
+    Returns:
+      The results of the pushes, in the order of the notifications.
+      A notification with invalid arguments (ValueError) is not pushed, and
+      reported as failed.
+    """
+    if workers < 1:
+        raise ValueError(
+            f"push_batch: workers should be strictly positive (got {workers})"
+        )
+    notifications = list(notifications)
+
+    def _push(
+        notification: Notification, client: typing.Optional["NtfyClient"], url: str
+    ) -> None:
+        _publish_data(
+            url,
+            notification.topic,
+            notification._json(),
+            _JSON_HEADERS,
+            notification.priority,
+            dry_run,
+            client,
+            rate_limiter,
+            retry,
+            path="",
+            metrics=metrics,
+        )
+
+    return _push_all(
+        notifications,
+        [notification.topic for notification in notifications],
+        _push,
+        url,
+        dry_run,
+        client,
+        workers,
+    )
@@ -0,0 +1,166 @@
+"""
+Module defining the NtfyClient class, which pushes notifications over
+a pool of keep-alive HTTP connections.
+
+``` python
+# Basic usage
+
+import ntfy_lite as ntfy
+
+with ntfy.NtfyClient(pool_size=4) as client:
+    client.push("my topic", "my title", message="my message")
+```
+"""
+
+import os
+import typing
+from pathlib import Path
+from .ntfy2logging import Priority
+from .actions import Action
+from .ntfy import DryRun, push
+from .tail import Tail
+from .size import MessageSize
+
+if typing.TYPE_CHECKING:
+    import requests
+    from .ratelimit import RateLimiter
+    from .retry import RetryPolicy
+    from .metrics import Metrics
+
+
+class NtfyClient:
+    """
+    Pushes ntfy notifications, reusing the HTTP connections between pushes
+    (i.e. the TCP connection, the TLS handshake and the DNS lookup
+    are not repeated for each notification).
+
+    An instance may be shared between threads (and remains usable in a forked
+    child process, which opens its own connections), and may be passed to
+    [ntfy_lite.ntfy.push][] and to [ntfy_lite.handler.NtfyHandler][]
+    via their 'client' argument.
+
+    Args:
+      url: the ntfy server to which notifications are pushed, unless
+        another url is passed to the push method.
+      pool_size: maximal number of connections kept alive per server
+      timeout: timeout (in seconds) of each request. None: no timeout.
+    """
+
+    def __init__(
+        self,
+        url: str = "https://ntfy.sh",
+        pool_size: int = 10,
+        timeout: typing.Optional[float] = None,
+    ) -> None:
+        if pool_size < 1:
+            raise ValueError(
+                f"NtfyClient: pool_size should be strictly positive (got {pool_size})"
+            )
+        self._url = url
+        self._timeout = timeout
+        self._pool_size = pool_size
+        self._session = self._new_session()
+        # see put
+        self._pid = os.getpid()
+
+    def _new_session(self) -> "requests.Session":
+        # imported here so that importing ntfy_lite remains fast
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self._pool_size, pool_maxsize=self._pool_size
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    @property
+    def url(self) -> str:
+        """
+        The default ntfy server of this client
+        """
+        return self._url
+
+    def put(
+        self,
+        url: str,
+        data: typing.Union[typing.IO, str, bytes],
+        headers: typing.Mapping[str, str],
+    ) -> "requests.Response":
+        """
+        Sends a PUT request over the pooled connections.
+
+        Args:
+          url: the full url (i.e. including the topic)
+          data: the body of the request
+          headers: the headers of the request
+        """
+        if self._pid != os.getpid():
+            # the process has been forked: the connections of the pool are
+            # shared with the parent process, and should not be used by the child
+            self._session = self._new_session()
+            self._pid = os.getpid()
+        return self._session.put(url, data=data, headers=headers, timeout=self._timeout)
+
+    def push(
+        self,
+        topic: str,
+        title: str,
+        message: typing.Optional[str] = None,
+        priority: Priority = Priority.DEFAULT,
+        tags: typing.Union[str, typing.Iterable[str]] = [],
+        click: typing.Optional[str] = None,
+        email: typing.Optional[str] = None,
+        filepath: typing.Optional[Path] = None,
+        attach: typing.Optional[str] = None,
+        icon: typing.Optional[str] = None,
+        actions: typing.Union[Action, typing.Sequence[Action]] = [],
+        at: typing.Optional[str] = None,
+        url: typing.Optional[str] = None,
+        dry_run: DryRun = DryRun.off,
+        rate_limiter: typing.Optional["RateLimiter"] = None,
+        retry: typing.Optional["RetryPolicy"] = None,
+        tail: typing.Optional[Tail] = None,
+        metrics: typing.Optional["Metrics"] = None,
+        size: typing.Optional[MessageSize] = None,
+    ) -> None:
+        """
+        Pushes a notification. Same as [ntfy_lite.ntfy.push][], except that
+        the url argument defaults to the url of the client.
+        """
+        push(
+            topic,
+            title,
+            message=message,
+            priority=priority,
+            tags=tags,
+            click=click,
+            email=email,
+            filepath=filepath,
+            attach=attach,
+            icon=icon,
+            actions=actions,
+            at=at,
+            url=url,
+            dry_run=dry_run,
+            client=self,
+            rate_limiter=rate_limiter,
+            retry=retry,
+            tail=tail,
+            metrics=metrics,
+            size=size,
+        )
+
+    def close(self) -> None:
+        """
+        Closes all the connections kept alive by the client.
+        """
+        self._session.close()
+
+    def __enter__(self) -> "NtfyClient":
+        return self
+
+    def __exit__(self, _, __, ___) -> None:
+        self.close()
@@ -0,0 +1,159 @@
+"""
+Module defining the Coalescing class, which configures the merging of records
+into digest notifications by [ntfy_lite.handler.NtfyHandler][]
+(see its 'coalescing' argument).
+"""
+
+import os
+import typing
+import threading
+from .record import _Record
+
+
+class Coalescing:
+    """
+    Configuration of the coalescing of records by [ntfy_lite.handler.NtfyHandler][].
+
+    Records emitted within the same time window are merged into a single digest
+    notification. A digest is pushed when the window (starting at its first record)
+    expires, or as soon as it merges max_records records or max_bytes characters
+    of messages, whichever comes first. A window containing a single record results
+    in the usual notification.
+
+    ```python
+    # at most one notification per level every 10 seconds
+    handler = ntfy.NtfyHandler(
+        "my_topic", coalescing=ntfy.Coalescing(window=10.0)
+    )
+    ```
+
+    Args:
+      window: duration (in seconds) of the time window
+      max_records: maximal number of records merged into a digest
+      max_bytes: maximal cumulated size of the messages merged into a digest
+      max_listed: number of records listed in the message of the digest,
+        the other ones being summarized as "N more suppressed"
+      per_level: if True, a digest is pushed for each logging level. If False, all the
+        records are merged into the same digest, which uses the highest level
+        (for the priority, tags, etc). Records of a level missing from the
+        level2priority argument of the handler are not merged.
+    """
+
+    def __init__(
+        self,
+        window: float = 5.0,
+        max_records: int = 100,
+        max_bytes: int = 4096,
+        max_listed: int = 5,
+        per_level: bool = True,
+    ) -> None:
+        if window <= 0:
+            raise ValueError(f"Coalescing: window should be positive (got {window})")
+        if max_records < 1:
+            raise ValueError(
+                f"Coalescing: max_records should be strictly positive (got {max_records})"
+            )
+        self.window = window
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.max_listed = max_listed
+        self.per_level = per_level
+
+
+class _Digest:
+    # records merged during a time window
+    def __init__(self) -> None:
+        self.listed: typing.List[_Record] = []
+        self.count = 0
+        self.size = 0
+        self.levelno = 0
+        self.timer: typing.Optional[threading.Timer] = None
+
+    def add(self, record: _Record, max_listed: int) -> None:
+        if len(self.listed) < max_listed:
+            self.listed.append(record)
+        self.count += 1
+        self.size += len(str(record.msg))
+        self.levelno = max(self.levelno, record.levelno)
+
+    def record(self) -> _Record:
+        first = self.listed[0]
+        if self.count == 1:
+            return first
+        lines = [f"{record.name}: {record.msg}" for record in self.listed]
+        suppressed = self.count - len(self.listed)
+        if suppressed:
+            lines.append(f"({suppressed} more suppressed)")
+        return _Record(
+            f"{first.name} ({self.count} records)", self.levelno, "\n".join(lines)
+        )
+
+
+class _Coalescer:
+    """
+    Merges the added records into digests, which are passed
+    to the send function (called either from the thread adding
+    the record which completes the digest, or from a timer thread).
+    """
+
+    def __init__(
+        self, coalescing: Coalescing, send: typing.Callable[[_Record], None]
+    ) -> None:
+        self._config = coalescing
+        self._send = send
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._digests: typing.Dict[typing.Optional[int], _Digest] = {}
+
+    def _check_fork(self) -> None:
+        # the timers do not survive a fork: the pending digests are sent by
+        # the parent process, the child process starts with none
+        if self._pid != os.getpid():
+            self._reset()
+
+    def add(self, record: _Record) -> None:
+        self._check_fork()
+        config = self._config
+        key = record.levelno if config.per_level else None
+        with self._lock:
+            try:
+                digest = self._digests[key]
+            except KeyError:
+                digest = _Digest()
+                digest.timer = threading.Timer(
+                    config.window, self._expire, args=(key, digest)
+                )
+                digest.timer.daemon = True
+                digest.timer.start()
+                self._digests[key] = digest
+            digest.add(record, config.max_listed)
+            if digest.count < config.max_records and digest.size < config.max_bytes:
+                return
+            del self._digests[key]
+        if digest.timer is not None:
+            digest.timer.cancel()
+        self._send(digest.record())
+
+    def _expire(self, key: typing.Optional[int], digest: _Digest) -> None:
+        with self._lock:
+            if self._digests.get(key) is not digest:
+                # already sent because full
+                return
+            del self._digests[key]
+        self._send(digest.record())
+
+    def flush(self) -> None:
+        """
+        Sends all the pending digests
+        """
+        self._check_fork()
+        with self._lock:
+            digests = list(self._digests.values())
+            self._digests.clear()
+        for digest in digests:
+            if digest.timer is not None:
+                digest.timer.cancel()
+            self._send(digest.record())
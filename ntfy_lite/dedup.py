@@ -0,0 +1,266 @@
+"""
+Module defining the Deduplication class, which configures the suppression
+of duplicated records by [ntfy_lite.handler.NtfyHandler][]
+(see its 'deduplication' argument).
+"""
+
+import os
+import time
+import zlib
+import struct
+import typing
+from pathlib import Path
+from collections import OrderedDict
+
+
+class Deduplication:
+    """
+    Configuration of the suppression of duplicated records by
+    [ntfy_lite.handler.NtfyHandler][].
+
+    Two records are duplicates if they have the same logger name, the same
+    level and the same message template (i.e. the message before formatting).
+    At most one notification is pushed per group of duplicates every ttl seconds.
+    The next notification pushed for a group mentions how many records have
+    been suppressed since the previous one.
+
+    At most max_size groups are tracked, the least recently seen ones
+    being forgotten first.
+
+    By default, the groups are tracked by each handler. If a path is passed,
+    the groups are tracked in a fixed size hash table, in a memory mapped file
+    shared by all the handlers (of all the processes of the host) using the same
+    path, e.g. so that the workers of a server, all logging the same error, push
+    a single notification. Checking a duplicate does not take any lock (nor system
+    call): concurrent processes may occasionally both push a notification, or miss
+    a suppressed record in their count. When the table is full, the groups which
+    expire first are forgotten first. The file should be on a local file system
+    (e.g. in /dev/shm on Linux), and used with the same max_size by all the handlers.
+
+    ```python
+    handler = ntfy.NtfyHandler(
+        "my_topic",
+        deduplication=ntfy.Deduplication(path=Path("/dev/shm/my_app.ntfy")),
+    )
+    ```
+
+    Args:
+      ttl: duration (in seconds) during which duplicates are suppressed
+      max_size: maximal number of tracked groups of duplicates
+      path: if not None, the groups are tracked in this (shared) file
+    """
+
+    def __init__(
+        self,
+        ttl: float = 60.0,
+        max_size: int = 1024,
+        path: typing.Optional[Path] = None,
+    ) -> None:
+        if max_size < 1:
+            raise ValueError(
+                f"Deduplication: max_size should be strictly positive (got {max_size})"
+            )
+        self.ttl = ttl
+        self.max_size = max_size
+        self.path = Path(path) if path is not None else None
+
+
+class _Entry:
+    __slots__ = ("expires", "suppressed")
+
+    def __init__(self, expires: float) -> None:
+        self.expires = expires
+        self.suppressed = 0
+
+
+def _fingerprint(name: str, levelno: int, msg: typing.Any) -> int:
+    try:
+        return hash((name, levelno, msg))
+    except TypeError:
+        # unhashable message
+        return hash((name, levelno, str(msg)))
+
+
+class _DedupCache:
+    """
+    Bounded LRU cache of the fingerprints of the recent records.
+    Not thread safe (used under the lock of the handler).
+    """
+
+    def __init__(self, deduplication: Deduplication) -> None:
+        self._ttl = deduplication.ttl
+        self._max_size = deduplication.max_size
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def check(self, name: str, levelno: int, msg: typing.Any) -> typing.Optional[int]:
+        """
+        Returns None if the record should be suppressed, otherwise the number
+        of duplicates suppressed since the last notification of the record.
+        """
+        key = _fingerprint(name, levelno, msg)
+        now = time.monotonic()
+        entries = self._entries
+        entry = entries.get(key)
+        if entry is None:
+            entries[key] = _Entry(now + self._ttl)
+            if len(entries) > self._max_size:
+                entries.popitem(last=False)
+            return 0
+        entries.move_to_end(key)
+        if now < entry.expires:
+            entry.suppressed += 1
+            return None
+        suppressed = entry.suppressed
+        entry.expires = now + self._ttl
+        entry.suppressed = 0
+        return suppressed
+
+    def forget(self, name: str, levelno: int, msg: typing.Any, suppressed: int) -> None:
+        """
+        Cancels the last call to check, which returned suppressed (the
+        record was not pushed): the next duplicate is not suppressed.
+        """
+        entry = self._entries.get(_fingerprint(name, levelno, msg))
+        if entry is not None:
+            entry.expires = 0.0
+            entry.suppressed = suppressed
+
+
+def _stable_fingerprint(name: str, levelno: int, msg: typing.Any) -> int:
+    # same value in all the processes (unlike hash), never 0 (empty slot)
+    data = f"{name}\0{levelno}\0{msg}".encode("utf-8", errors="replace")
+    return (zlib.crc32(data) << 32 | zlib.adler32(data)) or 1
+
+
+# header of the shared table: magic, number of buckets
+_HEADER = struct.Struct("<8sQ")
+_MAGIC = b"NTFYDDP1"
+# slot: fingerprint, expiry (time.time, as the file may persist across
+# reboots, which restart time.monotonic), number of suppressed duplicates
+_SLOT = struct.Struct("<QdQ")
+# the number of suppressed duplicates (last field of a slot)
+_SUPPRESSED = struct.Struct("<Q")
+# number of slots of a bucket (a fingerprint may be in any slot of its bucket)
+_BUCKET = 4
+_BUCKET_SLOTS = struct.Struct("<" + "QdQ" * _BUCKET)
+
+
+class _SharedDedupCache:
+    """
+    Fixed size hash table of the fingerprints of the recent records, in a
+    memory mapped file shared by processes. Duplicates are checked without lock.
+    When a record is not a duplicate, its bucket is locked (fcntl.lockf, if
+    available) while the fingerprint is written, so that only one of the processes
+    logging the record at the same time pushes it.
+    Not thread safe (used under the lock of the handler).
+    """
+
+    def __init__(self, deduplication: Deduplication) -> None:
+        # imported here so that importing ntfy_lite remains fast
+        import mmap
+
+        try:
+            import fcntl
+        except ImportError:
+            # (e.g. windows)
+            fcntl = None  # type: ignore
+        self._fcntl = fcntl
+        self._ttl = deduplication.ttl
+        self._buckets = -(-deduplication.max_size // _BUCKET)
+        size = _HEADER.size + self._buckets * _BUCKET_SLOTS.size
+        assert deduplication.path is not None
+        self._fd = os.open(deduplication.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self._lock(0, _HEADER.size)
+            try:
+                if os.fstat(self._fd).st_size == 0:
+                    os.ftruncate(self._fd, size)
+                    os.write(self._fd, _HEADER.pack(_MAGIC, self._buckets))
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                header = os.read(self._fd, _HEADER.size)
+                magic, buckets = _HEADER.unpack(header.ljust(_HEADER.size, b"\0"))
+            finally:
+                self._unlock(0, _HEADER.size)
+            if magic != _MAGIC or buckets != self._buckets:
+                raise ValueError(
+                    f"Deduplication: {deduplication.path} is not a deduplication "
+                    f"table of max_size {deduplication.max_size}"
+                )
+            self._map = mmap.mmap(self._fd, size)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    def _lock(self, offset: int, length: int) -> None:
+        if self._fcntl is not None:
+            self._fcntl.lockf(self._fd, self._fcntl.LOCK_EX, length, offset)
+
+    def _unlock(self, offset: int, length: int) -> None:
+        if self._fcntl is not None:
+            self._fcntl.lockf(self._fd, self._fcntl.LOCK_UN, length, offset)
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+    def __len__(self) -> int:
+        now = time.time()
+        return sum(
+            1
+            for fingerprint, expires, _ in _SLOT.iter_unpack(self._map[_HEADER.size :])
+            if fingerprint and expires > now
+        )
+
+    def _lookup(self, key: int, offset: int) -> typing.Tuple[bool, int, float, int]:
+        # (found, slot, expires, suppressed): the slot of the fingerprint
+        # in the bucket, or if not found the slot expiring first
+        values = _BUCKET_SLOTS.unpack_from(self._map, offset)
+        first = 0
+        for index in range(0, 3 * _BUCKET, 3):
+            if values[index] == key:
+                return True, offset + index * 8, values[index + 1], values[index + 2]
+            if values[index + 1] < values[first + 1]:
+                first = index
+        return False, offset + first * 8, values[first + 1], 0
+
+    def check(self, name: str, levelno: int, msg: typing.Any) -> typing.Optional[int]:
+        """
+        Returns None if the record should be suppressed, otherwise the number
+        of duplicates suppressed since the last notification of the record.
+        """
+        key = _stable_fingerprint(name, levelno, msg)
+        offset = _HEADER.size + (key % self._buckets) * _BUCKET_SLOTS.size
+        now = time.time()
+        found, slot, expires, suppressed = self._lookup(key, offset)
+        if found and now < expires:
+            _SUPPRESSED.pack_into(self._map, slot + 16, suppressed + 1)
+            return None
+        self._lock(offset, _BUCKET_SLOTS.size)
+        try:
+            # (another process may have written the fingerprint meanwhile)
+            found, slot, expires, suppressed = self._lookup(key, offset)
+            if found and now < expires:
+                _SUPPRESSED.pack_into(self._map, slot + 16, suppressed + 1)
+                return None
+            _SLOT.pack_into(self._map, slot, key, now + self._ttl, 0)
+            return suppressed
+        finally:
+            self._unlock(offset, _BUCKET_SLOTS.size)
+
+    def forget(self, name: str, levelno: int, msg: typing.Any, suppressed: int) -> None:
+        """
+        Cancels the last call to check, which returned suppressed (the
+        record was not pushed): the next duplicate is not suppressed.
+        """
+        key = _stable_fingerprint(name, levelno, msg)
+        offset = _HEADER.size + (key % self._buckets) * _BUCKET_SLOTS.size
+        self._lock(offset, _BUCKET_SLOTS.size)
+        try:
+            found, slot, _, _ = self._lookup(key, offset)
+            if found:
+                _SLOT.pack_into(self._map, slot, key, 0.0, suppressed)
+        finally:
+            self._unlock(offset, _BUCKET_SLOTS.size)
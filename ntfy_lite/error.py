@@ -13,3 +13,13 @@ class NtfyError(Exception):
 
     def __str__(self):
         return f"{self.status_code} ({self.reason})"
+
+
+class RateLimitError(NtfyError):
+    """
+    Error thrown when a notification could not be pushed within
+    the limits of a [ntfy_lite.ratelimit.RateLimiter][].
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(429, reason)
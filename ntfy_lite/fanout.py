@@ -0,0 +1,193 @@
+"""
+Module defining the push_many function, which pushes the same
+notification to several topics concurrently.
+"""
+
+import io
+import typing
+from pathlib import Path
+from .ntfy2logging import Priority
+from .actions import Action
+from .tail import Tail, _read_tail
+from .ntfy import DryRun, _headers, _validate_data, _publish_data
+
+if typing.TYPE_CHECKING:
+    from .client import NtfyClient
+    from .ratelimit import RateLimiter
+    from .retry import RetryPolicy
+    from .metrics import Metrics
+
+
+class PushResult(typing.NamedTuple):
+    """
+    Result of the push of a notification to a topic,
+    see [ntfy_lite.fanout.push_many][].
+    """
+
+    topic: str
+    """the topic"""
+
+    error: typing.Optional[Exception]
+    """None if the notification was pushed, the error raised otherwise"""
+
+    @property
+    def ok(self) -> bool:
+        """True if the notification was pushed"""
+        return self.error is None
+
+
+def push_many(
+    topics: typing.Iterable[str],
+    title: str,
+    message: typing.Optional[str] = None,
+    priority: Priority = Priority.DEFAULT,
+    tags: typing.Union[str, typing.Iterable[str]] = [],
+    click: typing.Optional[str] = None,
+    email: typing.Optional[str] = None,
+    filepath: typing.Optional[Path] = None,
+    attach: typing.Optional[str] = None,
+    icon: typing.Optional[str] = None,
+    actions: typing.Union[Action, typing.Sequence[Action]] = [],
+    at: typing.Optional[str] = None,
+    url: typing.Optional[str] = None,
+    dry_run: DryRun = DryRun.off,
+    client: typing.Optional["NtfyClient"] = None,
+    rate_limiter: typing.Optional["RateLimiter"] = None,
+    retry: typing.Optional["RetryPolicy"] = None,
+    tail: typing.Optional[Tail] = None,
+    workers: int = 8,
+    metrics: typing.Optional["Metrics"] = None,
+) -> typing.List[PushResult]:
+    """
+    Pushes the same notification to several topics.
+
+    The arguments are validated, and the headers and the data of the
+    notification built (and the file read), only once. The notification
+    is then pushed to the topics concurrently, by at most 'workers' threads.
+    The failure of a push does not prevent the other pushes.
+
+    ```python
+    import ntfy_lite as ntfy
+
+    results = ntfy.push_many(
+        ["team-a", "team-b", "on-call"], "disk full", message="/dev/sda1 at 100%"
+    )
+    for result in results:
+        if not result.ok:
+            print(f"failed to notify {result.topic}: {result.error}")
+    ```
+
+    The other arguments are the same as for [ntfy_lite.ntfy.push][], except that
+    if client is None, a client (see [ntfy_lite.client.NtfyClient][]) is created
+    for the duration of the call, so that the pushes share connections.
+
+    Args:
+      topics: the ntfy topics on which to publish
+      workers: maximal number of notifications sent at the same time
+
+    Returns:
+      The results of the pushes, in the order of the topics.
+      Errors raised by invalid arguments (ValueError, FileNotFoundError)
+      are raised before anything is pushed.
+    """
+    if workers < 1:
+        raise ValueError(
+            f"push_many: workers should be strictly positive (got {workers})"
+        )
+
+    topics = list(topics)
+    headers = _headers(
+        title,
+        priority=priority,
+        tags=tags,
+        click=click,
+        email=email,
+        attach=attach,
+        icon=icon,
+        actions=actions,
+        at=at,
+    )
+    _validate_data(message, filepath)
+    content: typing.Optional[bytes] = None
+    if filepath is not None:
+        # the file is read once, and the same bytes sent to all topics
+        if tail is not None:
+            content = _read_tail(filepath, tail)
+        else:
+            with open(filepath, "rb") as f:
+                content = f.read()
+    elif message is not None:
+        message = message.encode(encoding="latin-1", errors="replace").decode(
+            encoding="latin-1"
+        )
+
+    def _push(topic: str, client: typing.Optional["NtfyClient"], url: str) -> None:
+        # a file object per push (sharing the bytes), as the file is read
+        # while being sent
+        data: typing.Union[typing.IO, str] = (
+            io.BytesIO(content) if content is not None else typing.cast(str, message)
+        )
+        _publish_data(
+            url,
+            topic,
+            data,
+            headers,
+            priority,
+            dry_run,
+            client,
+            rate_limiter,
+            retry,
+            metrics=metrics,
+        )
+
+    return _push_all(topics, topics, _push, url, dry_run, client, workers)
+
+
+_T = typing.TypeVar("_T")
+
+
+def _push_all(
+    items: typing.Sequence[_T],
+    topics: typing.Sequence[str],
+    push: typing.Callable[[_T, typing.Optional["NtfyClient"], str], None],
+    url: typing.Optional[str],
+    dry_run: DryRun,
+    client: typing.Optional["NtfyClient"],
+    workers: int,
+) -> typing.List[PushResult]:
+    # calls push for each item, by at most 'workers' threads sharing
+    # the client (a client is created if None), and returns the results
+    # (the topic of each item, and the error raised by push, if any)
+
+    # imported here so that importing ntfy_lite remains fast
+    from concurrent.futures import ThreadPoolExecutor
+    from .client import NtfyClient
+
+    own_client = client is None and dry_run == DryRun.off
+    if own_client:
+        client = NtfyClient(
+            url=url or "https://ntfy.sh", pool_size=min(workers, max(len(items), 1))
+        )
+    if url is None:
+        url = client.url if client is not None else "https://ntfy.sh"
+
+    def _result(index: int) -> PushResult:
+        assert url is not None
+        try:
+            push(items[index], client, url)
+        except Exception as e:
+            # NtfyError, or e.g. a connection error raised by requests
+            return PushResult(topics[index], e)
+        return PushResult(topics[index], None)
+
+    try:
+        if len(items) <= 1 or workers == 1:
+            return [_result(index) for index in range(len(items))]
+        with ThreadPoolExecutor(
+            max_workers=min(workers, len(items)), thread_name_prefix="ntfy_lite"
+        ) as executor:
+            return list(executor.map(_result, range(len(items))))
+    finally:
+        if own_client:
+            assert client is not None
+            client.close()
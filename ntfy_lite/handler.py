@@ -28,7 +28,29 @@ import typing
 from pathlib import Path
 from .ntfy2logging import LoggingLevel, Priority, level2priority
 from .defaults import level2tags
-from .ntfy import DryRun, push
+from .ntfy import DryRun, _headers, _publish
+from .background import Overflow, _BackgroundSender
+from .coalesce import Coalescing, _Coalescer
+from .dedup import Deduplication, _DedupCache, _SharedDedupCache
+from .throttle import Throttling, ThrottlingStats, _Throttle
+from .record import _Record
+from .tail import Tail
+from .size import MessageSize
+from . import profiling
+from .spool import Spool, _SpoolFile, _transient
+
+if typing.TYPE_CHECKING:
+    from .client import NtfyClient
+    from .ratelimit import RateLimiter
+    from .retry import RetryPolicy
+    from .metrics import Metrics
+
+
+class _Level(typing.NamedTuple):
+    # what the notifications of a logging level have in common
+    headers: typing.Dict[str, str]
+    priority: Priority
+    filepath: typing.Optional[Path]
 
 
 class NtfyHandler(logging.Handler):
@@ -36,14 +58,27 @@ class NtfyHandler(logging.Handler):
     that pushes ntfy notifications.
 
     The notification title will be the record name, and the
-    notification message will be either the record message or a
+    notification message will be either the record message, formatted
+    by the formatter of the handler (see the setFormatter method), or a
     file attachment (depending on the level2filepath argument).
+
+    The deduplication and the throttling of the records are based on their
+    logger name, level and message template (i.e. the message before formatting):
+    only the records which are pushed are formatted.
+
+    By default, notifications are pushed synchronously, i.e. the thread
+    logging the record waits for the notification to be sent. If a
+    queue_size is passed, the handler runs in asynchronous mode: records
+    are queued and the notifications are pushed by background threads.
+
+    If coalescing is configured, records emitted within a time window are
+    merged into digest notifications (see [ntfy_lite.coalesce.Coalescing][]).
     """
 
     def __init__(
         self,
         topic: str,
-        url: str = "https://ntfy.sh",
+        url: typing.Optional[str] = None,
         twice_in_a_row: bool = True,
         error_callback: typing.Optional[
             typing.Callable[[Exception], typing.Any]
@@ -53,14 +88,30 @@ class NtfyHandler(logging.Handler):
         level2filepath: typing.Dict[LoggingLevel, Path] = {},
         level2email: typing.Dict[LoggingLevel, str] = {},
         dry_run: DryRun = DryRun.off,
+        client: typing.Optional["NtfyClient"] = None,
+        queue_size: typing.Optional[int] = None,
+        workers: int = 1,
+        overflow: Overflow = Overflow.block,
+        flush_timeout: float = 5.0,
+        coalescing: typing.Optional[Coalescing] = None,
+        rate_limiter: typing.Optional["RateLimiter"] = None,
+        retry: typing.Optional["RetryPolicy"] = None,
+        deduplication: typing.Optional[Deduplication] = None,
+        tail: typing.Optional[Tail] = None,
+        spool: typing.Optional[Spool] = None,
+        metrics: typing.Optional["Metrics"] = None,
+        size: typing.Optional[MessageSize] = None,
+        throttling: typing.Optional[Throttling] = None,
     ):
         """
         Args:
           topic: Topic on which the notifications will be pushed.
-          url: https://ntfy.sh by default.
-          twice_in_a_row: If False, if several similar records (similar: same name
+          url: If None (default), the url of the client, or https://ntfy.sh if no client is passed.
+          twice_in_a_row: If False, if several similar records (similar: same name, same level
             and same message) are emitted, only the first one will result in notification
             being pushed (to avoid the channel to reach the accepted limits of notifications).
+            Same as passing the default [ntfy_lite.dedup.Deduplication][] as deduplication
+            argument (i.e. similar records are suppressed for 60 seconds).
           error_callback: It will be called if a NtfyError is raised when pushing a notification.
           level2tags: mapping between logging level and tags to be associated with the notification
           level2priority: mapping between the logging level and the notification priority.
@@ -71,72 +122,290 @@ class NtfyHandler(logging.Handler):
             the ntfy notification will also request a mail to be sent.
           dry_run: For testing. If 'on', no notification will be sent. If 'error', no notification will be sent,
             instead a NtfyError are raised.
+          client: If not None, notifications are pushed over the pooled connections
+            of the client (see [ntfy_lite.client.NtfyClient][]). A client may be shared
+            by several handlers.
+          queue_size: If not None, the handler runs in asynchronous mode, i.e. emitted
+            records are put in a queue of this size, and the notifications are pushed by
+            background threads.
+          workers: Asynchronous mode only: number of background threads pushing the notifications.
+          overflow: Asynchronous mode only: what to do when a record is emitted while
+            the queue is full (see [ntfy_lite.background.Overflow][]).
+          flush_timeout: Asynchronous mode only: maximal duration (in seconds) the methods
+            flush and close wait for the queued records to be pushed.
+          coalescing: If not None, records emitted within a time window are merged
+            into a digest notification (see [ntfy_lite.coalesce.Coalescing][]).
+          rate_limiter: If not None, notifications are pushed within the limits of the
+            rate limiter (see [ntfy_lite.ratelimit.RateLimiter][]), which may be shared
+            with other handlers.
+          retry: If not None, pushes failing because of a transient error are attempted
+            again (see [ntfy_lite.retry.RetryPolicy][]).
+          deduplication: If not None, at most one notification is pushed per group of similar
+            records during a time window (see [ntfy_lite.dedup.Deduplication][]).
+          tail: If not None, only the end of the files of level2filepath is attached
+            (see [ntfy_lite.tail.Tail][]).
+          spool: If not None, the records which could not be pushed (or, in asynchronous mode,
+            which were dropped because the queue was full) are written to a spool file,
+            and pushed later on (see [ntfy_lite.spool.Spool][]). Spooled records are
+            not passed to handleError (but are passed to error_callback).
+          metrics: If not None, the records and notifications are counted, and the
+            pushes timed (see [ntfy_lite.metrics.Metrics][]).
+          size: If not None, the messages larger than the size limit are truncated
+            or attached (see [ntfy_lite.size.MessageSize][]).
+          throttling: If not None, the number of records pushed is limited per logger
+            and per level (see [ntfy_lite.throttle.Throttling][]). See the
+            throttling_stats method for the numbers of dropped records.
         """
         super().__init__()
         self._url = url
         self._topic = topic
-        self._last_messages: typing.Optional[typing.Dict[str, str]]
-        self._last_messages = None if twice_in_a_row else {}
-        self._level2tags = level2tags
-        self._level2priority = level2priority
-        self._level2filepath = level2filepath
-        self._level2email = level2email
+        if deduplication is None and not twice_in_a_row:
+            deduplication = Deduplication()
+        self._dedup: typing.Union[_DedupCache, _SharedDedupCache, None] = None
+        if deduplication is not None and deduplication.path is not None:
+            self._dedup = _SharedDedupCache(deduplication)
+        elif deduplication is not None:
+            self._dedup = _DedupCache(deduplication)
+        self._throttle: typing.Optional[_Throttle] = None
+        if throttling is not None:
+            self._throttle = _Throttle(throttling)
+        # the headers of the notifications depend only on the logging
+        # level (except for the title), so they are built once for all
+        self._levels: typing.Dict[int, _Level] = {
+            level: _Level(
+                _headers(
+                    "",
+                    priority=priority,
+                    tags=level2tags.get(level, tuple()),
+                    email=level2email.get(level),
+                ),
+                priority,
+                level2filepath.get(level),
+            )
+            for level, priority in level2priority.items()
+        }
         self._error_callback = error_callback
         self._dry_run = dry_run
+        self._client = client
+        self._rate_limiter = rate_limiter
+        self._retry = retry
+        self._tail = tail
+        self._metrics = metrics
+        self._size = size
+        self._flush_timeout = flush_timeout
+        self._spool: typing.Optional[_SpoolFile] = None
+        if spool is not None:
+            self._spool = _SpoolFile(spool, self._publish)
+        self._sender: typing.Optional[_BackgroundSender[_Record]] = None
+        if queue_size is not None:
+            self._sender = _BackgroundSender(
+                self._push,
+                queue_size,
+                workers,
+                overflow,
+                f"NtfyHandler-{topic}",
+                self._dropped if spool is not None or metrics is not None else None,
+                self._waited if metrics is not None else None,
+                self._failed,
+            )
+        self._coalescer: typing.Optional[_Coalescer] = None
+        if coalescing is not None:
+            self._coalescer = _Coalescer(coalescing, self._deliver)
 
         for logging_level in level2priority:
-            if logging_level not in self._level2priority:
+            if logging_level not in self._levels:
                 raise ValueError(
                     f"NtfyHandler, level2priority argument: missing mapping from "
                     f"logging level {logging_level} to ntfy priority level"
                 )
 
-    def _is_new_record(self, record: logging.LogRecord) -> bool:
-        if self._last_messages is None:
-            return True
+    def _publish(self, record: _Record) -> None:
+        # pushes the record, raising an exception upon failure
+        if profiling._active is None:
+            self._publish_record(record)
+            return
+        profiler = profiling._begin("push", self._topic)
+        try:
+            self._publish_record(record)
+        finally:
+            profiling._end(profiler)
+
+    def _publish_record(self, record: _Record) -> None:
+        level = self._levels[record.levelno]
+        headers = level.headers
+        if record.name:
+            headers = dict(headers)
+            headers["Title"] = record.name
+        _publish(
+            self._topic,
+            headers,
+            level.priority,
+            None if level.filepath is not None else record.msg,
+            level.filepath,
+            self._url,
+            self._dry_run,
+            self._client,
+            self._rate_limiter,
+            self._retry,
+            self._tail,
+            self._metrics,
+            self._size,
+        )
+
+    def _push(
+        self, record: _Record, original: typing.Optional[logging.LogRecord] = None
+    ) -> None:
         try:
-            previous_message = self._last_messages[record.name]
+            self._publish(record)
+        except Exception as e:
+            if self._error_callback is not None:
+                self._error_callback(e)
+            if self._spool is not None and _transient(e):
+                if self._spool.append(record):
+                    # will be pushed later on
+                    return
+            if original is None:
+                original = logging.makeLogRecord(record._asdict())
+            self.handleError(original)
+
+    def _priority(self, record: _Record) -> Priority:
+        try:
+            return self._levels[record.levelno].priority
         except KeyError:
-            self._last_messages[record.name] = record.msg
-            return True
-        if record.msg == previous_message:
-            return False
-        self._last_messages[record.name] = record.msg
-        return True
+            return Priority.DEFAULT
+
+    def _dropped(self, record: _Record) -> None:
+        # records dropped because the queue is full
+        if self._metrics is not None:
+            self._metrics.count("dropped", self._topic, self._priority(record))
+        if self._spool is not None:
+            self._spool.append(record)
+
+    def _waited(self, record: _Record, duration: float) -> None:
+        assert self._metrics is not None
+        self._metrics.queue_wait(self._topic, self._priority(record), duration)
+
+    def _failed(self, record: _Record) -> None:
+        # records whose push raised in a worker thread (despite _push
+        # catching the errors of the push, e.g. if the error callback raised)
+        self.handleError(logging.makeLogRecord(record._asdict()))
+
+    def _deliver(
+        self, record: _Record, original: typing.Optional[logging.LogRecord] = None
+    ) -> None:
+        if self._sender is not None:
+            self._sender.put(record)
+        else:
+            self._push(record, original)
 
     def emit(self, record: logging.LogRecord) -> None:
         """
-        Push the record as an ntfy message.
+        Push the record as an ntfy message (or, in asynchronous mode,
+        queue it for a background thread to push it).
         """
-        if self._last_messages and not self._is_new_record(record):
+        snapshot = _Record(record.name, record.levelno, record.msg)
+        if profiling._active is None:
+            self._handle(snapshot, record)
             return
+        profiler = profiling._begin("emit", self._topic)
         try:
-            filepath = self._level2filepath[record.levelno]
-            message = None
-        except KeyError:
-            filepath = None
-            message = record.msg
-        try:
-            email = self._level2email[record.levelno]
-        except KeyError:
-            email = None
-        try:
-            tags = self._level2tags[record.levelno]
-        except KeyError:
-            tags = tuple()
-        try:
-            push(
-                self._topic,
+            self._handle(snapshot, record)
+        finally:
+            profiling._end(profiler)
+
+    def _handle(
+        self,
+        record: _Record,
+        original: typing.Optional[logging.LogRecord] = None,
+    ) -> None:
+        # called with the lock of the handler held, either by emit or by a
+        # NtfyQueueListener (see ntfy_lite.multiprocess). original: the record
+        # to format (only if it is pushed)
+        throttle = self._throttle
+        if throttle is not None and not throttle.sample(record.levelno):
+            self._throttled(record)
+            return
+        suppressed: typing.Optional[int] = 0
+        if self._dedup is not None:
+            suppressed = self._dedup.check(record.name, record.levelno, record.msg)
+            if suppressed is None:
+                if self._metrics is not None:
+                    self._metrics.count(
+                        "deduplicated", self._topic, self._priority(record)
+                    )
+                return
+        if throttle is not None and not throttle.allow(record.name):
+            if self._dedup is not None and suppressed is not None:
+                # not pushed: its duplicates should not be suppressed
+                self._dedup.forget(record.name, record.levelno, record.msg, suppressed)
+            self._throttled(record)
+            return
+        # the record will be pushed: formatting it
+        level = self._levels.get(record.levelno)
+        if original is not None and (level is None or level.filepath is None):
+            try:
+                message = self.format(original)
+            except Exception:
+                self.handleError(original)
+                return
+            record = _Record(record.name, record.levelno, message)
+        if suppressed:
+            record = _Record(
                 record.name,
-                message=message,
-                priority=self._level2priority[record.levelno],
-                tags=tags,
-                email=email,
-                filepath=filepath,
-                url=self._url,
-                dry_run=self._dry_run,
+                record.levelno,
+                f"{record.msg}\n({suppressed} similar records suppressed)",
             )
-        except Exception as e:
-            if self._error_callback is not None:
-                self._error_callback(e)
-            self.handleError(record)
+        if self._coalescer is not None and level is not None:
+            self._coalescer.add(record)
+        else:
+            # (records of a level missing from level2priority are not coalesced:
+            # pushing them fails, which must not lose the records of a digest)
+            self._deliver(record, original)
+
+    def _throttled(self, record: _Record) -> None:
+        if self._metrics is not None:
+            self._metrics.count("throttled", self._topic, self._priority(record))
+
+    def throttling_stats(self) -> ThrottlingStats:
+        """
+        Returns the numbers of records dropped by the throttling
+        (see the 'throttling' argument), per logger name prefix and per level.
+        """
+        if self._throttle is None:
+            return ThrottlingStats({}, {})
+        self.acquire()
+        try:
+            return self._throttle.stats()
+        finally:
+            self.release()
+
+    def flush(self) -> None:
+        """
+        Pushes the pending digests (if coalescing), and in asynchronous mode
+        waits (at most flush_timeout seconds) for the queued records to be pushed.
+        """
+        if self._coalescer is not None:
+            self._coalescer.flush()
+        if self._sender is not None:
+            self._sender.flush(self._flush_timeout)
+
+    def close(self) -> None:
+        """
+        Pushes the pending digests (if coalescing), and in asynchronous mode
+        waits (at most flush_timeout seconds) for the queued records to be pushed,
+        then stops the background threads.
+        """
+        if self._coalescer is not None:
+            self._coalescer.flush()
+        if self._sender is not None:
+            self._sender.close(self._flush_timeout)
+        if self._spool is not None:
+            self._spool.close()
+        if isinstance(self._dedup, _SharedDedupCache):
+            self.acquire()
+            try:
+                self._dedup.close()
+                self._dedup = None
+            finally:
+                self.release()
+        super().close()
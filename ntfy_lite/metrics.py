@@ -0,0 +1,221 @@
+"""
+Module defining the Metrics class, which counts the notifications pushed
+(or not) by [ntfy_lite.ntfy.push][] and [ntfy_lite.handler.NtfyHandler][],
+and measures their latencies.
+
+``` python
+# Basic usage
+
+import ntfy_lite as ntfy
+
+metrics = ntfy.Metrics()
+
+ntfy.push("my topic", "my title", message="my message", metrics=metrics)
+
+handler = ntfy.NtfyHandler("my topic", metrics=metrics)
+
+snapshot = metrics.snapshot()
+print(snapshot.total("sent"), snapshot.latency.quantile(0.99))
+```
+"""
+
+import bisect
+import typing
+import threading
+from .ntfy2logging import Priority
+
+
+EVENTS = (
+    "sent",
+    "failed",
+    "retried",
+    "deduplicated",
+    "rate_limited",
+    "dropped",
+    "throttled",
+)
+"""
+The events counted by [ntfy_lite.metrics.Metrics][]:
+
+- sent: notification pushed
+- failed: notification which could not be pushed
+- retried: attempt beyond the first one (see [ntfy_lite.retry.RetryPolicy][])
+- deduplicated: record suppressed as duplicate (see [ntfy_lite.dedup.Deduplication][])
+- rate_limited: notification delayed or failed because of the rate limits (429 status
+  from the server, or see [ntfy_lite.ratelimit.RateLimiter][])
+- dropped: record dropped because the queue of an asynchronous handler was full
+- throttled: record dropped by the throttling of a handler (see [ntfy_lite.throttle.Throttling][])
+"""
+
+DEFAULT_BOUNDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""Default upper bounds (in seconds) of the buckets of the histograms"""
+
+
+class HistogramSnapshot(typing.NamedTuple):
+    """
+    State of a histogram of durations (see [ntfy_lite.metrics.Metrics][]).
+    """
+
+    bounds: typing.Tuple[float, ...]
+    """upper bounds (in seconds) of the buckets (the last bucket has no bound)"""
+
+    counts: typing.Tuple[int, ...]
+    """number of durations per bucket (one more bucket than bounds)"""
+
+    samples: int
+    """number of durations"""
+
+    sum: float
+    """sum of the durations (in seconds)"""
+
+    def quantile(self, q: float) -> float:
+        """
+        Returns an estimate of the quantile q (between 0 and 1) of
+        the durations, i.e. the upper bound of the bucket containing it
+        (or 'inf' if in the last bucket, or 0 if no durations).
+        """
+        if not self.samples:
+            return 0.0
+        rank = q * self.samples
+        cumulated = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulated += count
+            if cumulated >= rank:
+                return bound
+        return float("inf")
+
+
+class _Histogram:
+    # not thread safe (used under the lock of Metrics)
+    def __init__(self, bounds: typing.Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> HistogramSnapshot:
+        return HistogramSnapshot(self.bounds, tuple(self.counts), self.count, self.sum)
+
+
+class MetricsSnapshot(typing.NamedTuple):
+    """
+    State of a [ntfy_lite.metrics.Metrics][] instance.
+    """
+
+    counters: typing.Dict[typing.Tuple[str, str, str], int]
+    """number of events, per (event, topic, priority), see [ntfy_lite.metrics.EVENTS][]"""
+
+    latency: HistogramSnapshot
+    """durations of the pushes (including retries and waits for the rate limits)"""
+
+    queue_wait: HistogramSnapshot
+    """durations the records waited in the queue of asynchronous handlers"""
+
+    def total(
+        self,
+        event: str,
+        topic: typing.Optional[str] = None,
+        priority: typing.Optional[Priority] = None,
+    ) -> int:
+        """
+        Returns the number of events, for all topics (or for the topic, if not None)
+        and all priorities (or for the priority, if not None).
+        """
+        return sum(
+            count
+            for (e, t, p), count in self.counters.items()
+            if e == event
+            and (topic is None or t == topic)
+            and (priority is None or p == priority.name)
+        )
+
+
+Callback = typing.Callable[[str, str, Priority, float], typing.Any]
+"""
+Signature of the callback of [ntfy_lite.metrics.Metrics][]:
+callback(event, topic, priority, value), with event either one of
+[ntfy_lite.metrics.EVENTS][] (value: number of events), or 'latency'
+or 'queue_wait' (value: duration in seconds).
+"""
+
+
+class Metrics:
+    """
+    Counters and histograms of the pushes, to be passed to [ntfy_lite.ntfy.push][],
+    [ntfy_lite.handler.NtfyHandler][] (and the other push functions) via their
+    'metrics' argument. An instance may be shared by several handlers (and threads).
+
+    When no instance is passed, nothing is measured.
+
+    Args:
+      bounds: upper bounds (in seconds) of the buckets of the histograms
+      callback: if not None, called upon each event (e.g. to export the metrics
+        to a monitoring system), see [ntfy_lite.metrics.Callback][]. It is
+        called from the thread pushing the notification, and should be fast.
+    """
+
+    def __init__(
+        self,
+        bounds: typing.Sequence[float] = DEFAULT_BOUNDS,
+        callback: typing.Optional[Callback] = None,
+    ) -> None:
+        self._bounds = tuple(sorted(bounds))
+        self._callback = callback
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._counters: typing.Dict[typing.Tuple[str, str, str], int] = {}
+        self._latency = _Histogram(self._bounds)
+        self._queue_wait = _Histogram(self._bounds)
+
+    def count(self, event: str, topic: str, priority: Priority, value: int = 1) -> None:
+        """
+        Counts the event (see [ntfy_lite.metrics.EVENTS][]).
+        """
+        key = (event, topic, priority.name)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        if self._callback is not None:
+            self._callback(event, topic, priority, value)
+
+    def latency(self, topic: str, priority: Priority, duration: float) -> None:
+        """
+        Records the duration (in seconds) of a push.
+        """
+        with self._lock:
+            self._latency.observe(duration)
+        if self._callback is not None:
+            self._callback("latency", topic, priority, duration)
+
+    def queue_wait(self, topic: str, priority: Priority, duration: float) -> None:
+        """
+        Records the duration (in seconds) a record waited in a queue.
+        """
+        with self._lock:
+            self._queue_wait.observe(duration)
+        if self._callback is not None:
+            self._callback("queue_wait", topic, priority, duration)
+
+    def snapshot(self) -> MetricsSnapshot:
+        """
+        Returns the current state of the counters and histograms.
+        """
+        with self._lock:
+            return MetricsSnapshot(
+                dict(self._counters),
+                self._latency.snapshot(),
+                self._queue_wait.snapshot(),
+            )
+
+    def reset(self) -> None:
+        """
+        Resets the counters and histograms.
+        """
+        with self._lock:
+            self._reset()
@@ -0,0 +1,208 @@
+"""
+Module defining the NtfyQueueHandler and NtfyQueueListener classes, with
+which the records logged by several processes (e.g. the workers of a
+multiprocessing pool, of gunicorn or of Celery) are pushed by a single
+[ntfy_lite.handler.NtfyHandler][], running in the main process.
+
+The worker processes only send compact records (name, level, message
+template and arguments, rendered traceback, origin) over a multiprocessing
+queue. The main process owns the connections, the deduplication and the rate
+limiting, which are therefore shared by all the processes. It formats the
+records (with the formatter of its handler) only if they are pushed.
+
+``` python
+# Basic usage
+
+import logging
+import multiprocessing
+import ntfy_lite as ntfy
+
+
+def work(queue):
+    # in the worker process
+    logging.getLogger().addHandler(ntfy.NtfyQueueHandler(queue))
+    logging.error("something went wrong")
+
+
+handler = ntfy.NtfyHandler("my topic", deduplication=ntfy.Deduplication())
+with ntfy.NtfyQueueListener(handler) as listener:
+    processes = [
+        multiprocessing.Process(target=work, args=(listener.queue,)) for _ in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+```
+"""
+
+import logging
+import typing
+import threading
+from .record import _Record
+
+# the attributes of the records sent to the listener, besides the name,
+# the level and the message (e.g. for the formatter of the handler)
+_ATTRIBUTES = (
+    "exc_text",
+    "stack_info",
+    "created",
+    "msecs",
+    "relativeCreated",
+    "pathname",
+    "filename",
+    "module",
+    "lineno",
+    "funcName",
+    "process",
+    "processName",
+    "thread",
+    "threadName",
+)
+
+# the types of the message arguments sent as is (i.e. which can be pickled)
+_PICKLABLE = (str, int, float, bool, bytes, type(None))
+
+_formatter = logging.Formatter()
+
+if typing.TYPE_CHECKING:
+    from .handler import NtfyHandler
+
+
+class NtfyQueueHandler(logging.Handler):
+    """
+    Logging handler sending the records to a
+    [ntfy_lite.multiprocess.NtfyQueueListener][] (typically running
+    in another process), which pushes them.
+
+    Only the name, the level, the message template and its arguments, the
+    traceback (rendered by the formatter of this handler, if any) and the
+    origin (time, file, function, process and thread) of the records are sent.
+    The records are not formatted: the listener formats them, with the formatter
+    of its handler, only if they are pushed (e.g. not if suppressed by the
+    deduplication or the throttling). If an argument of the message is not of
+    a basic type (which may not be pickled), the message is rendered here.
+
+    Args:
+      queue: the queue of the listener (see [ntfy_lite.multiprocess.NtfyQueueListener][])
+      level: the level of the handler
+    """
+
+    def __init__(self, queue: typing.Any, level: int = logging.NOTSET) -> None:
+        super().__init__(level)
+        self._queue = queue
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """
+        Sends the record to the listener.
+        """
+        try:
+            msg = str(record.msg)
+            attributes = {attr: getattr(record, attr, None) for attr in _ATTRIBUTES}
+            if record.exc_info and not record.exc_text:
+                formatter = self.formatter or _formatter
+                attributes["exc_text"] = formatter.formatException(record.exc_info)
+            args = record.args
+            if args:
+                values = args.values() if isinstance(args, dict) else args
+                if all(type(value) in _PICKLABLE for value in values):
+                    attributes["args"] = args
+                else:
+                    attributes["msg"] = record.getMessage()
+            self._queue.put_nowait((record.name, record.levelno, msg, attributes))
+        except Exception:
+            # e.g. queue.Full
+            self.handleError(record)
+
+
+class NtfyQueueListener:
+    """
+    Pushes, from a background thread, the records sent by the instances
+    of [ntfy_lite.multiprocess.NtfyQueueHandler][] (possibly in other processes)
+    using the handler. Records with a level below the level of the handler, or
+    rejected by its filters, are ignored. The records are formatted by the
+    formatter of the handler, only if pushed (the attributes of the records which
+    are not sent by [ntfy_lite.multiprocess.NtfyQueueHandler][], e.g. 'extra'
+    attributes, are missing).
+
+    Args:
+      handler: pushes the records
+      queue: the queue the records are sent to. If None, a (unbounded)
+        multiprocessing.Queue. The queue (attribute 'queue') should be passed
+        to the worker processes (e.g. as argument of multiprocessing.Process,
+        or inherited when forking).
+    """
+
+    def __init__(self, handler: "NtfyHandler", queue: typing.Any = None) -> None:
+        if queue is None:
+            # imported here so that importing ntfy_lite remains fast
+            import multiprocessing
+
+            queue = multiprocessing.Queue()
+        self.queue = queue
+        self._handler = handler
+        self._thread: typing.Optional[threading.Thread] = None
+
+    def handler(self, level: int = logging.NOTSET) -> NtfyQueueHandler:
+        """
+        Returns a handler sending records to this listener.
+        """
+        return NtfyQueueHandler(self.queue, level)
+
+    def _run(self) -> None:
+        handler = self._handler
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            name, levelno, msg, attributes = item
+            if levelno < handler.level:
+                continue
+            # (formatted by the handler if pushed, passed to its filters
+            # and to handleError)
+            record = logging.makeLogRecord(
+                {
+                    "name": name,
+                    "levelno": levelno,
+                    "levelname": logging.getLevelName(levelno),
+                    "msg": msg,
+                    **attributes,
+                }
+            )
+            if not handler.filter(record):
+                continue
+            handler.acquire()
+            try:
+                handler._handle(_Record(name, levelno, msg), record)
+            except Exception:
+                # the listener keeps on pushing the next records
+                handler.handleError(record)
+            finally:
+                handler.release()
+
+    def start(self) -> None:
+        """
+        Starts pushing the received records (in a background thread).
+        """
+        self._thread = threading.Thread(
+            target=self._run, name="NtfyQueueListener", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Pushes the records received so far, then stops the background thread
+        and flushes the handler (see [ntfy_lite.handler.NtfyHandler.flush][]).
+        """
+        if self._thread is not None:
+            self.queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._handler.flush()
+
+    def __enter__(self) -> "NtfyQueueListener":
+        self.start()
+        return self
+
+    def __exit__(self, _, __, ___) -> None:
+        self.stop()
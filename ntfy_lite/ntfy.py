@@ -2,14 +2,52 @@
 Module defining the push method, which send a message or the content of a file to an NTFY channel.
 """
 
+import time
 import typing
-import requests
 from pathlib import Path
 from enum import Enum, auto
 from .ntfy2logging import Priority
 from .actions import Action
 from .utils import validate_url
-from .error import NtfyError
+from .error import NtfyError, RateLimitError
+from .tail import Tail, _open_tail
+from .size import MessageSize, _limit
+from . import profiling
+from .profiling import _start, _stage
+
+if typing.TYPE_CHECKING:
+    import requests
+    from .client import NtfyClient
+    from .ratelimit import RateLimiter
+    from .retry import RetryPolicy
+    from .metrics import Metrics
+
+
+def _validate_data(
+    message: typing.Optional[str], filepath: typing.Optional[Path]
+) -> None:
+    """
+    Raises a ValueError if not exactly one of message and filepath is
+    not None, and a FileNotFoundError if filepath does not exist.
+    """
+    # checking the user is at least pushing a message
+    # or a file attachment
+    if not any((message, filepath)):
+        raise ValueError(
+            "must push either a message or a filepath"
+            " (no message nor filepath argument specified)"
+        )
+
+    # checking the user is not pushing both a message
+    # and a file attachment
+    if all((message, filepath)):
+        raise ValueError("can not push a message and a filepath " "at the same time.")
+
+    # if pushing a file attachment, making
+    # sure the file exists
+    if filepath is not None:
+        if not filepath.is_file():
+            raise FileNotFoundError(f"failed to find file to attach ({filepath})")
 
 
 class _DataManager:
@@ -19,40 +57,38 @@ class _DataManager:
     An instance of _DataManager ensures that at least message or filepath is not None and
     that only either message or filepath is not None. The context manager
     returns either the message string or the opened file, and ensure the file is closed
-    (if data is a file).
+    (if data is a file). If tail is not None, the "file" is the in-memory copy of
+    the end of the file. If size is not None, a message larger than its limit is
+    truncated, or turned into an in-memory attachment named after filename.
     """
 
     def __init__(
-        self, message: typing.Optional[str], filepath: typing.Optional[Path]
+        self,
+        message: typing.Optional[str],
+        filepath: typing.Optional[Path],
+        tail: typing.Optional[Tail] = None,
+        size: typing.Optional[MessageSize] = None,
     ) -> None:
-        # checking the user is at least pushing a message
-        # or a file attachment
-        if not any((message, filepath)):
-            raise ValueError(
-                "must push either a message or a filepath"
-                " (no message nor filepath argument specified)"
-            )
-
-        # checking the user is not pushing both a message
-        # and a file attachment
-        if all((message, filepath)):
-            raise ValueError(
-                "can not push a message and a filepath " "at the same time."
-            )
-
-        # if pushing a file attachment, making
-        # sure the file exists
-        if filepath is not None:
-            if not filepath.is_file():
-                raise FileNotFoundError(f"failed to find file to attach ({filepath})")
+        _validate_data(message, filepath)
 
         # self._data is either a file to the filepath,
         # or the str corresponding to message
         self._data: typing.Union[typing.IO, str]
-        if filepath is not None:
+        self.filename: typing.Optional[str] = None
+        if filepath is not None and tail is not None:
+            self._data = _open_tail(filepath, tail)
+        elif filepath is not None:
             self._data = open(filepath, "rb")
         elif message is not None:
-            self._data = message.encode(encoding="latin-1", errors="replace").decode(encoding="latin-1")
+            # (the size is checked before the message is copied)
+            data: typing.Union[typing.IO, str] = message
+            if size is not None:
+                data, self.filename = _limit(message, size)
+            if isinstance(data, str) and not data.isascii():
+                data = data.encode(encoding="latin-1", errors="replace").decode(
+                    encoding="latin-1"
+                )
+            self._data = data
 
     def __enter__(self) -> typing.Union[typing.IO, str]:
         return self._data
@@ -80,6 +116,329 @@ class DryRun(Enum):
     error = auto()
 
 
+def _headers(
+    title: str,
+    priority: Priority = Priority.DEFAULT,
+    tags: typing.Union[str, typing.Iterable[str]] = [],
+    click: typing.Optional[str] = None,
+    email: typing.Optional[str] = None,
+    attach: typing.Optional[str] = None,
+    icon: typing.Optional[str] = None,
+    actions: typing.Union[Action, typing.Sequence[Action]] = [],
+    at: typing.Optional[str] = None,
+) -> typing.Dict[str, str]:
+    """
+    Returns the headers of the request publishing a notification
+    (see [ntfy_lite.ntfy.push][] for the arguments), raising a ValueError
+    if click, attach or icon is not a valid url.
+    """
+    start = _start()
+
+    # checking that arguments that are expected to be
+    # urls are urls
+    urls = {"click": click, "attach": attach, "icon": icon}
+    for attr, value in urls.items():
+        # throw value error if not None
+        # and not a url
+        validate_url(attr, value)
+    start = _stage("validate", start)
+
+    # some argument can be directly set in the
+    # headers dict
+    direct_mapping: typing.Dict[str, typing.Any] = {
+        "Title": title,
+        "At": at,
+        "Click": click,
+        "Email": email,
+        "Icon": icon,
+    }
+    headers = {key: value for key, value in direct_mapping.items() if value}
+
+    # adding priority
+    headers["Priority"] = priority.value
+
+    # adding tags
+    if tags:
+        if isinstance(tags, str):
+            tags = (tags,)
+        headers["Tags"] = ",".join([str(t) for t in tags])
+    start = _stage("headers", start)
+
+    # adding actions
+    if actions:
+        if isinstance(actions, Action):
+            actions = [actions]
+        headers["Actions"] = "; ".join([str(action) for action in actions])
+        _stage("actions", start)
+    return headers
+
+
+def _rewind(data: typing.Union[typing.IO, str, bytes]) -> None:
+    # a file attachment is read while being sent,
+    # and has to be rewound before being sent again
+    if not isinstance(data, (str, bytes)):
+        data.seek(0)
+
+
+def _put(
+    url: str,
+    path: str,
+    data: typing.Union[typing.IO, str, bytes],
+    headers: typing.Mapping[str, str],
+    client: typing.Optional["NtfyClient"],
+) -> "requests.Response":
+    if client is not None:
+        return client.put(f"{url}/{path}", data, headers)
+    # imported here rather than at the top of the module, so that
+    # importing ntfy_lite remains fast (requests is slow to import)
+    import requests
+
+    return requests.put(f"{url}/{path}", data=data, headers=headers)
+
+
+def _send(
+    url: str,
+    topic: str,
+    data: typing.Union[typing.IO, str, bytes],
+    headers: typing.Mapping[str, str],
+    priority: Priority,
+    client: typing.Optional["NtfyClient"],
+    rate_limiter: typing.Optional["RateLimiter"],
+    retry: typing.Optional["RetryPolicy"],
+    path: typing.Optional[str] = None,
+    metrics: typing.Optional["Metrics"] = None,
+) -> "requests.Response":
+    # sends the request (to {url}/{topic}, or to {url}/{path} if path is not None),
+    # complying with the rate limiter (if any) and attempting again upon
+    # transient failures (if a retry policy)
+    if path is None:
+        path = topic
+    if rate_limiter is None and retry is None:
+        return _put(url, path, data, headers, client)
+    start = time.monotonic()
+    deadline = rate_limiter.deadline() if rate_limiter is not None else start
+    attempt = 0
+    first_failure = start
+    while True:
+        if rate_limiter is not None:
+            try:
+                rate_limiter.acquire(url, topic, priority, deadline)
+            except RateLimitError:
+                if metrics is not None:
+                    metrics.count("rate_limited", topic, priority)
+                raise
+        error: typing.Optional[Exception] = None
+        try:
+            response = _put(url, path, data, headers, client)
+        except Exception as e:
+            if retry is None or not retry.retryable(e):
+                raise
+            error = e
+        if error is None:
+            if rate_limiter is not None and response.status_code == 429:
+                # pausing the server, the rate limiter
+                # waits for the end of the pause
+                rate_limiter.pause(url, response.headers.get("Retry-After"))
+                if metrics is not None:
+                    metrics.count("rate_limited", topic, priority)
+                if time.monotonic() >= deadline:
+                    break
+                _rewind(data)
+                continue
+            if retry is None or response.status_code not in retry.statuses:
+                break
+        # transient failure
+        assert retry is not None
+        now = time.monotonic()
+        if not attempt:
+            first_failure = now
+        delay = retry.delay(attempt, now - start)
+        if delay is None:
+            break
+        time.sleep(delay)
+        _rewind(data)
+        attempt += 1
+    if retry is not None and attempt:
+        retry.record(attempt, time.monotonic() - first_failure)
+        if metrics is not None:
+            metrics.count("retried", topic, priority, attempt)
+    if error is not None:
+        raise error
+    return response
+
+
+def _publish(
+    topic: str,
+    headers: typing.Mapping[str, str],
+    priority: Priority,
+    message: typing.Optional[str],
+    filepath: typing.Optional[Path],
+    url: typing.Optional[str],
+    dry_run: DryRun,
+    client: typing.Optional["NtfyClient"],
+    rate_limiter: typing.Optional["RateLimiter"],
+    retry: typing.Optional["RetryPolicy"],
+    tail: typing.Optional[Tail] = None,
+    metrics: typing.Optional["Metrics"] = None,
+    size: typing.Optional[MessageSize] = None,
+) -> None:
+    # pushes a notification whose headers have already been built
+    # (see _headers). Arguments: see push.
+
+    if url is None:
+        url = client.url if client is not None else "https://ntfy.sh"
+
+    # the message manager:
+    # - checks that either message or filepath is not None
+    # - if filepath is not None, data is a file to the path
+    # - else data is the UTF-8 conversion of message
+    # This context manager makes sure that data get closed
+    # (if a file)
+    start = _start()
+    manager = _DataManager(message, filepath, tail, size)
+    with manager as data:
+        if manager.filename is not None:
+            headers = {**headers, "Filename": manager.filename}
+        if start is not None:
+            _stage("data", start)
+        _publish_data(
+            url,
+            topic,
+            data,
+            headers,
+            priority,
+            dry_run,
+            client,
+            rate_limiter,
+            retry,
+            metrics=metrics,
+        )
+
+
+def _measured_send(
+    url: str,
+    topic: str,
+    data: typing.Union[typing.IO, str, bytes],
+    headers: typing.Mapping[str, str],
+    priority: Priority,
+    client: typing.Optional["NtfyClient"],
+    rate_limiter: typing.Optional["RateLimiter"],
+    retry: typing.Optional["RetryPolicy"],
+    path: typing.Optional[str],
+    metrics: "Metrics",
+) -> None:
+    # same as the sending part of _publish_data, updating the metrics
+    start = time.monotonic()
+    try:
+        response = _send(
+            url,
+            topic,
+            data,
+            headers,
+            priority,
+            client,
+            rate_limiter,
+            retry,
+            path,
+            metrics,
+        )
+    except Exception:
+        metrics.count("failed", topic, priority)
+        raise
+    finally:
+        metrics.latency(topic, priority, time.monotonic() - start)
+    if not response.ok:
+        if response.status_code == 429 and rate_limiter is None:
+            metrics.count("rate_limited", topic, priority)
+        metrics.count("failed", topic, priority)
+        raise NtfyError(response.status_code, response.reason)
+    metrics.count("sent", topic, priority)
+
+
+def _publish_data(
+    url: str,
+    topic: str,
+    data: typing.Union[typing.IO, str, bytes],
+    headers: typing.Mapping[str, str],
+    priority: Priority,
+    dry_run: DryRun,
+    client: typing.Optional["NtfyClient"],
+    rate_limiter: typing.Optional["RateLimiter"],
+    retry: typing.Optional["RetryPolicy"],
+    path: typing.Optional[str] = None,
+    metrics: typing.Optional["Metrics"] = None,
+) -> None:
+    # pushes data (see _DataManager), raising a NtfyError upon failure
+    if profiling._active is None:
+        _publish_request(
+            url,
+            topic,
+            data,
+            headers,
+            priority,
+            dry_run,
+            client,
+            rate_limiter,
+            retry,
+            path,
+            metrics,
+        )
+        return
+    start = _start()
+    try:
+        _publish_request(
+            url,
+            topic,
+            data,
+            headers,
+            priority,
+            dry_run,
+            client,
+            rate_limiter,
+            retry,
+            path,
+            metrics,
+        )
+    finally:
+        _stage("network", start)
+
+
+def _publish_request(
+    url: str,
+    topic: str,
+    data: typing.Union[typing.IO, str, bytes],
+    headers: typing.Mapping[str, str],
+    priority: Priority,
+    dry_run: DryRun,
+    client: typing.Optional["NtfyClient"],
+    rate_limiter: typing.Optional["RateLimiter"],
+    retry: typing.Optional["RetryPolicy"],
+    path: typing.Optional[str],
+    metrics: typing.Optional["Metrics"],
+) -> None:
+    if dry_run == DryRun.off and metrics is not None:
+        _measured_send(
+            url,
+            topic,
+            data,
+            headers,
+            priority,
+            client,
+            rate_limiter,
+            retry,
+            path,
+            metrics,
+        )
+    elif dry_run == DryRun.off:
+        response = _send(
+            url, topic, data, headers, priority, client, rate_limiter, retry, path
+        )
+        if not response.ok:
+            raise NtfyError(response.status_code, response.reason)
+    elif dry_run == DryRun.error:
+        raise NtfyError(-1, "DryRun.error passed as argument")
+
+
 def push(
     topic: str,
     title: str,
@@ -93,8 +452,14 @@ def push(
     icon: typing.Optional[str] = None,
     actions: typing.Union[Action, typing.Sequence[Action]] = [],
     at: typing.Optional[str] = None,
-    url: typing.Optional[str] = "https://ntfy.sh",
+    url: typing.Optional[str] = None,
     dry_run: DryRun = DryRun.off,
+    client: typing.Optional["NtfyClient"] = None,
+    rate_limiter: typing.Optional["RateLimiter"] = None,
+    retry: typing.Optional["RetryPolicy"] = None,
+    tail: typing.Optional[Tail] = None,
+    metrics: typing.Optional["Metrics"] = None,
+    size: typing.Optional[MessageSize] = None,
 ) -> None:
     """
     Pushes a notification.
@@ -126,55 +491,97 @@ def push(
         (i.e. a link to a website) or a [ntfy_lite.actions.HttpAction][]
         (i.e. sending of a HTTP GET, POST or PUT request to a website)
       at: to be used for delayed notification, see [scheduled delivery](https://ntfy.sh/docs/publish/#scheduled-delivery)
-      url: ntfy server
+      url: ntfy server. If None, the url of the client (or https://ntfy.sh if no client is passed).
       dry_run: for testing purposes, see [ntfy_lite.ntfy.DryRun][]
+      client: if not None, the notification is sent over the pooled connections
+        of the client (see [ntfy_lite.client.NtfyClient][]), otherwise a new
+        connection is opened.
+      rate_limiter: if not None, the notification is pushed within the limits
+        of the rate limiter (see [ntfy_lite.ratelimit.RateLimiter][]), which may
+        delay it. If the server replies that too many requests have been sent,
+        the notification is pushed again after the pause requested by the server.
+      retry: if not None, the push is attempted again if it fails because of a transient
+        error, see [ntfy_lite.retry.RetryPolicy][]
+      tail: if not None, only the end of the file (filepath argument) is attached,
+        see [ntfy_lite.tail.Tail][]
+      metrics: if not None, the push is counted and timed, see [ntfy_lite.metrics.Metrics][]
+      size: if not None, a message larger than the size limit is truncated or attached,
+        see [ntfy_lite.size.MessageSize][]
     """
 
-    # the message manager:
-    # - checks that either message or filepath is not None
-    # - if filepath is not None, data is a file to the path
-    # - else data is the UTF-8 conversion of message
-    # This context manager makes sure that data get closed
-    # (if a file)
-    with _DataManager(message, filepath) as data:
-        # checking that arguments that are expected to be
-        # urls are urls
-        urls = {"click": click, "attach": attach, "icon": icon}
-        for attr, value in urls.items():
-            # throw value error if not None
-            # and not a url
-            validate_url(attr, value)
-
-        # some argument can be directly set in the
-        # headers dict
-        direct_mapping: typing.Dict[str, typing.Any] = {
-            "Title": title,
-            "At": at,
-            "Click": click,
-            "Email": email,
-            "Icon": icon,
-        }
-        headers = {key: value for key, value in direct_mapping.items() if value}
-
-        # adding priority
-        headers["Priority"] = priority.value
-
-        # adding tags
-        if tags:
-            if isinstance(tags, str):
-                tags = (tags,)
-            headers["Tags"] = ",".join([str(t) for t in tags])
-
-        # adding actions
-        if actions:
-            if isinstance(actions, Action):
-                actions = [actions]
-            headers["Actions"] = "; ".join([str(action) for action in actions])
-
-        # sending
-        if dry_run == DryRun.off:
-            response = requests.put(f"{url}/{topic}", data=data, headers=headers)
-            if not response.ok:
-                raise NtfyError(response.status_code, response.reason)
-        elif dry_run == DryRun.error:
-            raise NtfyError(-1, "DryRun.error passed as argument")
+    profiler = profiling._begin("push", topic)
+    try:
+        _push(
+            topic,
+            title,
+            message,
+            priority,
+            tags,
+            click,
+            email,
+            filepath,
+            attach,
+            icon,
+            actions,
+            at,
+            url,
+            dry_run,
+            client,
+            rate_limiter,
+            retry,
+            tail,
+            metrics,
+            size,
+        )
+    finally:
+        profiling._end(profiler)
+
+
+def _push(
+    topic: str,
+    title: str,
+    message: typing.Optional[str],
+    priority: Priority,
+    tags: typing.Union[str, typing.Iterable[str]],
+    click: typing.Optional[str],
+    email: typing.Optional[str],
+    filepath: typing.Optional[Path],
+    attach: typing.Optional[str],
+    icon: typing.Optional[str],
+    actions: typing.Union[Action, typing.Sequence[Action]],
+    at: typing.Optional[str],
+    url: typing.Optional[str],
+    dry_run: DryRun,
+    client: typing.Optional["NtfyClient"],
+    rate_limiter: typing.Optional["RateLimiter"],
+    retry: typing.Optional["RetryPolicy"],
+    tail: typing.Optional[Tail],
+    metrics: typing.Optional["Metrics"],
+    size: typing.Optional[MessageSize],
+) -> None:
+    headers = _headers(
+        title,
+        priority=priority,
+        tags=tags,
+        click=click,
+        email=email,
+        attach=attach,
+        icon=icon,
+        actions=actions,
+        at=at,
+    )
+    _publish(
+        topic,
+        headers,
+        priority,
+        message,
+        filepath,
+        url,
+        dry_run,
+        client,
+        rate_limiter,
+        retry,
+        tail,
+        metrics,
+        size,
+    )
@@ -0,0 +1,254 @@
+"""
+Module defining the Profiler class, which measures the duration of each
+stage of the pushes (building the data, validating the urls, building the
+headers, serializing the actions, sending the request), to find out which
+one is responsible for slow pushes.
+
+``` python
+# Basic usage
+
+import ntfy_lite as ntfy
+
+with ntfy.Profiler(debug=True) as profiler:
+    ntfy.push("my topic", "my title", message="my message")
+
+for stage, stats in profiler.stats().items():
+    print(stage, stats.calls, stats.total, stats.max)
+
+for call in profiler.slowest():
+    print(call.name, call.topic, call.duration, call.stages)
+```
+"""
+
+import time
+import heapq
+import typing
+import logging
+import threading
+
+STAGES = ("data", "validate", "headers", "actions", "network", "handler")
+"""
+The stages measured by [ntfy_lite.profiling.Profiler][]:
+
+- data: opening the attached file (or reading its end), or encoding the message
+- validate: validating the urls (click, attach, icon)
+- headers: building the headers (except for the actions)
+- actions: serializing the actions
+- network: sending the request (including retries and waits for the rate limits)
+- handler: [ntfy_lite.handler.NtfyHandler][] only: deduplication, coalescing
+  and queueing of the record
+"""
+
+
+class StageStats(typing.NamedTuple):
+    """
+    Aggregated durations of a stage, see [ntfy_lite.profiling.Profiler][].
+    """
+
+    calls: int
+    """number of calls which went through the stage"""
+
+    total: float
+    """total duration (in seconds)"""
+
+    max: float
+    """maximal duration (in seconds)"""
+
+
+class CallProfile(typing.NamedTuple):
+    """
+    Durations of the stages of a call, see [ntfy_lite.profiling.Profiler][].
+    """
+
+    name: str
+    """'push' or 'emit' (see [ntfy_lite.handler.NtfyHandler][])"""
+
+    topic: str
+    """the topic"""
+
+    duration: float
+    """duration (in seconds) of the call"""
+
+    stages: typing.Dict[str, float]
+    """duration (in seconds) of each stage of the call"""
+
+
+class _Call:
+    __slots__ = ("name", "topic", "start", "stages", "depth")
+
+    def __init__(self, name: str, topic: str) -> None:
+        self.name = name
+        self.topic = topic
+        self.start = time.perf_counter()
+        self.stages: typing.Dict[str, float] = {}
+        self.depth = 1
+
+
+_logger = logging.getLogger(__name__)
+
+# the active profiler (see Profiler.start), None if no profiling
+_active: typing.Optional["Profiler"] = None
+
+
+class Profiler:
+    """
+    Measures the duration of the stages (see [ntfy_lite.profiling.STAGES][]) of the pushes
+    and of [ntfy_lite.handler.NtfyHandler.emit][], performed (by any thread) while
+    the profiler is active, i.e. between calls to its start and stop methods (or
+    within a 'with' statement). When no profiler is active, nothing is measured.
+
+    A call to NtfyHandler.emit in synchronous mode includes the push of the notification
+    (in asynchronous mode, the push is measured as a separate call).
+
+    Args:
+      keep: number of slowest calls kept (see the slowest method)
+      debug: if True, the calls which are among the 'keep' slowest ones so far
+        are logged (DEBUG level, logger 'ntfy_lite.profiling')
+    """
+
+    def __init__(self, keep: int = 10, debug: bool = False) -> None:
+        self._keep = keep
+        self._debug = debug
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Forgets the durations measured so far.
+        """
+        with self._lock:
+            self._stats: typing.Dict[str, typing.List[float]] = {}
+            # min-heap of (duration, index, call): the slowest calls
+            self._slowest: typing.List[typing.Tuple[float, int, CallProfile]] = []
+            self._index = 0
+
+    def stats(self) -> typing.Dict[str, StageStats]:
+        """
+        Returns the aggregated durations of the stages (and of the
+        calls, as stage 'push' and 'emit').
+        """
+        with self._lock:
+            return {
+                stage: StageStats(int(values[0]), values[1], values[2])
+                for stage, values in self._stats.items()
+            }
+
+    def slowest(self) -> typing.List[CallProfile]:
+        """
+        Returns the slowest calls, the slowest first.
+        """
+        with self._lock:
+            return [call for _, _, call in sorted(self._slowest, reverse=True)]
+
+    def _begin(self, name: str, topic: str) -> None:
+        call = getattr(self._local, "call", None)
+        if call is not None:
+            # nested call (e.g. the push of NtfyHandler.emit)
+            call.depth += 1
+            return
+        if getattr(self._local, "logging", False):
+            return
+        self._local.call = _Call(name, topic)
+
+    def _stage(self, stage: str, duration: float) -> None:
+        call = getattr(self._local, "call", None)
+        if call is not None:
+            call.stages[stage] = call.stages.get(stage, 0.0) + duration
+
+    def _end(self) -> None:
+        call = getattr(self._local, "call", None)
+        if call is None:
+            return
+        call.depth -= 1
+        if call.depth:
+            return
+        self._local.call = None
+        duration = time.perf_counter() - call.start
+        if call.name == "emit":
+            # what is not part of the push
+            call.stages["handler"] = duration - sum(call.stages.values())
+        profile = CallProfile(call.name, call.topic, duration, call.stages)
+        with self._lock:
+            for stage, duration in (
+                (call.name, profile.duration),
+                *call.stages.items(),
+            ):
+                values = self._stats.setdefault(stage, [0, 0.0, 0.0])
+                values[0] += 1
+                values[1] += duration
+                values[2] = max(values[2], duration)
+            self._index += 1
+            entry = (profile.duration, self._index, profile)
+            if len(self._slowest) < self._keep:
+                heapq.heappush(self._slowest, entry)
+            elif profile.duration > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+            else:
+                return
+        if self._debug:
+            # records logged from here are not profiled (e.g. if
+            # a NtfyHandler is a handler of the ntfy_lite logger)
+            self._local.logging = True
+            try:
+                _logger.debug(
+                    "slow %s (topic %s): %.3f ms (%s)",
+                    profile.name,
+                    profile.topic,
+                    profile.duration * 1e3,
+                    ", ".join(
+                        f"{stage}: {duration * 1e3:.3f} ms"
+                        for stage, duration in profile.stages.items()
+                    ),
+                )
+            finally:
+                self._local.logging = False
+
+    def start(self) -> None:
+        """
+        Activates the profiler (replacing the active one, if any).
+        """
+        global _active
+        _active = self
+
+    def stop(self) -> None:
+        """
+        Deactivates the profiler.
+        """
+        global _active
+        if _active is self:
+            _active = None
+
+    def __enter__(self) -> "Profiler":
+        self.start()
+        return self
+
+    def __exit__(self, _, __, ___) -> None:
+        self.stop()
+
+
+def _begin(name: str, topic: str) -> typing.Optional[Profiler]:
+    # returns the active profiler (None if none), to be passed to _end
+    profiler = _active
+    if profiler is not None:
+        profiler._begin(name, topic)
+    return profiler
+
+
+def _start() -> typing.Optional[float]:
+    return None if _active is None else time.perf_counter()
+
+
+def _stage(stage: str, start: typing.Optional[float]) -> typing.Optional[float]:
+    # adds the duration since start to the stage, and returns the
+    # current time (start of the next stage)
+    if start is None or _active is None:
+        return None
+    now = time.perf_counter()
+    _active._stage(stage, now - start)
+    return now
+
+
+def _end(profiler: typing.Optional[Profiler]) -> None:
+    if profiler is not None:
+        profiler._end()
@@ -0,0 +1,233 @@
+"""
+Module defining the RateLimiter class, a client side token bucket
+which keeps the notifications pushed within the
+[limits](https://ntfy.sh/docs/publish/#limitations) of the ntfy server.
+
+``` python
+# Basic usage
+
+import ntfy_lite as ntfy
+
+limiter = ntfy.RateLimiter(rate=0.2, burst=60)
+
+ntfy.push("my topic", "my title", message="my message", rate_limiter=limiter)
+
+handler = ntfy.NtfyHandler("my topic", rate_limiter=limiter)
+```
+"""
+
+import time
+import typing
+import threading
+from .ntfy2logging import Priority
+from .error import RateLimitError
+
+
+class _Bucket:
+    """
+    Token bucket, refilled at 'rate' tokens per second
+    up to 'burst' tokens.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def wait(self, needed: float, now: float) -> float:
+        # duration before 'needed' tokens are available
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+
+def _retry_after(value: typing.Optional[str]) -> typing.Optional[float]:
+    # value of a Retry-After header, i.e. either a number
+    # of seconds or a HTTP date
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    from datetime import datetime, timezone
+    from email.utils import parsedate_to_datetime
+
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max((date - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+_high_priorities = (Priority.HIGH, Priority.MAX)
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter, which may be passed to [ntfy_lite.ntfy.push][]
+    and to [ntfy_lite.handler.NtfyHandler][] (and shared between them).
+
+    Each push consumes a token of the bucket of the server and, if a topic
+    rate is set, a token of the bucket of the topic. If no token is available,
+    the push waits (at most max_wait seconds, after which a
+    [ntfy_lite.error.RateLimitError][] is raised).
+
+    The last 'reserve' tokens of the bucket of each server can only be consumed by notifications
+    of priority HIGH or MAX, so that important notifications are still sent
+    when less important ones exhausted the bucket.
+
+    When the server replies with a 429 status (too many requests), sending to
+    this server is paused for the duration specified by the Retry-After header
+    of the response (or default_pause seconds, if no such header), and the
+    notification is pushed again after the pause.
+
+    The default values correspond to the default limits of ntfy servers
+    (60 requests burst, then one request every 5 seconds).
+
+    Args:
+      rate: number of tokens per second added to the bucket of each server
+      burst: capacity of the bucket of each server
+      topic_rate: if not None, number of tokens per second added to the
+        bucket of each topic (topics are not limited if None)
+      topic_burst: capacity of the bucket of each topic (topic_rate if None)
+      reserve: number of tokens of the bucket of each server reserved
+        for high priority notifications
+      max_wait: maximal duration (in seconds) a push waits for a token
+        (or for the end of a pause)
+      default_pause: duration (in seconds) of the pause following a 429 response
+        which has no Retry-After header
+    """
+
+    def __init__(
+        self,
+        rate: float = 0.2,
+        burst: float = 60,
+        topic_rate: typing.Optional[float] = None,
+        topic_burst: typing.Optional[float] = None,
+        reserve: float = 5,
+        max_wait: float = 30.0,
+        default_pause: float = 5.0,
+    ) -> None:
+        for name, value in (("rate", rate), ("topic_rate", topic_rate)):
+            if value is not None and value <= 0:
+                raise ValueError(
+                    f"RateLimiter: {name} should be strictly positive (got {value})"
+                )
+        if reserve + 1 > burst:
+            # notifications of other priorities need a token beyond the reserve
+            raise ValueError(
+                f"RateLimiter: reserve + 1 ({reserve + 1}) should not be "
+                f"greater than burst ({burst})"
+            )
+        self._rate = rate
+        self._burst = burst
+        self._topic_rate = topic_rate
+        self._topic_burst = topic_burst if topic_burst is not None else topic_rate
+        self._reserve = reserve
+        self._max_wait = max_wait
+        self._default_pause = default_pause
+        self._lock = threading.Lock()
+        self._servers: typing.Dict[str, _Bucket] = {}
+        self._topics: typing.Dict[typing.Tuple[str, str], _Bucket] = {}
+        self._paused_until: typing.Dict[str, float] = {}
+
+    def deadline(self) -> float:
+        """
+        Returns the (time.monotonic) time after which a push
+        starting now stops waiting.
+        """
+        return time.monotonic() + self._max_wait
+
+    def _server(self, url: str, now: float) -> _Bucket:
+        try:
+            return self._servers[url]
+        except KeyError:
+            bucket = self._servers[url] = _Bucket(self._rate, self._burst, now)
+            return bucket
+
+    def _buckets(self, url: str, topic: str, now: float) -> typing.List[_Bucket]:
+        server = self._server(url, now)
+        if self._topic_rate is None:
+            return [server]
+        key = (url, topic)
+        try:
+            topic_bucket = self._topics[key]
+        except KeyError:
+            topic_bucket = self._topics[key] = _Bucket(
+                self._topic_rate, typing.cast(float, self._topic_burst), now
+            )
+        return [server, topic_bucket]
+
+    def acquire(
+        self,
+        url: str,
+        topic: str,
+        priority: Priority = Priority.DEFAULT,
+        deadline: typing.Optional[float] = None,
+    ) -> None:
+        """
+        Consumes a token for pushing a notification, waiting if
+        none is available (or if the server is paused).
+
+        Args:
+          url: the ntfy server
+          topic: the ntfy topic
+          priority: notifications of priority HIGH or MAX may consume reserved tokens
+          deadline: (time.monotonic) time after which to stop waiting.
+            If None, max_wait seconds from now.
+
+        Raises:
+          RateLimitError: if no token would be available before the deadline
+        """
+        if deadline is None:
+            deadline = self.deadline()
+        needed = 1.0 if priority in _high_priorities else 1.0 + self._reserve
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                buckets = self._buckets(url, topic, now)
+                # reserved tokens only apply to the bucket of the server
+                wait = max(
+                    [
+                        self._paused_until.get(url, now) - now,
+                        buckets[0].wait(needed, now),
+                    ]
+                    + [bucket.wait(1.0, now) for bucket in buckets[1:]]
+                )
+                if wait <= 0:
+                    for bucket in buckets:
+                        bucket.tokens -= 1.0
+                    return
+            if now + wait > deadline:
+                raise RateLimitError(
+                    f"no token available for {url}/{topic} within the allowed wait"
+                )
+            time.sleep(wait)
+
+    def pause(self, url: str, retry_after: typing.Optional[str] = None) -> float:
+        """
+        Pauses the pushes to the server, e.g. after it replied with
+        a 429 status. Returns the duration of the pause.
+
+        Args:
+          url: the ntfy server
+          retry_after: value of the Retry-After header of the response
+            (default_pause is used if None or invalid)
+        """
+        duration = _retry_after(retry_after)
+        if duration is None:
+            duration = self._default_pause
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until[url] = max(
+                self._paused_until.get(url, now), now + duration
+            )
+        return duration
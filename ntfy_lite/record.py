@@ -0,0 +1,18 @@
+"""
+Module defining the (private) _Record class, i.e. the light snapshot
+of a logging record passed between the components of
+[ntfy_lite.handler.NtfyHandler][].
+"""
+
+import typing
+
+
+class _Record(typing.NamedTuple):
+    """
+    Light snapshot of a logging record, i.e. the information
+    a notification is built from.
+    """
+
+    name: str
+    levelno: int
+    msg: typing.Any
@@ -0,0 +1,154 @@
+"""
+Module defining the RetryPolicy class, which configures how pushes failing
+because of a transient error (e.g. a 503 status or a reset connection)
+are attempted again.
+
+``` python
+# Basic usage
+
+import ntfy_lite as ntfy
+
+retry = ntfy.RetryPolicy(max_attempts=5, backoff=0.5)
+
+ntfy.push("my topic", "my title", message="my message", retry=retry)
+
+handler = ntfy.NtfyHandler("my topic", retry=retry)
+
+# extra latency due to retries
+print(retry.stats())
+```
+"""
+
+import random
+import typing
+import threading
+
+
+class RetryStats(typing.NamedTuple):
+    """
+    Statistics of the retries performed under a [ntfy_lite.retry.RetryPolicy][].
+    """
+
+    retried_pushes: int
+    """number of pushes which have been attempted more than once"""
+
+    retries: int
+    """total number of attempts beyond the first ones"""
+
+    extra_time: float
+    """
+    total duration (in seconds) spent after the failure
+    of the first attempts (backoff and subsequent attempts)
+    """
+
+
+class RetryPolicy:
+    """
+    Policy for attempting again the pushes failing because of a transient error.
+
+    The delay before the attempt n (n >= 1, attempt 0 being the first one)
+    is backoff * multiplier^(n-1), capped at max_backoff, and randomized
+    by +/- jitter (as a fraction of the delay).
+
+    A policy may be shared between pushes and handlers, in which case
+    its statistics (see the stats method) cumulate.
+
+    Args:
+      max_attempts: maximal number of attempts (including the first one)
+      backoff: delay (in seconds) before the second attempt
+      multiplier: factor applied to the delay after each attempt
+      max_backoff: maximal delay (in seconds) between two attempts
+      jitter: randomization of the delays, as a fraction of the delay (between 0 and 1)
+      max_duration: total time budget (in seconds) of a push, including all
+        attempts and delays. No attempt is started if it would begin after the budget.
+      statuses: HTTP statuses of the responses considered transient
+      exceptions: exceptions (raised while sending the request) considered transient.
+        If None: requests.ConnectionError and requests.Timeout.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        backoff: float = 0.5,
+        multiplier: float = 2.0,
+        max_backoff: float = 30.0,
+        jitter: float = 0.5,
+        max_duration: float = 60.0,
+        statuses: typing.Collection[int] = (500, 502, 503, 504),
+        exceptions: typing.Optional[
+            typing.Tuple[typing.Type[BaseException], ...]
+        ] = None,
+    ) -> None:
+        if max_attempts < 1:
+            raise ValueError(
+                f"RetryPolicy: max_attempts should be strictly positive (got {max_attempts})"
+            )
+        if not 0 <= jitter <= 1:
+            raise ValueError(
+                f"RetryPolicy: jitter should be between 0 and 1 (got {jitter})"
+            )
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.multiplier = multiplier
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.max_duration = max_duration
+        self.statuses = frozenset(statuses)
+        self.exceptions = exceptions
+        self._lock = threading.Lock()
+        self._retried_pushes = 0
+        self._retries = 0
+        self._extra_time = 0.0
+
+    def retryable(self, error: BaseException) -> bool:
+        """
+        Returns True if the error (raised while sending
+        the request) is considered transient.
+        """
+        if self.exceptions is None:
+            # imported here so that importing ntfy_lite remains fast
+            import requests
+
+            self.exceptions = (requests.ConnectionError, requests.Timeout)
+        return isinstance(error, self.exceptions)
+
+    def delay(self, attempt: int, elapsed: float) -> typing.Optional[float]:
+        """
+        Returns the delay (in seconds) before the next attempt, or None
+        if no further attempt should be performed.
+
+        Args:
+          attempt: index of the attempt which just failed (0 for the first one)
+          elapsed: duration (in seconds) since the first attempt started
+        """
+        if attempt + 1 >= self.max_attempts:
+            return None
+        delay = min(self.backoff * self.multiplier**attempt, self.max_backoff)
+        if self.jitter:
+            delay *= 1.0 + random.uniform(-self.jitter, self.jitter)
+        if elapsed + delay > self.max_duration:
+            return None
+        return delay
+
+    def record(self, retries: int, extra_time: float) -> None:
+        """
+        Cumulates the statistics of a push.
+
+        Args:
+          retries: number of attempts beyond the first one
+          extra_time: duration (in seconds) from the failure of
+            the first attempt to the end of the push
+        """
+        if not retries:
+            return
+        with self._lock:
+            self._retried_pushes += 1
+            self._retries += retries
+            self._extra_time += extra_time
+
+    def stats(self) -> RetryStats:
+        """
+        Returns the statistics of the retries performed so far.
+        """
+        with self._lock:
+            return RetryStats(self._retried_pushes, self._retries, self._extra_time)
@@ -0,0 +1,114 @@
+"""
+Module defining the MessageSize class, which configures how [ntfy_lite.ntfy.push][]
+and [ntfy_lite.handler.NtfyHandler][] handle messages larger than the size
+limit of ntfy messages (4096 bytes for ntfy.sh, larger messages being
+turned into attachments by the server, or rejected).
+"""
+
+import io
+import typing
+from enum import Enum, auto
+
+
+class Oversize(Enum):
+    """
+    What to do with a message larger than the max_bytes limit
+    of [ntfy_lite.size.MessageSize][].
+
+    - 'truncate': the end of the message is replaced by the marker.
+
+    - 'attach': the message is sent as a file attachment (UTF-8 encoded),
+      truncated if larger than the max_attachment_bytes limit.
+    """
+
+    truncate = auto()
+    attach = auto()
+
+
+class MessageSize:
+    """
+    Configuration of the size limits of the messages.
+
+    The size of a message is checked before it is encoded, so that
+    the cost of pushing a (possibly huge) message which is truncated
+    does not depend on the size of the message.
+
+    ```python
+    import ntfy_lite as ntfy
+
+    # large messages are sent as attachments
+    ntfy.push(
+        "my topic",
+        "my title",
+        message=report,
+        size=ntfy.MessageSize(oversize=ntfy.Oversize.attach),
+    )
+    ```
+
+    Args:
+      max_bytes: maximal size of a message (as encoded when pushed, i.e.
+        one byte per character)
+      oversize: what to do with larger messages, see [ntfy_lite.size.Oversize][]
+      marker: appended to truncated messages (included in the size limits)
+      filename: name of the attachment (oversize 'attach' only)
+      max_attachment_bytes: maximal size of the attachment (oversize 'attach' only).
+        Should be below the attachment size limit of the server (15M for ntfy.sh).
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 4096,
+        oversize: Oversize = Oversize.truncate,
+        marker: str = "\n[truncated]",
+        filename: str = "message.txt",
+        max_attachment_bytes: int = 1024 * 1024,
+    ) -> None:
+        for name, value in (
+            ("max_bytes", max_bytes),
+            ("max_attachment_bytes", max_attachment_bytes),
+        ):
+            if value <= len(marker.encode("utf-8")):
+                raise ValueError(
+                    f"MessageSize: {name} should be larger than the "
+                    f"size of the marker (got {value})"
+                )
+        self.max_bytes = max_bytes
+        self.oversize = oversize
+        self.marker = marker
+        self.filename = filename
+        self.max_attachment_bytes = max_attachment_bytes
+
+
+def _truncate(message: str, max_bytes: int, marker: str) -> str:
+    # (message is pushed encoded in latin-1, i.e. one byte per character)
+    if len(message) <= max_bytes:
+        return message
+    return message[: max_bytes - len(marker)] + marker
+
+
+def _attachment(message: str, size: MessageSize) -> typing.IO:
+    # the message encoded in UTF-8, as an in-memory file of at most
+    # size.max_attachment_bytes bytes. A character is encoded in at
+    # least one byte: no more characters than bytes are encoded.
+    limit = size.max_attachment_bytes
+    data = message[: limit + 1].encode("utf-8")
+    if len(data) <= limit:
+        return io.BytesIO(data)
+    marker = size.marker.encode("utf-8")
+    end = limit - len(marker)
+    # not truncating within a multi-bytes character
+    while end > 0 and data[end] & 0xC0 == 0x80:
+        end -= 1
+    return io.BytesIO(data[:end] + marker)
+
+
+def _limit(
+    message: str, size: MessageSize
+) -> typing.Tuple[typing.Union[str, typing.IO], typing.Optional[str]]:
+    # the data to push (the message, possibly truncated, or an attachment),
+    # and the filename of the attachment (None if no attachment)
+    if len(message) <= size.max_bytes:
+        return message, None
+    if size.oversize == Oversize.attach:
+        return _attachment(message, size), size.filename
+    return _truncate(message, size.max_bytes, size.marker), None
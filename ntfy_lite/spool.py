@@ -0,0 +1,253 @@
+"""
+Module defining the Spool class, which configures the writing to disk
+of the notifications [ntfy_lite.handler.NtfyHandler][] failed to push
+(see its 'spool' argument), so that they are pushed later on.
+"""
+
+import os
+import json
+import zlib
+import typing
+import threading
+from pathlib import Path
+from .record import _Record
+from .error import NtfyError
+
+
+class Spool:
+    """
+    Configuration of the spool file of a [ntfy_lite.handler.NtfyHandler][].
+
+    The records whose notification could not be pushed (e.g. because
+    the server is unreachable), or which were dropped because the queue
+    of an asynchronous handler was full, are appended to the spool file.
+    A background thread attempts every 'interval' seconds to push the
+    spooled notifications, in order, until the server accepts them again.
+
+    Appending a record costs a (buffered) write: the file is not synced
+    to disk after each record, unless fsync is True. Each entry is checksummed,
+    so that an entry partially written when the process crashed is skipped.
+    The spool file is not deleted when the handler is closed: the remaining
+    notifications are pushed by the next handler using the same spool file.
+
+    Only the notifications which failed because of a transient error (i.e. not
+    rejected by the server, e.g. with a 400 status) are spooled.
+    A notification may be pushed twice if the process crashes while
+    replaying the spool. A spool file should be used by a single handler.
+
+    The spooled notifications are replayed one at a time, in order, using the
+    client of the handler (if any) and its kept-alive connections. They are not
+    sent with [ntfy_lite.batch.push_batch][], which pushes concurrently (i.e. not
+    in order) and can not attach the files of the handler (see its 'level2filepath'
+    argument).
+
+    Args:
+      path: the spool file
+      max_bytes: maximal size of the spool file (including the notifications
+        being replayed, see below). Records are not spooled (i.e. are lost)
+        when the spool file is full.
+      interval: delay (in seconds) between two attempts to push
+        the spooled notifications
+      fsync: if True, the spool file is synced to disk after each record
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int = 10 * 1024 * 1024,
+        interval: float = 30.0,
+        fsync: bool = False,
+    ) -> None:
+        if max_bytes < 1:
+            raise ValueError(
+                f"Spool: max_bytes should be strictly positive (got {max_bytes})"
+            )
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.fsync = fsync
+
+
+def _encode(record: _Record) -> bytes:
+    # one entry per line: checksum of the JSON encoded record, then the record
+    # (json.dumps escapes newlines)
+    data = json.dumps([record.name, record.levelno, str(record.msg)]).encode()
+    return b"%08x%s\n" % (zlib.crc32(data), data)
+
+
+def _decode(line: bytes) -> typing.Optional[_Record]:
+    # None if the line is corrupted (e.g. partially written)
+    if not line.endswith(b"\n") or len(line) < 9:
+        return None
+    data = line[8:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(data):
+            return None
+        return _Record(*json.loads(data))
+    except (ValueError, TypeError):
+        return None
+
+
+def _transient(error: Exception) -> bool:
+    # True if pushing the notification again may succeed, i.e. the server
+    # failed to handle the notification (e.g. 429 or 5xx status) or could
+    # not be reached, rather than rejected it (e.g. 400 status)
+    if isinstance(error, NtfyError):
+        status = error.status_code
+        return not 400 <= status < 500 or status in (408, 429)
+    # (the exceptions raised by requests are OSErrors)
+    return isinstance(error, OSError)
+
+
+# the offset in the replayed file is saved every _COMMIT entries
+_COMMIT = 100
+
+
+class _SpoolFile:
+    """
+    Append-only spool file, with a background thread passing the
+    spooled records (in order) to the send function, which should raise
+    an exception upon failure.
+
+    While replayed, the records of the spool file are moved to {path}.replay,
+    and the offset of the next record to replay is saved in {path}.offset.
+    """
+
+    def __init__(self, spool: Spool, send: typing.Callable[[_Record], None]) -> None:
+        self._config = spool
+        self._send = send
+        self._path = spool.path
+        self._replay_path = spool.path.with_name(spool.path.name + ".replay")
+        self._offset_path = spool.path.with_name(spool.path.name + ".offset")
+        self._lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._file = open(self._path, "ab")
+        self._size = self._file.tell()
+        # size of the records of the replay file not replayed yet
+        # (counted in the max_bytes limit)
+        self._replaying = 0
+        if self._replay_path.exists():
+            self._replaying = max(self._replay_path.stat().st_size - self._offset(), 0)
+        if self._size:
+            # the last entry may have been partially written (crash)
+            with open(self._path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write(b"\n")
+                    self._file.flush()
+                    self._size += 1
+        self.spooled = 0
+        """number of records appended to the spool file"""
+        self.dropped = 0
+        """number of records not spooled because the spool file was full"""
+        self.replayed = 0
+        """number of spooled records pushed"""
+        self.rejected = 0
+        """number of spooled records discarded because rejected by the server"""
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f"NtfySpool-{self._path.name}", daemon=True
+        )
+        self._thread.start()
+
+    def append(self, record: _Record) -> bool:
+        """
+        Appends the record to the spool file. Returns False if
+        the spool file is full (or closed).
+        """
+        entry = _encode(record)
+        with self._lock:
+            size = self._size + self._replaying + len(entry)
+            if self._file.closed or size > self._config.max_bytes:
+                self.dropped += 1
+                return False
+            self._file.write(entry)
+            self._file.flush()
+            if self._config.fsync:
+                os.fsync(self._file.fileno())
+            self._size += len(entry)
+            self.spooled += 1
+        return True
+
+    def _commit(self, offset: int) -> None:
+        # atomic write of the offset
+        tmp = self._offset_path.with_name(self._offset_path.name + ".tmp")
+        tmp.write_text(str(offset))
+        os.replace(tmp, self._offset_path)
+
+    def _offset(self) -> int:
+        try:
+            return int(self._offset_path.read_text())
+        except (OSError, ValueError):
+            return 0
+
+    def replay(self) -> bool:
+        """
+        Sends the spooled records, stopping at the first failure.
+        Returns True if all the spooled records have been sent.
+        """
+        with self._replay_lock:
+            while True:
+                if not self._replay_path.exists():
+                    with self._lock:
+                        if not self._size or self._file.closed:
+                            return True
+                        # the records spooled so far are moved to the
+                        # replay file, new records go to a new spool file
+                        self._file.close()
+                        os.replace(self._path, self._replay_path)
+                        self._file = open(self._path, "ab")
+                        self._replaying = self._size
+                        self._size = 0
+                offset = self._offset()
+                with open(self._replay_path, "rb") as f:
+                    size = os.fstat(f.fileno()).st_size
+                    f.seek(offset)
+                    for index, line in enumerate(f):
+                        if self._stop.is_set():
+                            # closing: the remaining records are
+                            # replayed by the next handler
+                            self._commit(offset)
+                            return False
+                        record = _decode(line)
+                        if record is not None:
+                            try:
+                                self._send(record)
+                                self.replayed += 1
+                            except Exception as e:
+                                if _transient(e):
+                                    self._commit(offset)
+                                    return False
+                                # would fail forever
+                                self.rejected += 1
+                        offset += len(line)
+                        self._replaying = size - offset
+                        if index % _COMMIT == _COMMIT - 1:
+                            self._commit(offset)
+                # (if the process crashes in between, the
+                # replay file is replayed again from the start)
+                self._offset_path.unlink(missing_ok=True)
+                self._replay_path.unlink()
+                self._replaying = 0
+
+    def _run(self) -> None:
+        # the records left by a previous run are sent first
+        while True:
+            try:
+                self.replay()
+            except OSError:
+                # e.g. the disk is full, attempted again later on
+                pass
+            if self._stop.wait(self._config.interval):
+                return
+
+    def close(self) -> None:
+        """
+        Stops the background thread (interrupting the replay of the spool
+        after the current record) and closes the spool file (the spooled
+        records remain in the file).
+        """
+        self._stop.set()
+        self._thread.join()
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,284 @@
+"""
+Module defining the subscribe and async_subscribe functions, which receive
+the notifications published to topics, using the JSON stream endpoint of ntfy
+(see [subscribe as JSON stream](https://ntfy.sh/docs/subscribe/api/#json-message-format)).
+
+``` python
+# Basic usage
+
+import ntfy_lite as ntfy
+
+for message in ntfy.subscribe(["alerts", "backups"], since="10m"):
+    print(message.topic, message.title, message.message)
+```
+"""
+
+import json
+import time
+import types
+import typing
+from .ntfy2logging import Priority
+from .error import NtfyError
+from .spool import _transient
+
+
+class ReceivedMessage(typing.NamedTuple):
+    """
+    A notification received by [ntfy_lite.subscription.subscribe][]
+    (or [ntfy_lite.subscription.async_subscribe][]).
+    """
+
+    id: str
+    """id of the message (attributed by the server)"""
+
+    time: int
+    """(unix) time the message was published"""
+
+    topic: str
+    """topic the message was published to"""
+
+    message: str
+    """the message"""
+
+    title: typing.Optional[str] = None
+    """the title (None if none)"""
+
+    priority: Priority = Priority.DEFAULT
+    """the priority"""
+
+    tags: typing.Tuple[str, ...] = ()
+    """the tags"""
+
+    event: typing.Mapping[str, typing.Any] = types.MappingProxyType({})
+    """
+    the message event, as sent by the server (e.g. with
+    the 'click' or 'attachment' fields, if any)
+    """
+
+
+def _message(event: typing.Dict[str, typing.Any]) -> ReceivedMessage:
+    try:
+        priority = Priority(str(event.get("priority", 3)))
+    except ValueError:
+        priority = Priority.DEFAULT
+    return ReceivedMessage(
+        str(event.get("id", "")),
+        int(event.get("time", 0)),
+        str(event.get("topic", "")),
+        str(event.get("message", "")),
+        event.get("title"),
+        priority,
+        tuple(event.get("tags", ())),
+        event,
+    )
+
+
+class _Subscription:
+    """
+    State of a subscription shared by its successive connections: the
+    position in the stream (since), the reconnection delay, and the
+    (bounded) buffer of the line being received.
+    """
+
+    def __init__(
+        self,
+        topics: typing.Union[str, typing.Iterable[str]],
+        since: typing.Optional[typing.Union[str, int]],
+        url: str,
+        reconnect_delay: float,
+        max_reconnect_delay: float,
+        max_line_bytes: int,
+    ) -> None:
+        if isinstance(topics, str):
+            topics = (topics,)
+        topics = ",".join(topics)
+        if not topics:
+            raise ValueError("subscribe: no topic")
+        if max_line_bytes < 1:
+            raise ValueError(
+                f"subscribe: max_line_bytes should be strictly positive "
+                f"(got {max_line_bytes})"
+            )
+        self.url = f"{url}/{topics}/json"
+        self.since = str(since) if since is not None else None
+        self._reconnect_delay = reconnect_delay
+        self._max_reconnect_delay = max_reconnect_delay
+        self.delay = reconnect_delay
+        self._max_line_bytes = max_line_bytes
+        self._buffer = bytearray()
+        self._skipping = False
+
+    def params(self) -> typing.Dict[str, str]:
+        # query of the next connection
+        self._buffer.clear()
+        self._skipping = False
+        return {} if self.since is None else {"since": self.since}
+
+    def disconnected(self) -> float:
+        # delay (in seconds) before reconnecting (exponential backoff)
+        delay = self.delay
+        self.delay = min(self.delay * 2, self._max_reconnect_delay)
+        return delay
+
+    def _lines(self, chunk: bytes) -> typing.Iterator[bytes]:
+        # the complete lines of the chunk. At most max_line_bytes
+        # are buffered: longer lines are skipped.
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                break
+            if self._skipping:
+                self._skipping = False
+            elif self._buffer:
+                self._buffer += chunk[start:end]
+                if len(self._buffer) <= self._max_line_bytes:
+                    yield bytes(self._buffer)
+                self._buffer.clear()
+            elif end - start <= self._max_line_bytes:
+                yield chunk[start:end]
+            start = end + 1
+        if not self._skipping and start < len(chunk):
+            self._buffer += chunk[start:]
+            if len(self._buffer) > self._max_line_bytes:
+                self._buffer.clear()
+                self._skipping = True
+
+    def feed(self, chunk: bytes) -> typing.Iterator[ReceivedMessage]:
+        # the messages completed by the chunk
+        for line in self._lines(chunk):
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(event, dict):
+                continue
+            # data received: the connection works
+            self.delay = self._reconnect_delay
+            kind = event.get("event")
+            if kind == "open" and self.since is None:
+                # reconnections do not miss the messages published meanwhile
+                self.since = str(event.get("time", int(time.time())))
+            elif kind == "message":
+                message = _message(event)
+                self.since = message.id
+                yield message
+
+
+def subscribe(
+    topics: typing.Union[str, typing.Iterable[str]],
+    since: typing.Optional[typing.Union[str, int]] = None,
+    url: str = "https://ntfy.sh",
+    timeout: float = 60.0,
+    reconnect_delay: float = 1.0,
+    max_reconnect_delay: float = 60.0,
+    max_line_bytes: int = 64 * 1024,
+) -> typing.Iterator[ReceivedMessage]:
+    """
+    Yields the messages published to the topics, as they are received
+    over a long-lived connection to the server. The messages are parsed
+    as they arrive, and the memory used does not depend on the number of
+    messages (lines longer than max_line_bytes are skipped).
+
+    When the connection is lost (or the server replies with a transient error,
+    e.g. 503), the generator reconnects after a delay (doubling after each failed
+    attempt), and resumes from the last received message. Other errors
+    (e.g. 403 status) raise a [ntfy_lite.error.NtfyError][].
+
+    ```python
+    import ntfy_lite as ntfy
+
+    for message in ntfy.subscribe(["alerts", "backups"], since="all"):
+        forward(message.title, message.message)
+    ```
+
+    Args:
+      topics: the topic (str) or the topics to subscribe to
+      since: if not None, the messages published since then are also yielded
+        (cached by the server): 'all', a message id, a unix time or a duration (e.g. '10m'),
+        see [fetching cached messages](https://ntfy.sh/docs/subscribe/api/#fetch-cached-messages)
+      url: ntfy server
+      timeout: timeout (in seconds) for connecting and for receiving data
+        (the server sends keepalive events, every 45 seconds for ntfy.sh)
+      reconnect_delay: delay (in seconds) before the first reconnection attempt
+      max_reconnect_delay: maximal delay (in seconds) between reconnection attempts
+      max_line_bytes: maximal size of a message event
+    """
+    # imported here so that importing ntfy_lite remains fast
+    import requests
+
+    subscription = _Subscription(
+        topics, since, url, reconnect_delay, max_reconnect_delay, max_line_bytes
+    )
+    with requests.Session() as session:
+        while True:
+            try:
+                with session.get(
+                    subscription.url,
+                    params=subscription.params(),
+                    stream=True,
+                    timeout=timeout,
+                ) as response:
+                    if not response.ok:
+                        raise NtfyError(response.status_code, response.reason)
+                    # (chunk_size None: chunks are yielded as they are received)
+                    for chunk in response.iter_content(chunk_size=None):
+                        yield from subscription.feed(chunk)
+            except NtfyError as e:
+                if not _transient(e):
+                    raise
+            except requests.RequestException:
+                # e.g. connection lost or timeout
+                pass
+            time.sleep(subscription.disconnected())
+
+
+async def async_subscribe(
+    topics: typing.Union[str, typing.Iterable[str]],
+    since: typing.Optional[typing.Union[str, int]] = None,
+    url: str = "https://ntfy.sh",
+    timeout: float = 60.0,
+    reconnect_delay: float = 1.0,
+    max_reconnect_delay: float = 60.0,
+    max_line_bytes: int = 64 * 1024,
+) -> typing.AsyncIterator[ReceivedMessage]:
+    """
+    Asynchronous generator counterpart of [ntfy_lite.subscription.subscribe][]
+    (same arguments), which requires [aiohttp](https://docs.aiohttp.org)
+    (the 'async' extra: `pip install ntfy_lite[async]`).
+
+    ```python
+    import ntfy_lite as ntfy
+
+    async def bridge():
+        async for message in ntfy.async_subscribe("alerts"):
+            await forward(message.title, message.message)
+    ```
+    """
+    # asyncio is imported only when used, as it is slow to import
+    import asyncio
+    from .async_client import _aiohttp
+
+    aiohttp = _aiohttp()
+    subscription = _Subscription(
+        topics, since, url, reconnect_delay, max_reconnect_delay, max_line_bytes
+    )
+    client_timeout = aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout)
+    async with aiohttp.ClientSession(timeout=client_timeout) as session:
+        while True:
+            try:
+                async with session.get(
+                    subscription.url, params=subscription.params()
+                ) as response:
+                    if not response.ok:
+                        raise NtfyError(response.status, str(response.reason))
+                    async for chunk in response.content.iter_any():
+                        for message in subscription.feed(chunk):
+                            yield message
+            except NtfyError as e:
+                if not _transient(e):
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                # e.g. connection lost or timeout
+                pass
+            await asyncio.sleep(subscription.disconnected())
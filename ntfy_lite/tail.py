@@ -0,0 +1,96 @@
+"""
+Module defining the Tail class, which configures the attachment of only
+the end of a file (e.g. the last lines of a log file) by
+[ntfy_lite.ntfy.push][] and [ntfy_lite.handler.NtfyHandler][].
+"""
+
+import io
+import typing
+from pathlib import Path
+
+
+class Tail:
+    """
+    Configuration of the attachment of the end of a file:
+    instead of the full file, only its last max_bytes bytes (or its
+    last max_lines lines, within the max_bytes limit) are sent.
+
+    The end of the file is read by seeking from the end of the file,
+    so that the cost of attaching it does not depend on the size of
+    the file (and neither does the memory used).
+
+    ```python
+    import ntfy_lite as ntfy
+
+    # attaching at most the last 200 lines of the log file
+    ntfy.push(
+        "my topic",
+        "my title",
+        filepath=logfile,
+        tail=ntfy.Tail(max_lines=200),
+    )
+    ```
+
+    Args:
+      max_bytes: maximal size of the attachment. Should be below the attachment
+        size limit of the server (15M for ntfy.sh).
+      max_lines: if not None, maximal number of lines attached. Lines truncated
+        by the max_bytes limit are not attached.
+    """
+
+    def __init__(
+        self, max_bytes: int = 1024 * 1024, max_lines: typing.Optional[int] = None
+    ) -> None:
+        if max_bytes < 1:
+            raise ValueError(
+                f"Tail: max_bytes should be strictly positive (got {max_bytes})"
+            )
+        if max_lines is not None and max_lines < 1:
+            raise ValueError(
+                f"Tail: max_lines should be strictly positive (got {max_lines})"
+            )
+        self.max_bytes = max_bytes
+        self.max_lines = max_lines
+
+
+_BLOCK_SIZE = 64 * 1024
+
+
+def _read_tail(filepath: Path, tail: Tail) -> bytes:
+    # reads blocks backward from the end of the file, until
+    # enough bytes (or enough lines) have been read
+    chunks: typing.List[bytes] = []
+    size = 0
+    newlines = 0
+    with open(filepath, "rb") as f:
+        position = f.seek(0, io.SEEK_END)
+        while position > 0 and size < tail.max_bytes:
+            length = min(_BLOCK_SIZE, position, tail.max_bytes - size)
+            position -= length
+            f.seek(position)
+            chunk = f.read(length)
+            chunks.append(chunk)
+            size += len(chunk)
+            if tail.max_lines is not None:
+                newlines += chunk.count(b"\n")
+                # one more newline than lines, so that the first line
+                # is known to be complete
+                if newlines > tail.max_lines:
+                    break
+    chunks.reverse()
+    data = b"".join(chunks)
+    if tail.max_lines is None:
+        return data
+    lines = data.splitlines(keepends=True)
+    if position > 0 and len(lines) > 1:
+        # the first line may have been truncated
+        lines = lines[1:]
+    return b"".join(lines[-tail.max_lines :])
+
+
+def _open_tail(filepath: Path, tail: Tail) -> typing.IO:
+    """
+    Returns the end of the file (see [ntfy_lite.tail.Tail][])
+    as an in-memory file.
+    """
+    return io.BytesIO(_read_tail(filepath, tail))
@@ -0,0 +1,180 @@
+"""
+Module defining the NotificationTemplate class, for pushing many
+notifications which differ only by their title and message.
+
+``` python
+# Basic usage
+
+import ntfy_lite as ntfy
+
+alert = ntfy.NotificationTemplate(
+    "my topic",
+    priority=ntfy.Priority.HIGH,
+    tags=["warning"],
+    click="https://grafana.example.com",
+    actions=[ntfy.ViewAction("dashboard", "https://grafana.example.com")],
+)
+
+alert.send("disk full", "/dev/sda1 at 100%")
+alert.send("disk full", "/dev/sdb1 at 100%")
+```
+"""
+
+import typing
+from pathlib import Path
+from .ntfy2logging import Priority
+from .actions import Action
+from .tail import Tail
+from .size import MessageSize
+from .ntfy import DryRun, _headers, _publish
+from . import profiling
+
+if typing.TYPE_CHECKING:
+    from .client import NtfyClient
+    from .ratelimit import RateLimiter
+    from .retry import RetryPolicy
+    from .metrics import Metrics
+
+
+class NotificationTemplate:
+    """
+    Immutable set of the arguments of [ntfy_lite.ntfy.push][], except for
+    the title and the message (or file attachment).
+
+    The urls are validated and the headers (including the actions) are built
+    once, upon construction: the send method only adds the title to the headers.
+
+    Args:
+      topic: the ntfy topic on which to publish
+      url: ntfy server. If None, the url of the client (or https://ntfy.sh if no client is passed).
+      others: see [ntfy_lite.ntfy.push][]
+    """
+
+    __slots__ = (
+        "_topic",
+        "_headers",
+        "_priority",
+        "_url",
+        "_dry_run",
+        "_client",
+        "_rate_limiter",
+        "_retry",
+        "_tail",
+        "_metrics",
+        "_size",
+    )
+
+    _topic: str
+    _headers: typing.Dict[str, str]
+    _priority: Priority
+    _url: typing.Optional[str]
+    _dry_run: DryRun
+    _client: typing.Optional["NtfyClient"]
+    _rate_limiter: typing.Optional["RateLimiter"]
+    _retry: typing.Optional["RetryPolicy"]
+    _tail: typing.Optional[Tail]
+    _metrics: typing.Optional["Metrics"]
+    _size: typing.Optional[MessageSize]
+
+    def __init__(
+        self,
+        topic: str,
+        priority: Priority = Priority.DEFAULT,
+        tags: typing.Union[str, typing.Iterable[str]] = [],
+        click: typing.Optional[str] = None,
+        email: typing.Optional[str] = None,
+        attach: typing.Optional[str] = None,
+        icon: typing.Optional[str] = None,
+        actions: typing.Union[Action, typing.Sequence[Action]] = [],
+        at: typing.Optional[str] = None,
+        url: typing.Optional[str] = None,
+        dry_run: DryRun = DryRun.off,
+        client: typing.Optional["NtfyClient"] = None,
+        rate_limiter: typing.Optional["RateLimiter"] = None,
+        retry: typing.Optional["RetryPolicy"] = None,
+        tail: typing.Optional[Tail] = None,
+        metrics: typing.Optional["Metrics"] = None,
+        size: typing.Optional[MessageSize] = None,
+    ) -> None:
+        headers = _headers(
+            "",
+            priority=priority,
+            tags=tags,
+            click=click,
+            email=email,
+            attach=attach,
+            icon=icon,
+            actions=actions,
+            at=at,
+        )
+        values = {
+            "_topic": topic,
+            "_headers": headers,
+            "_priority": priority,
+            "_url": url,
+            "_dry_run": dry_run,
+            "_client": client,
+            "_rate_limiter": rate_limiter,
+            "_retry": retry,
+            "_tail": tail,
+            "_metrics": metrics,
+            "_size": size,
+        }
+        for attr, value in values.items():
+            object.__setattr__(self, attr, value)
+
+    def __setattr__(self, name: str, value: typing.Any) -> None:
+        raise AttributeError(f"NotificationTemplate is immutable (can not set {name})")
+
+    @property
+    def topic(self) -> str:
+        """
+        The topic on which the notifications are published
+        """
+        return self._topic
+
+    @property
+    def headers(self) -> typing.Dict[str, str]:
+        """
+        The headers of the notifications (except for the title)
+        """
+        return dict(self._headers)
+
+    def send(
+        self,
+        title: str,
+        message: typing.Optional[str] = None,
+        filepath: typing.Optional[Path] = None,
+    ) -> None:
+        """
+        Pushes a notification.
+
+        Args:
+          title: the title of the notification
+          message: the message. It is optional and if None, then a filepath argument must be provided instead.
+          filepath: path to the file to be sent as attachement.
+            It is optional and if None, then a message argument must be provided instead.
+        """
+        headers = self._headers
+        if title:
+            headers = dict(headers)
+            headers["Title"] = title
+        profiler = profiling._begin("push", self._topic)
+        try:
+            _publish(
+                self._topic,
+                headers,
+                self._priority,
+                message,
+                filepath,
+                self._url,
+                self._dry_run,
+                self._client,
+                self._rate_limiter,
+                self._retry,
+                self._tail,
+                self._metrics,
+                self._size,
+            )
+        finally:
+            profiling._end(profiler)
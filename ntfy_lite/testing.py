@@ -0,0 +1,402 @@
+"""
+Module defining NtfyStubServer, a local stand-in for a ntfy server,
+for testing and benchmarking code pushing notifications without
+network access.
+
+The server stores the notifications it receives (so that tests may
+check them), and may be configured to reply slowly or with errors.
+It also streams them to subscribers (see [ntfy_lite.subscription.subscribe][]).
+
+``` python
+# Basic usage
+
+import ntfy_lite as ntfy
+from ntfy_lite.testing import NtfyStubServer
+
+with NtfyStubServer() as server:
+    server.fail_next(503)  # the next publish is answered with a 503 status
+    ntfy.push(
+        "my topic", "my title", message="my message",
+        url=server.url, retry=ntfy.RetryPolicy(backoff=0.01),
+    )
+    assert server.publishes[-1].message == "my message"
+```
+"""
+
+import json
+import time
+import random
+import typing
+import secrets
+import threading
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Publish(typing.NamedTuple):
+    """
+    A notification received by a [ntfy_lite.testing.NtfyStubServer][].
+    """
+
+    id: str
+    """id attributed by the server"""
+
+    time: float
+    """(time.time) time of reception"""
+
+    method: str
+    """HTTP method of the request (PUT or POST)"""
+
+    topic: str
+    """topic the notification was published to"""
+
+    headers: typing.Dict[str, str]
+    """headers of the request"""
+
+    body: bytes
+    """body of the request (message, attachment, or JSON notification)"""
+
+    json: typing.Optional[typing.Dict[str, typing.Any]] = None
+    """the notification, if published as JSON (to the root of the server)"""
+
+    @property
+    def message(self) -> str:
+        """the message (the body, decoded, if not published as JSON)"""
+        if self.json is not None:
+            return self.json.get("message", "")
+        return self.body.decode("utf-8", errors="replace")
+
+    def _event(self) -> typing.Dict[str, typing.Any]:
+        # the message event of the notification (as sent to subscribers)
+        event: typing.Dict[str, typing.Any] = {
+            "id": self.id,
+            "time": int(self.time),
+            "event": "message",
+            "topic": self.topic,
+            "message": self.message,
+        }
+        values = self.json if self.json is not None else {}
+        title = values.get("title", self.headers.get("Title"))
+        if title:
+            event["title"] = title
+        priority = values.get("priority", self.headers.get("Priority"))
+        if priority:
+            event["priority"] = int(priority)
+        tags = values.get("tags", self.headers.get("Tags"))
+        if tags:
+            event["tags"] = tags.split(",") if isinstance(tags, str) else tags
+        return event
+
+
+class _Reply(typing.NamedTuple):
+    status: int
+    headers: typing.Dict[str, str]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so that clients may keep the connections alive
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately: without this, Nagle's
+    # algorithm delays the body of responses on kept-alive connections
+    disable_nagle_algorithm = True
+    server: "_Server"
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks: typing.List[bytes] = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    # trailer
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    return b"".join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _reply(
+        self, status: int, body: bytes, headers: typing.Mapping[str, str] = {}
+    ) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PUT(self) -> None:
+        body = self._read_body()
+        stub = self.server.stub
+        if stub.latency:
+            time.sleep(stub.latency)
+        topic = self.path.split("?")[0].strip("/")
+        values: typing.Optional[typing.Dict[str, typing.Any]] = None
+        if not topic:
+            # publishing as JSON
+            try:
+                values = json.loads(body)
+                topic = values["topic"]  # type: ignore
+            except (ValueError, TypeError, KeyError):
+                error = {"http": 400, "error": "invalid request: invalid JSON"}
+                self._reply(400, json.dumps(error).encode())
+                return
+        reply = stub._next_reply()
+        if reply is not None:
+            error = {"http": reply.status, "error": "injected by NtfyStubServer"}
+            self._reply(reply.status, json.dumps(error).encode(), reply.headers)
+            return
+        publish = stub._store(self.command, topic, dict(self.headers), body, values)
+        self._reply(200, json.dumps(publish._event()).encode())
+
+    do_POST = do_PUT
+
+    def _write_event(self, event: typing.Dict[str, typing.Any]) -> None:
+        # one chunk per event
+        data = json.dumps(event).encode() + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    def do_GET(self) -> None:
+        # subscription: streams the notifications as newline delimited JSON
+        stub = self.server.stub
+        parts = urlsplit(self.path)
+        topics, _, stream = parts.path.strip("/").partition("/")
+        if stream != "json" or not topics:
+            self._reply(404, json.dumps({"http": 404, "error": "not found"}).encode())
+            return
+        reply = stub._next_reply()
+        if reply is not None:
+            error = {"http": reply.status, "error": "injected by NtfyStubServer"}
+            self._reply(reply.status, json.dumps(error).encode(), reply.headers)
+            return
+        subscribed = set(topics.split(","))
+        since = parse_qs(parts.query).get("since", [None])[0]
+        with stub._lock:
+            generation = stub._generation
+            cleared = stub._cleared
+            seen = stub._count
+            publishes = list(stub._publishes)
+        if since is None:
+            backlog = []
+        elif since == "all":
+            backlog = publishes
+        else:
+            ids = [publish.id for publish in publishes]
+            if since in ids:
+                backlog = publishes[ids.index(since) + 1 :]
+            else:
+                start = float(since) if since.isdigit() else 0.0
+                backlog = [p for p in publishes if int(p.time) >= start]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.close_connection = True
+        event = {"id": secrets.token_hex(6), "time": int(time.time())}
+        try:
+            self._write_event({**event, "event": "open", "topic": topics})
+            while True:
+                for publish in backlog:
+                    if publish.topic in subscribed:
+                        self._write_event(publish._event())
+                with stub._received:
+                    received = stub._received.wait_for(
+                        lambda: stub._count > seen
+                        or stub._cleared != cleared
+                        or stub._generation != generation,
+                        stub.keepalive,
+                    )
+                    if stub._generation != generation:
+                        break
+                    if stub._cleared != cleared:
+                        # the notifications are counted from 0 again
+                        cleared = stub._cleared
+                        seen = 0
+                    # (the oldest new notifications may not be stored anymore)
+                    new = min(max(stub._count - seen, 0), len(stub._publishes))
+                    backlog = list(stub._publishes)[-new:] if new else []
+                    seen = stub._count
+                if not received:
+                    event = {"id": secrets.token_hex(6), "time": int(time.time())}
+                    self._write_event({**event, "event": "keepalive", "topic": topics})
+            self.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            # the subscriber disconnected
+            pass
+
+    def log_message(self, *args: typing.Any) -> None:
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+    stub: "NtfyStubServer"
+
+
+class NtfyStubServer:
+    """
+    Local stand-in for a ntfy server, running in background threads.
+    It accepts notifications published with PUT or POST requests to
+    {url}/{topic} (or as JSON to {url}), and stores them.
+
+    Args:
+      host: the server listens to this host
+      port: the server listens to this port (0: any free port)
+      latency: duration (in seconds) the server waits before replying
+      error_rate: probability for any request to be answered with error_status
+      error_status: see error_rate
+      max_stored: maximal number of notifications stored
+        (the oldest ones are forgotten first). 0 for load runs: the notifications
+        are counted (see the count property), but not stored.
+      keepalive: interval (in seconds) between the keepalive events sent to subscribers
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        max_stored: int = 100000,
+        keepalive: float = 45.0,
+    ) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.keepalive = keepalive
+        self._lock = threading.Lock()
+        self._received = threading.Condition(self._lock)
+        self._publishes: typing.Deque[Publish] = deque(maxlen=max_stored)
+        self._count = 0
+        self._replies: typing.Deque[_Reply] = deque()
+        # incremented to close the connections of the subscribers
+        self._generation = 0
+        # incremented by clear (see the subscriptions)
+        self._cleared = 0
+        self._server = _Server((host, port), _Handler)
+        self._server.stub = self
+        self._thread: typing.Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """
+        The url of the server, to be passed to the push functions
+        """
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    @property
+    def publishes(self) -> typing.List[Publish]:
+        """
+        The notifications received so far (in order of reception)
+        """
+        with self._lock:
+            return list(self._publishes)
+
+    @property
+    def count(self) -> int:
+        """
+        The number of notifications received so far
+        (including the ones no longer stored)
+        """
+        with self._lock:
+            return self._count
+
+    def clear(self) -> None:
+        """
+        Forgets the notifications received so far
+        """
+        with self._received:
+            self._publishes.clear()
+            self._count = 0
+            self._cleared += 1
+            self._received.notify_all()
+
+    def fail_next(
+        self, status: int, count: int = 1, retry_after: typing.Optional[str] = None
+    ) -> None:
+        """
+        The next 'count' requests (publishes or subscriptions) will be
+        answered with an error status (e.g. 429, 502, 503).
+
+        Args:
+          status: the HTTP status of the replies
+          count: number of publishes to answer with this status
+          retry_after: if not None, value of the Retry-After header of the replies
+        """
+        headers = {"Retry-After": retry_after} if retry_after is not None else {}
+        with self._lock:
+            self._replies.extend([_Reply(status, headers)] * count)
+
+    def disconnect_subscribers(self) -> None:
+        """
+        Closes the connections of the current subscribers
+        (e.g. to test their reconnection).
+        """
+        with self._received:
+            self._generation += 1
+            self._received.notify_all()
+
+    def wait_for(self, count: int, timeout: float = 5.0) -> bool:
+        """
+        Waits until at least 'count' notifications have been received.
+        Returns False if the timeout (in seconds) was reached first.
+        """
+        with self._received:
+            return self._received.wait_for(lambda: self._count >= count, timeout)
+
+    def _next_reply(self) -> typing.Optional[_Reply]:
+        with self._lock:
+            if self._replies:
+                return self._replies.popleft()
+        if self.error_rate and random.random() < self.error_rate:
+            return _Reply(self.error_status, {})
+        return None
+
+    def _store(
+        self,
+        method: str,
+        topic: str,
+        headers: typing.Dict[str, str],
+        body: bytes,
+        values: typing.Optional[typing.Dict[str, typing.Any]],
+    ) -> Publish:
+        publish = Publish(
+            secrets.token_hex(6), time.time(), method, topic, headers, body, values
+        )
+        with self._received:
+            self._publishes.append(publish)
+            self._count += 1
+            self._received.notify_all()
+        return publish
+
+    def start(self) -> None:
+        """
+        Starts serving (in a background thread)
+        """
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="NtfyStubServer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops serving
+        """
+        self.disconnect_subscribers()
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self) -> "NtfyStubServer":
+        self.start()
+        return self
+
+    def __exit__(self, _, __, ___) -> None:
+        self.stop()
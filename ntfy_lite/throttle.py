@@ -0,0 +1,180 @@
+"""
+Module defining the Throttling class, which configures the limitation of
+the number of records pushed by [ntfy_lite.handler.NtfyHandler][]
+(see its 'throttling' argument), per logger and per level.
+"""
+
+import time
+import random
+import typing
+
+
+class Throttling:
+    """
+    Configuration of the throttling of records by [ntfy_lite.handler.NtfyHandler][],
+    so that chatty loggers (or levels) do not crowd out the other notifications.
+
+    - limits: at most max_records records are pushed every interval seconds for each
+      logger name prefix. The prefixes follow the hierarchy of the loggers: the prefix
+      'app.db' applies to the loggers 'app.db' and 'app.db.pool' (but not 'app.dbx'),
+      and the prefix '' to all loggers. A record is subject to the longest matching
+      prefix only. The intervals are fixed windows, starting at the first record.
+
+    - sampling: a fraction of the records of a level is pushed, at random. The fraction
+      of a level applies to the higher levels, up to the next level of the mapping.
+      Levels below the lowest level of the mapping are not sampled.
+
+    ```python
+    # at most 10 notifications per minute for the loggers of 'app.db',
+    # 1% of the DEBUG, INFO and WARNING records, all the ERROR and CRITICAL records
+    handler = ntfy.NtfyHandler(
+        "my_topic",
+        throttling=ntfy.Throttling(
+            limits={"app.db": (10, 60.0)},
+            sampling={logging.DEBUG: 0.01, logging.ERROR: 1.0},
+        ),
+    )
+    ```
+
+    Checking a record takes a constant time (the matching prefix of a
+    logger name is looked up once, then cached).
+
+    Args:
+      limits: maps logger name prefixes to (max_records, interval in seconds)
+      sampling: maps logging levels to the fraction (between 0 and 1) of the records pushed
+      seed: seed of the random sampling (for reproducibility)
+    """
+
+    def __init__(
+        self,
+        limits: typing.Mapping[str, typing.Tuple[int, float]] = {},
+        sampling: typing.Mapping[int, float] = {},
+        seed: typing.Optional[int] = None,
+    ) -> None:
+        for prefix, (max_records, interval) in limits.items():
+            if max_records < 0 or interval <= 0:
+                raise ValueError(
+                    f"Throttling: invalid limit for prefix '{prefix}' "
+                    f"(got {max_records} records per {interval} seconds)"
+                )
+        for level, fraction in sampling.items():
+            if not 0 <= fraction <= 1:
+                raise ValueError(
+                    f"Throttling: the sampling fraction of level {level} "
+                    f"should be between 0 and 1 (got {fraction})"
+                )
+        self.limits = dict(limits)
+        self.sampling = dict(sampling)
+        self.seed = seed
+
+
+class ThrottlingStats(typing.NamedTuple):
+    """
+    Numbers of records dropped by the throttling of a
+    [ntfy_lite.handler.NtfyHandler][] (see [ntfy_lite.throttle.Throttling][]).
+    """
+
+    limited: typing.Dict[str, int]
+    """number of records dropped per logger name prefix (limits)"""
+
+    sampled: typing.Dict[int, int]
+    """number of records dropped per level (sampling)"""
+
+
+class _Window:
+    __slots__ = ("max_records", "interval", "end", "count")
+
+    def __init__(self, max_records: int, interval: float) -> None:
+        self.max_records = max_records
+        self.interval = interval
+        self.end = 0.0
+        self.count = 0
+
+
+# maximal number of logger names whose prefix is cached
+_MAX_NAMES = 4096
+
+
+class _Throttle:
+    """
+    State of the throttling of a handler.
+    Not thread safe (used under the lock of the handler).
+    """
+
+    def __init__(self, throttling: Throttling) -> None:
+        self._windows = {
+            prefix: _Window(max_records, interval)
+            for prefix, (max_records, interval) in throttling.limits.items()
+        }
+        self._sampling = sorted(throttling.sampling.items())
+        self._random = random.Random(throttling.seed)
+        # logger name -> longest matching prefix (None if none)
+        self._prefixes: typing.Dict[str, typing.Optional[str]] = {}
+        # levelno -> sampling fraction
+        self._fractions: typing.Dict[int, float] = {}
+        self._limited: typing.Dict[str, int] = {}
+        self._sampled: typing.Dict[int, int] = {}
+
+    def _prefix(self, name: str) -> typing.Optional[str]:
+        try:
+            return self._prefixes[name]
+        except KeyError:
+            pass
+        prefix: typing.Optional[str] = name
+        while prefix not in self._windows:
+            if not prefix:
+                prefix = None
+                break
+            prefix = prefix.rpartition(".")[0]
+        if len(self._prefixes) >= _MAX_NAMES:
+            self._prefixes.clear()
+        self._prefixes[name] = prefix
+        return prefix
+
+    def _fraction(self, levelno: int) -> float:
+        try:
+            return self._fractions[levelno]
+        except KeyError:
+            pass
+        fraction = 1.0
+        for level, value in self._sampling:
+            if level > levelno:
+                break
+            fraction = value
+        self._fractions[levelno] = fraction
+        return fraction
+
+    def sample(self, levelno: int) -> bool:
+        """
+        Returns False if the record should be dropped (sampling).
+        """
+        if not self._sampling:
+            return True
+        fraction = self._fraction(levelno)
+        if fraction >= 1.0 or self._random.random() < fraction:
+            return True
+        self._sampled[levelno] = self._sampled.get(levelno, 0) + 1
+        return False
+
+    def allow(self, name: str) -> bool:
+        """
+        Returns False if the record should be dropped (limits).
+        """
+        if not self._windows:
+            return True
+        prefix = self._prefix(name)
+        if prefix is None:
+            return True
+        window = self._windows[prefix]
+        now = time.monotonic()
+        if now >= window.end:
+            window.end = now + window.interval
+            window.count = 0
+        if window.count < window.max_records:
+            window.count += 1
+            return True
+        self._limited[prefix] = self._limited.get(prefix, 0) + 1
+        return False
+
+    def stats(self) -> ThrottlingStats:
+        return ThrottlingStats(dict(self._limited), dict(self._sampled))
@@ -1,8 +1,60 @@
 """
-Module defining the function 'validate_url'.
+Module defining the function 'validate_url', and the class 'ValidatedUrl'.
+
+The results of the validations are memoized (validating an URL is costly,
+and the same URLs tend to be validated over and over), see 'url_cache_info'.
 """
 import typing
-import validators
+import functools
+
+
+_URL_CACHE_SIZE = 1024
+
+
+class ValidatedUrl(str):
+    """
+    A string which is known to be a valid URL: it is validated once
+    upon construction, and [ntfy_lite.utils.validate_url][] does not
+    validate it again.
+
+    ```python
+    import ntfy_lite as ntfy
+
+    click = ntfy.ValidatedUrl("https://ntfy.sh")  # ValueError if not an url
+
+    for message in messages:
+        ntfy.push("my topic", "my title", message=message, click=click)
+    ```
+    """
+
+    def __new__(cls, value: str) -> "ValidatedUrl":
+        validate_url("ValidatedUrl", value)
+        return super().__new__(cls, value)
+
+
+@functools.lru_cache(maxsize=_URL_CACHE_SIZE)
+def _is_url(value: str) -> bool:
+    # imported here so that importing ntfy_lite remains fast
+    # (validators is slow to import)
+    import validators
+
+    return validators.url(value) is True
+
+
+def url_cache_info() -> "functools._CacheInfo":
+    """
+    Returns the hits, misses, maxsize and currsize of the
+    cache of the results of URL validations.
+    """
+    return _is_url.cache_info()
+
+
+def clear_url_cache() -> None:
+    """
+    Empties the cache of the results of URL validations
+    (and resets its statistics).
+    """
+    _is_url.cache_clear()
 
 
 def validate_url(attribute: str, value: typing.Optional[str]) -> None:
@@ -15,8 +67,8 @@ def validate_url(attribute: str, value: typing.Optional[str]) -> None:
         raised ValueError
       value: the string to check
     """
-    if value is None:
+    if value is None or type(value) is ValidatedUrl:
         return
-    if validators.url(value) is not True:
+    if not _is_url(value):
         raise ValueError(f"the value for {attribute} ({value}) is not an url")
     return
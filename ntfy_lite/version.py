@@ -1,3 +1,13 @@
-from importlib import metadata
+import typing
 
-__version__ = metadata.version("ntfy_lite")
+
+def __getattr__(name: str) -> typing.Any:
+    # the version is looked up only when requested, as
+    # importlib.metadata scans the installed distributions
+    if name == "__version__":
+        from importlib import metadata
+
+        version = metadata.version("ntfy_lite")
+        globals()["__version__"] = version
+        return version
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
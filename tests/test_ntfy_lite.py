@@ -1,8 +1,20 @@
 import pytest
+import asyncio
 import typing
 import logging
+import threading
+import time
+import sys
+import subprocess
+import multiprocessing
 import tempfile
+import requests
 import ntfy_lite as ntfy
+from ntfy_lite.error import NtfyError, RateLimitError
+from ntfy_lite.tail import _read_tail
+from ntfy_lite.spool import _encode
+from ntfy_lite.record import _Record
+from ntfy_lite.testing import NtfyStubServer
 from pathlib import Path
 
 
@@ -253,3 +265,1561 @@ def test_handler(
             assert _callback_called
         else:
             assert not _callback_called
+
+
+def test_client_push():
+    topic = "ntfy_lite_test"
+    title = "ntfy lite test client push"
+    message = "ntfy lite test client push: message"
+    with ntfy.NtfyClient() as client:
+        client.push(topic, title, message=message, dry_run=True)
+        ntfy.push(topic, title, message=message, dry_run=True, client=client)
+
+
+def test_client_url():
+    # without url argument, push sends to the server of the client
+    with NtfyStubServer() as server:
+        with ntfy.NtfyClient(url=server.url) as client:
+            ntfy.push("topic", "title", message="via client", client=client)
+        assert [p.message for p in server.publishes] == ["via client"]
+
+
+def test_client_invalid_pool_size():
+    with pytest.raises(ValueError):
+        ntfy.NtfyClient(pool_size=0)
+
+
+class _Response:
+    def __init__(
+        self, status_code: int = 200, headers: typing.Optional[dict] = None
+    ) -> None:
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.reason = "OK" if self.ok else "error"
+        self.headers = headers or {}
+
+
+def test_client_shared_session(monkeypatch):
+    topic = "ntfy_lite_test"
+    title = "ntfy lite test client push"
+    message = "ntfy lite test client push: message"
+    urls: typing.List[str] = []
+
+    def _put(url, data=None, headers=None, timeout=None):
+        urls.append(url)
+        return _Response()
+
+    with ntfy.NtfyClient(url="http://localhost:8080") as client:
+        monkeypatch.setattr(client._session, "put", _put)
+        client.push(topic, title, message=message)
+        ntfy.push(topic, title, message=message, url=None, client=client)
+        handler = ntfy.NtfyHandler(topic, client=client)
+        handler.emit(
+            logging.LogRecord(
+                "test record", logging.INFO, "", -1, "record message", None, None
+            )
+        )
+    assert urls == [f"http://localhost:8080/{topic}"] * 3
+
+
+def _record(message: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord("test record", level, "", -1, message, None, None)
+
+
+def test_handler_async(monkeypatch):
+    sent: typing.List[str] = []
+
+    def _put(url, data=None, headers=None, timeout=None):
+        sent.append(data)
+        return _Response()
+
+    client = ntfy.NtfyClient(url="http://localhost:8080")
+    monkeypatch.setattr(client._session, "put", _put)
+    handler = ntfy.NtfyHandler(
+        "ntfy_lite_test", client=client, queue_size=10, workers=2
+    )
+    for index in range(5):
+        handler.emit(_record(f"message {index}"))
+    handler.close()
+    assert sorted(sent) == [f"message {index}" for index in range(5)]
+
+
+@pytest.mark.parametrize(
+    "overflow,expected",
+    [
+        (ntfy.Overflow.drop_newest, ["message 0", "message 1"]),
+        (ntfy.Overflow.drop_oldest, ["message 0", "message 2"]),
+    ],
+)
+def test_handler_async_overflow(monkeypatch, overflow, expected):
+    sent: typing.List[str] = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def _put(url, data=None, headers=None, timeout=None):
+        started.set()
+        release.wait()
+        sent.append(data)
+        return _Response()
+
+    client = ntfy.NtfyClient(url="http://localhost:8080")
+    monkeypatch.setattr(client._session, "put", _put)
+    handler = ntfy.NtfyHandler(
+        "ntfy_lite_test", client=client, queue_size=1, overflow=overflow
+    )
+    handler.emit(_record("message 0"))
+    started.wait()
+    handler.emit(_record("message 1"))
+    handler.emit(_record("message 2"))
+    release.set()
+    handler.flush()
+    handler.close()
+    assert sent == expected
+
+
+def test_handler_async_flush_timeout(monkeypatch):
+    release = threading.Event()
+
+    def _put(url, data=None, headers=None, timeout=None):
+        release.wait()
+        return _Response()
+
+    client = ntfy.NtfyClient(url="http://localhost:8080")
+    monkeypatch.setattr(client._session, "put", _put)
+    handler = ntfy.NtfyHandler(
+        "ntfy_lite_test", client=client, queue_size=5, flush_timeout=0.1
+    )
+    handler.emit(_record("message"))
+    start = time.monotonic()
+    handler.close()
+    assert time.monotonic() - start < 1.0
+    release.set()
+
+
+@pytest.mark.parametrize("dry_run", [ntfy.DryRun.on, ntfy.DryRun.error])
+def test_async_push_dry_run(dry_run):
+    topic = "ntfy_lite_test"
+    title = "ntfy lite test async push"
+    message = "ntfy lite test async push: message"
+    coroutine = ntfy.async_push(topic, title, message=message, dry_run=dry_run)
+    if dry_run == ntfy.DryRun.error:
+        with pytest.raises(NtfyError):
+            asyncio.run(coroutine)
+    else:
+        asyncio.run(coroutine)
+
+
+def test_async_client():
+    web = pytest.importorskip("aiohttp.web")
+    bodies: typing.List[bytes] = []
+    in_flight = [0, 0]  # current, max
+
+    async def _publish(request):
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight)
+        await asyncio.sleep(0.01)
+        bodies.append(await request.read())
+        in_flight[0] -= 1
+        return web.Response(text='{"id":"test"}')
+
+    async def _run(filepath: Path):
+        app = web.Application()
+        app.router.add_put("/{topic}", _publish)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # type: ignore
+        try:
+            async with ntfy.AsyncNtfyClient(
+                url=f"http://127.0.0.1:{port}", max_concurrency=2
+            ) as client:
+                await asyncio.gather(
+                    *[
+                        client.push("ntfy_lite_test", "title", message=f"message {i}")
+                        for i in range(6)
+                    ],
+                    client.push("ntfy_lite_test", "title", filepath=filepath),
+                )
+        finally:
+            await runner.cleanup()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = Path(tmp) / "test.txt"
+        with open(filepath, "w") as f:
+            f.write("test content")
+        asyncio.run(_run(filepath))
+
+    assert len(bodies) == 7
+    assert b"test content" in bodies
+    assert in_flight[1] <= 2
+
+
+def _capturing_client(
+    monkeypatch, responses: typing.Sequence[_Response] = ()
+) -> typing.Tuple[ntfy.NtfyClient, typing.List[typing.Tuple[dict, typing.Any]]]:
+    # client whose requests are not sent, but appended to the returned list.
+    # The requests are replied by the responses (then by 200 responses).
+    sent: typing.List[typing.Tuple[dict, typing.Any]] = []
+    replies = list(responses)
+
+    def _put(url, data=None, headers=None, timeout=None):
+        if not isinstance(data, str):
+            data = data.read()
+        sent.append((dict(headers), data))
+        return replies.pop(0) if replies else _Response()
+
+    client = ntfy.NtfyClient(url="http://localhost:8080")
+    monkeypatch.setattr(client._session, "put", _put)
+    return client, sent
+
+
+def test_handler_coalescing(monkeypatch):
+    client, sent = _capturing_client(monkeypatch)
+    handler = ntfy.NtfyHandler(
+        "ntfy_lite_test",
+        client=client,
+        coalescing=ntfy.Coalescing(window=60.0, max_listed=5),
+    )
+    for index in range(50):
+        handler.emit(_record(f"message {index}", logging.ERROR))
+    handler.emit(_record("info message", logging.INFO))
+    assert not sent
+    handler.close()
+    assert len(sent) == 2
+    headers, data = sent[0]
+    assert headers["Title"] == "test record (50 records)"
+    assert headers["Priority"] == ntfy.Priority.HIGH.value
+    assert data.splitlines() == [
+        f"test record: message {index}" for index in range(5)
+    ] + ["(45 more suppressed)"]
+    headers, data = sent[1]
+    assert headers["Title"] == "test record"
+    assert data == "info message"
+
+
+def test_handler_coalescing_max_records(monkeypatch):
+    client, sent = _capturing_client(monkeypatch)
+    handler = ntfy.NtfyHandler(
+        "ntfy_lite_test",
+        client=client,
+        coalescing=ntfy.Coalescing(window=60.0, max_records=3),
+    )
+    for index in range(7):
+        handler.emit(_record(f"message {index}"))
+    assert len(sent) == 2
+    handler.close()
+    assert len(sent) == 3
+    assert sent[2][1] == "message 6"
+
+
+def test_handler_coalescing_window(monkeypatch):
+    client, sent = _capturing_client(monkeypatch)
+    handler = ntfy.NtfyHandler(
+        "ntfy_lite_test",
+        client=client,
+        coalescing=ntfy.Coalescing(window=0.05, per_level=False),
+    )
+    handler.emit(_record("info message", logging.INFO))
+    handler.emit(_record("critical message", logging.CRITICAL))
+    deadline = time.monotonic() + 5.0
+    while not sent and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(sent) == 1
+    assert sent[0][0]["Priority"] == ntfy.Priority.MAX.value
+    handler.close()
+    assert len(sent) == 1
+
+
+def test_handler_coalescing_unmapped_level(monkeypatch):
+    client, sent = _capturing_client(monkeypatch)
+    handler = ntfy.NtfyHandler(
+        "ntfy_lite_test",
+        client=client,
+        coalescing=ntfy.Coalescing(window=3600.0, per_level=False),
+    )
+    handled: typing.List[logging.LogRecord] = []
+    monkeypatch.setattr(handler, "handleError", handled.append)
+    handler.emit(_record("info message", logging.INFO))
+    # (level 45 is not in level2priority)
+    handler.emit(_record("custom message", 45))
+    handler.emit(_record("error message", logging.ERROR))
+    handler.close()
+    assert [r.msg for r in handled] == ["custom message"]
+    # the digest of the other records is pushed, with the highest mapped level
+    assert len(sent) == 1
+    assert sent[0][0]["Priority"] == ntfy.Priority.HIGH.value
+    assert sent[0][1] == "test record: info message\ntest record: error message"
+
+
+def test_rate_limiter_invalid_reserve():
+    ntfy.RateLimiter(rate=1, burst=2, reserve=1)
+    with pytest.raises(ValueError):
+        ntfy.RateLimiter(rate=1, burst=2, reserve=1.5)
+
+
+def test_rate_limiter_reserve(monkeypatch):
+    client, sent = _capturing_client(monkeypatch)
+    limiter = ntfy.RateLimiter(rate=0.001, burst=3, reserve=1, max_wait=0.0)
+    topic = "ntfy_lite_test"
+    for _ in range(2):
+        client.push(topic, "title", message="message", rate_limiter=limiter)
+    with pytest.raises(RateLimitError):
+        client.push(topic, "title", message="message", rate_limiter=limiter)
+    high = ntfy.Priority.HIGH
+    client.push(topic, "title", message="message", priority=high, rate_limiter=limiter)
+    with pytest.raises(RateLimitError):
+        client.push(
+            topic, "title", message="message", priority=high, rate_limiter=limiter
+        )
+    assert len(sent) == 3
+
+
+def test_rate_limiter_topics(monkeypatch):
+    client, sent = _capturing_client(monkeypatch)
+    limiter = ntfy.RateLimiter(topic_rate=0.001, topic_burst=1, max_wait=0.0)
+    client.push("topic1", "title", message="message", rate_limiter=limiter)
+    client.push("topic2", "title", message="message", rate_limiter=limiter)
+    with pytest.raises(RateLimitError):
+        client.push("topic1", "title", message="message", rate_limiter=limiter)
+    assert len(sent) == 2
+
+
+@pytest.mark.parametrize("use_file", [True, False])
+def test_rate_limiter_retry_after(monkeypatch, use_file):
+    client, sent = _capturing_client(
+        monkeypatch, [_Response(429, {"Retry-After": "0.1"})]
+    )
+    limiter = ntfy.RateLimiter()
+    start = time.monotonic()
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = Path(tmp) / "test.txt"
+        with open(filepath, "w") as f:
+            f.write("test content")
+        if use_file:
+            client.push("topic", "title", filepath=filepath, rate_limiter=limiter)
+        else:
+            client.push("topic", "title", message="test content", rate_limiter=limiter)
+    assert time.monotonic() - start >= 0.1
+    assert len(sent) == 2
+    assert sent[1][1] in ("test content", b"test content")
+
+
+def test_rate_limiter_handler(monkeypatch):
+    client, sent = _capturing_client(
+        monkeypatch, [_Response(429, {"Retry-After": "60"})]
+    )
+    errors: typing.List[Exception] = []
+    handler = ntfy.NtfyHandler(
+        "ntfy_lite_test",
+        client=client,
+        error_callback=errors.append,
+        rate_limiter=ntfy.RateLimiter(max_wait=0.1),
+    )
+    handler.emit(_record("message 1"))
+    handler.emit(_record("message 2"))
+    # the second record is not sent: the server is paused
+    assert len(sent) == 1
+    assert all(isinstance(error, RateLimitError) for error in errors)
+
+
+@pytest.mark.parametrize("use_file", [True, False])
+def test_retry(monkeypatch, use_file):
+    client, sent = _capturing_client(monkeypatch, [_Response(503), _Response(502)])
+    retry = ntfy.RetryPolicy(max_attempts=3, backoff=0.01)
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = Path(tmp) / "test.txt"
+        with open(filepath, "w") as f:
+            f.write("test content")
+        if use_file:
+            client.push("topic", "title", filepath=filepath, retry=retry)
+        else:
+            client.push("topic", "title", message="test content", retry=retry)
+    assert [data for _, data in sent] == [sent[0][1]] * 3
+    assert sent[0][1] in ("test content", b"test content")
+    stats = retry.stats()
+    assert stats.retried_pushes == 1
+    assert stats.retries == 2
+    assert stats.extra_time >= 0.01
+
+
+def test_retry_exhausted(monkeypatch):
+    client, sent = _capturing_client(monkeypatch, [_Response(503)] * 5)
+    retry = ntfy.RetryPolicy(max_attempts=2, backoff=0.0)
+    with pytest.raises(NtfyError) as error:
+        client.push("topic", "title", message="message", retry=retry)
+    assert error.value.status_code == 503
+    assert len(sent) == 2
+
+
+def test_retry_not_retryable(monkeypatch):
+    client, sent = _capturing_client(monkeypatch, [_Response(400)])
+    retry = ntfy.RetryPolicy(backoff=0.0)
+    with pytest.raises(NtfyError):
+        client.push("topic", "title", message="message", retry=retry)
+    assert len(sent) == 1
+    assert retry.stats().retries == 0
+
+
+def test_retry_exceptions(monkeypatch):
+    attempts: typing.List[int] = []
+
+    def _put(url, data=None, headers=None, timeout=None):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise requests.ConnectionError("connection reset")
+        return _Response()
+
+    client = ntfy.NtfyClient(url="http://localhost:8080")
+    monkeypatch.setattr(client._session, "put", _put)
+    with pytest.raises(requests.ConnectionError):
+        client.push("topic", "title", message="message")
+    attempts.clear()
+    handler = ntfy.NtfyHandler(
+        "topic", client=client, retry=ntfy.RetryPolicy(backoff=0.0)
+    )
+    handler.emit(_record("message"))
+    assert len(attempts) == 3
+
+
+def test_retry_budget():
+    retry = ntfy.RetryPolicy(
+        max_attempts=10, backoff=1.0, multiplier=2.0, jitter=0.0, max_duration=5.0
+    )
+    assert retry.delay(0, 0.0) == 1.0
+    assert retry.delay(1, 1.0) == 2.0
+    assert retry.delay(2, 3.0) is None
+    assert retry.delay(9, 0.0) is None
+
+
+def test_handler_deduplication(monkeypatch):
+    client, sent = _capturing_client(monkeypatch)
+    handler = ntfy.NtfyHandler(
+        "ntfy_lite_test",
+        client=client,
+        deduplication=ntfy.Deduplication(ttl=0.2),
+    )
+    for _ in range(3):
+        handler.emit(_record("message a"))
+        handler.emit(_record("message b"))
+    handler.emit(_record("message a", logging.ERROR))
+    assert [data for _, data in sent] == ["message a", "message b", "message a"]
+    time.sleep(0.25)
+    handler.emit(_record("message a"))
+    assert sent[-1][1] == "message a\n(2 similar records suppressed)"
+
+
+def test_handler_deduplication_bounded(monkeypatch):
+    client, sent = _capturing_client(monkeypatch)
+    handler = ntfy.NtfyHandler(
+        "ntfy_lite_test",
+        client=client,
+        deduplication=ntfy.Deduplication(ttl=60.0, max_size=10),
+    )
+    for index in range(100):
+        handler.emit(
+            logging.LogRecord(
+                f"logger {index}", logging.INFO, "", -1, "message", None, None
+            )
+        )
+    assert handler._dedup is not None
+    assert len(handler._dedup) == 10
+    assert len(sent) == 100
+    # logger 0 was forgotten, logger 99 was not
+    handler.emit(
+        logging.LogRecord("logger 0", logging.INFO, "", -1, "message", None, None)
+    )
+    handler.emit(
+        logging.LogRecord("logger 99", logging.INFO, "", -1, "message", None, None)
+    )
+    assert len(sent) == 101
+
+
+def test_handler_twice_in_a_row(monkeypatch):
+    client, sent = _capturing_client(monkeypatch)
+    handler = ntfy.NtfyHandler("ntfy_lite_test", client=client, twice_in_a_row=False)
+    handler.emit(_record("message"))
+    handler.emit(_record("message"))
+    assert len(sent) == 1
+
+
+def test_url_cache():
+    ntfy.clear_url_cache()
+    for _ in range(3):
+        ntfy.ViewAction("ntfy_lite view action", "https://is.mpg.de")
+    info = ntfy.url_cache_info()
+    assert info.misses == 1
+    assert info.hits == 2
+    with pytest.raises(ValueError):
+        ntfy.ViewAction("ntfy_lite view action", "not a valid url !")
+    with pytest.raises(ValueError):
+        ntfy.ViewAction("ntfy_lite view action", "not a valid url !")
+
+
+def test_validated_url():
+    with pytest.raises(ValueError):
+        ntfy.ValidatedUrl("not a valid url !")
+    click = ntfy.ValidatedUrl("https://is.mpg.de")
+    assert click == "https://is.mpg.de"
+    ntfy.clear_url_cache()
+    ntfy.push("ntfy_lite_test", "title", message="message", click=click, dry_run=True)
+    assert ntfy.url_cache_info().misses == 0
+
+
+def test_handler_headers(monkeypatch):
+    client, sent = _capturing_client(monkeypatch)
+    handler = ntfy.NtfyHandler(
+        "ntfy_lite_test",
+        client=client,
+        level2email={logging.ERROR: "mimolette@fromage.fr"},
+    )
+    handler.emit(_record("error message", logging.ERROR))
+    handler.emit(_record("info message", logging.INFO))
+    assert sent[0][0] == {
+        "Title": "test record",
+        "Email": "mimolette@fromage.fr",
+        "Priority": ntfy.Priority.HIGH.value,
+        "Tags": "broken_heart",
+    }
+    assert sent[1][0] == {
+        "Title": "test record",
+        "Priority": ntfy.Priority.DEFAULT.value,
+        "Tags": "artificial_satellite",
+    }
+
+
+@pytest.mark.parametrize(
+    "max_bytes,max_lines,expected",
+    [
+        (10, None, b"line 9999\n"),
+        (1024 * 1024, 3, b"line 9997\nline 9998\nline 9999\n"),
+        (15, 3, b"line 9999\n"),
+        (1024 * 1024, 20000, b"".join(b"line %d\n" % i for i in range(10000))),
+    ],
+)
+def test_tail(max_bytes, max_lines, expected):
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = Path(tmp) / "test.txt"
+        with open(filepath, "wb") as f:
+            for index in range(10000):
+                f.write(b"line %d\n" % index)
+        assert _read_tail(filepath, ntfy.Tail(max_bytes, max_lines)) == expected
+
+
+def test_tail_push(monkeypatch):
+    client, sent = _capturing_client(monkeypatch)
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = Path(tmp) / "test.txt"
+        with open(filepath, "w") as f:
+            f.write("first line\nsecond line\nthird line")
+        client.push("topic", "title", filepath=filepath, tail=ntfy.Tail(max_lines=2))
+        handler = ntfy.NtfyHandler(
+            "topic",
+            client=client,
+            level2filepath={logging.ERROR: filepath},
+            tail=ntfy.Tail(max_bytes=10),
+        )
+        handler.emit(_record("message", logging.ERROR))
+    assert sent[0][1] == b"second line\nthird line"
+    assert sent[1][1] == b"third line"
+
+
+def test_lazy_imports():
+    # importing ntfy_lite should not import the modules
+    # which are slow to import, nor the optional features
+    lazy = (
+        "requests",
+        "validators",
+        "asyncio",
+        "aiohttp",
+        "importlib.metadata",
+        "mmap",
+        "multiprocessing",
+        "concurrent.futures",
+        "ntfy_lite.fanout",
+        "ntfy_lite.metrics",
+        "ntfy_lite.subscription",
+    )
+    check = (
+        "import sys, ntfy_lite; "
+        f"print(' '.join(m for m in {lazy!r} if m in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", check], check=True, capture_output=True, text=True
+    )
+    assert output.stdout.strip() == ""
+    # (imported when used)
+    assert ntfy.push_many is ntfy.fanout.push_many
+    assert "Metrics" in dir(ntfy)
+    with pytest.raises(AttributeError):
+        ntfy.missing
+
+
+def test_version():
+    assert isinstance(ntfy.__version__, str)
+
+
+def test_stub_server():
+    with NtfyStubServer() as server:
+        ntfy.push("topic1", "title1", message="message1", url=server.url)
+        with ntfy.NtfyClient(url=server.url) as client:
+            client.push("topic2", "title2", message="message2", tags=["tag"])
+        publishes = server.publishes
+    assert [p.topic for p in publishes] == ["topic1", "topic2"]
+    assert [p.message for p in publishes] == ["message1", "message2"]
+    assert publishes[0].method == "PUT"
+    assert publishes[1].headers["Title"] == "title2"
+    assert publishes[1].headers["Tags"] == "tag"
+
+
+def test_stub_server_errors():
+    with NtfyStubServer() as server:
+        server.fail_next(503)
+        with pytest.raises(NtfyError) as error:
+            ntfy.push("topic", "title", message="message", url=server.url)
+        assert error.value.status_code == 503
+        assert server.count == 0
+
+        # injected 5xx, then 429 with Retry-After: retried over real HTTP
+        server.fail_next(503)
+        server.fail_next(429, retry_after="0.1")
+        retry = ntfy.RetryPolicy(backoff=0.01)
+        start = time.monotonic()
+        ntfy.push(
+            "topic",
+            "title",
+            message="message",
+            url=server.url,
+            retry=retry,
+            rate_limiter=ntfy.RateLimiter(),
+        )
+        assert time.monotonic() - start >= 0.1
+        assert retry.stats().retries == 1
+        assert [p.message for p in server.publishes] == ["message"]
+
+
+def test_stub_server_load():
+    nb = 200
+    with NtfyStubServer(latency=0.001, max_stored=10) as server:
+        handler = ntfy.NtfyHandler("topic", url=server.url, queue_size=nb, workers=8)
+        for index in range(nb):
+            handler.emit(_record(f"message {index}"))
+        handler.close()
+        assert server.wait_for(nb, timeout=10.0)
+        assert server.count == nb
+        assert len(server.publishes) == 10
+
+
+@pytest.mark.parametrize("use_file", [False, True])
+def test_push_many(use_file):
+    topics = [f"topic{index}" for index in range(10)]
+    with NtfyStubServer(latency=0.1) as server, tempfile.TemporaryDirectory() as tmp:
+        filepath = Path(tmp) / "test.txt"
+        filepath.write_bytes(b"file content")
+        data = {"filepath": filepath} if use_file else {"message": "message"}
+        server.fail_next(503, count=2)
+        start = time.monotonic()
+        results = ntfy.push_many(
+            topics, "title", url=server.url, tags="tag", workers=10, **data
+        )
+        # concurrent pushes
+        assert time.monotonic() - start < 0.5
+        publishes = server.publishes
+    assert [r.topic for r in results] == topics
+    failed = [r for r in results if not r.ok]
+    assert len(failed) == 2
+    assert all(isinstance(r.error, NtfyError) for r in failed)
+    assert sorted(p.topic for p in publishes) == sorted(
+        r.topic for r in results if r.ok
+    )
+    expected = b"file content" if use_file else b"message"
+    assert all(p.body == expected and p.headers["Tags"] == "tag" for p in publishes)
+
+
+def test_push_many_invalid():
+    with pytest.raises(ValueError):
+        ntfy.push_many(["topic"], "title", message="message", click="not an url")
+    results = ntfy.push_many(
+        ["topic1", "topic2"], "title", message="message", dry_run=ntfy.DryRun.error
+    )
+    assert [r.ok for r in results] == [False, False]
+
+
+def test_push_batch():
+    notifications = [
+        ntfy.Notification(
+            f"topic{index}",
+            "title",
+            f"message {index} \u2713",
+            priority=ntfy.Priority.HIGH,
+            tags=["tag1", "tag2"],
+            actions=ntfy.HttpAction(
+                "label",
+                "https://ntfy.sh",
+                method=ntfy.HttpMethod.POST,
+                headers={"key": "value"},
+            ),
+        )
+        for index in range(20)
+    ]
+    notifications.append(ntfy.Notification("topic", "title", "message", icon="no url"))
+    with NtfyStubServer() as server:
+        server.fail_next(503)
+        results = ntfy.push_batch(notifications, url=server.url, workers=4)
+        publishes = server.publishes
+    assert [r.topic for r in results] == [n.topic for n in notifications]
+    assert isinstance(results[-1].error, ValueError)
+    assert sum(not r.ok for r in results) == 2
+    assert len(publishes) == 19
+    publish = min(publishes, key=lambda p: p.topic)
+    assert publish.json is not None
+    assert publish.method == "PUT"
+    assert publish.message == f"message {publish.topic[5:]} \u2713"
+    assert publish.json["priority"] == 4
+    assert publish.json["tags"] == ["tag1", "tag2"]
+    assert publish.json["actions"] == [
+        {
+            "action": "http",
+            "label": "label",
+            "url": "https://ntfy.sh",
+            "clear": False,
+            "method": "POST",
+            "headers": {"key": "value"},
+        }
+    ]
+
+
+def _log_from_worker(queue, index):
+    handler = ntfy.NtfyQueueHandler(queue)
+    for name in ("workers", f"worker{index}"):
+        logger = logging.getLogger(name)
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(handler)
+    logging.getLogger("workers").error("same message")
+    logging.getLogger(f"worker{index}").info(f"message {index}")
+    logging.getLogger(f"worker{index}").debug("below the level of the listener")
+
+
+@pytest.mark.parametrize("method", ["fork", "spawn"])
+def test_queue_listener(method):
+    if method not in multiprocessing.get_all_start_methods():
+        pytest.skip(f"{method} not supported")
+    context = multiprocessing.get_context(method)
+    with NtfyStubServer() as server:
+        handler = ntfy.NtfyHandler(
+            "topic", url=server.url, deduplication=ntfy.Deduplication()
+        )
+        handler.setLevel(logging.INFO)
+        with ntfy.NtfyQueueListener(handler, context.Queue()) as listener:
+            processes = [
+                context.Process(target=_log_from_worker, args=(listener.queue, index))
+                for index in range(3)
+            ]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+        publishes = server.publishes
+    # the deduplication is shared by the processes
+    assert sorted((p.headers["Title"], p.message) for p in publishes) == [
+        ("worker0", "message 0"),
+        ("worker1", "message 1"),
+        ("worker2", "message 2"),
+        ("workers", "same message"),
+    ]
+
+
+def test_queue_listener_filters_errors(monkeypatch):
+    import queue
+
+    with NtfyStubServer() as server:
+        handler = ntfy.NtfyHandler("topic", url=server.url)
+        handler.addFilter(lambda record: record.name != "filtered")
+        errors: typing.List[str] = []
+        monkeypatch.setattr(handler, "handleError", lambda r: errors.append(r.msg))
+        handle = handler._handle
+
+        def _handle(record, original=None):
+            if record.msg == "boom":
+                raise RuntimeError("boom")
+            handle(record, original)
+
+        monkeypatch.setattr(handler, "_handle", _handle)
+        with ntfy.NtfyQueueListener(handler, queue.Queue()) as listener:
+            queue_handler = listener.handler()
+            for name, msg in (("filtered", "no"), ("a", "boom"), ("a", "after")):
+                queue_handler.emit(
+                    logging.LogRecord(name, logging.ERROR, "", -1, msg, None, None)
+                )
+        assert [p.message for p in server.publishes] == ["after"]
+    assert errors == ["boom"]
+
+
+def test_queue_listener_formatting(monkeypatch):
+    import queue
+    import pickle
+
+    # the records are formatted by the listener, only if pushed
+    records: queue.Queue = queue.Queue()
+    logger = logging.getLogger("queue_formatting")
+    logger.propagate = False
+    queue_handler = ntfy.NtfyQueueHandler(records)
+    logger.addHandler(queue_handler)
+    try:
+        logger.error("value %d", 1)
+        logger.error("value %d", 2)
+        logger.error("object %s", threading.Lock())
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("failed")
+    finally:
+        logger.removeHandler(queue_handler)
+    items = [records.get_nowait() for _ in range(4)]
+    # (sent over multiprocessing queues)
+    assert [pickle.loads(pickle.dumps(item)) for item in items] == items
+    with NtfyStubServer() as server:
+        handler = ntfy.NtfyHandler(
+            "topic", url=server.url, deduplication=ntfy.Deduplication()
+        )
+        handler.setFormatter(logging.Formatter("%(funcName)s: %(message)s"))
+        formatted: typing.List[str] = []
+        format = handler.format
+
+        def _format(record: logging.LogRecord) -> str:
+            formatted.append(record.getMessage())
+            return format(record)
+
+        monkeypatch.setattr(handler, "format", _format)
+        with ntfy.NtfyQueueListener(handler, queue.Queue()) as listener:
+            for item in items:
+                listener.queue.put(item)
+        messages = [p.message for p in server.publishes]
+    assert len(formatted) == 3
+    assert messages[0] == "test_queue_listener_formatting: value 1"
+    assert messages[1].startswith("test_queue_listener_formatting: object <")
+    assert messages[2].startswith("test_queue_listener_formatting: failed\nTraceback")
+    assert messages[2].endswith("ValueError: boom")
+
+
+def _push_from_child(client, sender, connection):
+    sender.put("child")
+    sender.flush(5.0)
+    client.push("topic", "title", message="from child")
+    connection.send(client._session is not _session_before_fork[0])
+
+
+_session_before_fork: typing.List[typing.Any] = []
+
+
+def test_fork_safety():
+    if "fork" not in multiprocessing.get_all_start_methods():
+        pytest.skip("fork not supported")
+    context = multiprocessing.get_context("fork")
+    with NtfyStubServer() as server:
+        with ntfy.NtfyClient(url=server.url) as client:
+            client.push("topic", "title", message="before fork")
+            _session_before_fork[:] = [client._session]
+            sent: typing.List[str] = []
+            sender = ntfy.background._BackgroundSender(
+                sent.append, 10, 1, ntfy.Overflow.block, "test"
+            )
+            parent, child = context.Pipe()
+            process = context.Process(
+                target=_push_from_child, args=(client, sender, child)
+            )
+            process.start()
+            assert parent.recv(), "the child process reused the connection pool"
+            process.join()
+            assert process.exitcode == 0
+            client.push("topic", "title", message="after fork")
+            sender.put("parent")
+            sender.close(5.0)
+        messages = [p.message for p in server.publishes]
+    assert messages == ["before fork", "from child", "after fork"]
+    assert sent == ["parent"]
+
+
+def test_background_sender_errors(capsys):
+    sent: typing.List[int] = []
+
+    def _send(item: int) -> None:
+        if item % 2:
+            raise RuntimeError(f"failed {item}")
+        sent.append(item)
+
+    failed: typing.List[int] = []
+    sender = ntfy.background._BackgroundSender(
+        _send, 2, 1, ntfy.Overflow.block, "test", failed=failed.append
+    )
+    for item in range(10):
+        sender.put(item)
+    assert sender.close(5.0)
+    # the worker survived the errors
+    assert sent == [0, 2, 4, 6, 8]
+    assert failed == [1, 3, 5, 7, 9]
+    # without 'failed', the tracebacks are printed
+    sender = ntfy.background._BackgroundSender(_send, 2, 1, ntfy.Overflow.block, "test")
+    sender.put(1)
+    sender.put(2)
+    assert sender.close(5.0)
+    assert sent[-1] == 2
+    assert "RuntimeError: failed 1" in capsys.readouterr().err
+
+
+def test_handler_worker_errors(monkeypatch):
+    def _callback(error: Exception) -> None:
+        raise RuntimeError("callback failed")
+
+    handled: typing.List[logging.LogRecord] = []
+    with NtfyStubServer() as server:
+        handler = ntfy.NtfyHandler(
+            "topic",
+            url=server.url,
+            queue_size=10,
+            error_callback=_callback,
+        )
+        monkeypatch.setattr(handler, "handleError", handled.append)
+        server.fail_next(400)
+        handler.emit(_record("message 1"))
+        handler.emit(_record("message 2"))
+        handler.close()
+        assert [r.msg for r in handled] == ["message 1"]
+        assert [p.message for p in server.publishes] == ["message 2"]
+
+
+def test_spool():
+    errors: typing.List[Exception] = []
+    with NtfyStubServer(error_rate=1.0) as server, tempfile.TemporaryDirectory() as tmp:
+        spool = ntfy.Spool(Path(tmp) / "spool", interval=3600.0)
+        handler = ntfy.NtfyHandler(
+            "topic", url=server.url, spool=spool, error_callback=errors.append
+        )
+        assert handler._spool is not None
+        for index in range(5):
+            handler.emit(_record(f"message {index}"))
+        assert len(errors) == 5
+        assert handler._spool.spooled == 5
+        # the server is still failing
+        assert not handler._spool.replay()
+        assert server.count == 0
+        server.error_rate = 0.0
+        server.fail_next(503)
+        handler.emit(_record("message 5"))
+        handler.emit(_record("message 6"))
+        assert handler._spool.replay()
+        assert handler._spool.replayed == 6
+        handler.close()
+        assert [p.message for p in server.publishes] == [
+            "message 6",
+            "message 0",
+            "message 1",
+            "message 2",
+            "message 3",
+            "message 4",
+            "message 5",
+        ]
+        assert sorted(p.name for p in Path(tmp).iterdir()) == ["spool"]
+
+
+def test_spool_crash():
+    with NtfyStubServer() as server, tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "spool"
+        # a previous run crashed while writing the third entry
+        third = _encode(_Record("test record", logging.INFO, "third"))
+        path.write_bytes(
+            _encode(_Record("test record", logging.INFO, "first"))
+            + b"0000000"
+            + _encode(_Record("test record", logging.INFO, "corrupted"))[7:]
+            + third[: len(third) // 2]
+        )
+        server.error_rate = 1.0
+        handler = ntfy.NtfyHandler(
+            "topic", url=server.url, spool=ntfy.Spool(path, interval=3600.0)
+        )
+        assert handler._spool is not None
+        handler.emit(_record("fourth"))
+        server.error_rate = 0.0
+        assert handler._spool.replay()
+        handler.close()
+        assert [p.message for p in server.publishes] == ["first", "fourth"]
+
+
+def test_spool_limits():
+    with NtfyStubServer() as server, tempfile.TemporaryDirectory() as tmp:
+        entry = len(_encode(_Record("test record", logging.INFO, "message 0")))
+        spool = ntfy.Spool(Path(tmp) / "spool", max_bytes=entry * 2, interval=3600.0)
+        handler = ntfy.NtfyHandler("topic", url=server.url, spool=spool)
+        assert handler._spool is not None
+        # rejected by the server: not spooled
+        server.fail_next(400)
+        handler.emit(_record("message 0"))
+        assert handler._spool.spooled == 0
+        server.fail_next(503, count=3)
+        for index in range(3):
+            handler.emit(_record(f"message {index}"))
+        assert handler._spool.spooled == 2
+        assert handler._spool.dropped == 1
+        # rejected while replayed: discarded
+        server.fail_next(400)
+        assert handler._spool.replay()
+        assert handler._spool.rejected == 1
+        handler.close()
+        assert [p.message for p in server.publishes] == ["message 1"]
+
+
+def test_spool_limits_replay():
+    with NtfyStubServer() as server, tempfile.TemporaryDirectory() as tmp:
+        entry = len(_encode(_Record("test record", logging.INFO, "message 0")))
+        spool = ntfy.Spool(Path(tmp) / "spool", max_bytes=entry * 2, interval=3600.0)
+        handler = ntfy.NtfyHandler("topic", url=server.url, spool=spool)
+        assert handler._spool is not None
+        server.error_rate = 1.0
+        for index in range(2):
+            handler.emit(_record(f"message {index}"))
+        # the spooled records are moved to the replay file, and still count
+        assert not handler._spool.replay()
+        handler.emit(_record("message 2"))
+        assert handler._spool.spooled == 2
+        assert handler._spool.dropped == 1
+        server.error_rate = 0.0
+        assert handler._spool.replay()
+        server.error_rate = 1.0
+        handler.emit(_record("message 3"))
+        assert handler._spool.spooled == 3
+        server.error_rate = 0.0
+        assert handler._spool.replay()
+        handler.close()
+        assert [p.message for p in server.publishes] == [
+            "message 0",
+            "message 1",
+            "message 3",
+        ]
+
+
+def test_spool_close():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "spool"
+        path.write_bytes(
+            b"".join(
+                _encode(_Record("test record", logging.INFO, f"message {index}"))
+                for index in range(100)
+            )
+        )
+        sent: typing.List[str] = []
+
+        def _send(record: _Record) -> None:
+            time.sleep(0.01)
+            sent.append(record.msg)
+
+        spool = ntfy.spool._SpoolFile(ntfy.Spool(path, interval=3600.0), _send)
+        time.sleep(0.1)
+        start = time.monotonic()
+        # not waiting for the whole spool to be replayed
+        spool.close()
+        assert time.monotonic() - start < 0.5
+        assert 0 < len(sent) < 100
+        # the remaining records are replayed by the next spool
+        spool = ntfy.spool._SpoolFile(ntfy.Spool(path, interval=3600.0), _send)
+        deadline = time.monotonic() + 5.0
+        while len(sent) < 100 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        spool.close()
+        assert sent == [f"message {index}" for index in range(100)]
+
+
+def test_spool_dropped(monkeypatch):
+    release = threading.Event()
+    with tempfile.TemporaryDirectory() as tmp:
+        handler = ntfy.NtfyHandler(
+            "topic",
+            queue_size=1,
+            overflow=ntfy.Overflow.drop_newest,
+            spool=ntfy.Spool(Path(tmp) / "spool", interval=3600.0),
+            dry_run=ntfy.DryRun.on,
+        )
+        started = threading.Event()
+
+        def _publish(record):
+            started.set()
+            release.wait(5.0)
+
+        monkeypatch.setattr(handler, "_publish", _publish)
+        handler.emit(_record("message 0"))
+        assert started.wait(5.0)
+        for index in range(1, 4):
+            handler.emit(_record(f"message {index}"))
+        release.set()
+        handler.close()
+        assert handler._spool is not None
+        # one record being pushed, one queued, two dropped
+        assert handler._spool.spooled == 2
+
+
+def test_metrics():
+    events: typing.List[typing.Tuple[str, str, ntfy.Priority, float]] = []
+    metrics = ntfy.Metrics(callback=lambda *event: events.append(event))
+    high = ntfy.Priority.HIGH
+    with NtfyStubServer() as server:
+        ntfy.push("topic1", "title", message="message", url=server.url, metrics=metrics)
+        server.fail_next(400)
+        with pytest.raises(NtfyError):
+            ntfy.push(
+                "topic2",
+                "title",
+                message="message",
+                priority=high,
+                url=server.url,
+                metrics=metrics,
+            )
+        server.fail_next(503, count=2)
+        ntfy.push(
+            "topic1",
+            "title",
+            message="message",
+            url=server.url,
+            retry=ntfy.RetryPolicy(backoff=0.01),
+            metrics=metrics,
+        )
+        server.fail_next(429, retry_after="0")
+        ntfy.push(
+            "topic2",
+            "title",
+            message="message",
+            url=server.url,
+            rate_limiter=ntfy.RateLimiter(),
+            metrics=metrics,
+        )
+    snapshot = metrics.snapshot()
+    assert snapshot.total("sent") == 3
+    assert snapshot.total("sent", topic="topic1") == 2
+    assert snapshot.total("failed") == 1
+    assert snapshot.total("failed", priority=high) == 1
+    assert snapshot.total("failed", priority=ntfy.Priority.DEFAULT) == 0
+    assert snapshot.total("retried") == 2
+    assert snapshot.total("rate_limited", topic="topic2") == 1
+    assert snapshot.counters[("sent", "topic1", "DEFAULT")] == 2
+    assert snapshot.latency.samples == 4
+    assert sum(snapshot.latency.counts) == 4
+    assert 0.0 < snapshot.latency.quantile(0.5) < float("inf")
+    assert sum(value for event, _, _, value in events if event == "sent") == 3
+    assert len([event for event in events if event[0] == "latency"]) == 4
+    metrics.reset()
+    assert metrics.snapshot().total("sent") == 0
+
+
+def test_metrics_handler(monkeypatch):
+    metrics = ntfy.Metrics()
+    release = threading.Event()
+    handler = ntfy.NtfyHandler(
+        "topic",
+        queue_size=1,
+        overflow=ntfy.Overflow.drop_newest,
+        deduplication=ntfy.Deduplication(),
+        metrics=metrics,
+        dry_run=ntfy.DryRun.on,
+    )
+    started = threading.Event()
+
+    def _publish(record):
+        started.set()
+        release.wait(5.0)
+
+    monkeypatch.setattr(handler, "_publish", _publish)
+    handler.emit(_record("message 0"))
+    assert started.wait(5.0)
+    handler.emit(_record("message 0"))
+    for index in range(1, 4):
+        handler.emit(_record(f"message {index}", logging.ERROR))
+    release.set()
+    handler.close()
+    snapshot = metrics.snapshot()
+    assert snapshot.total("deduplicated") == 1
+    assert snapshot.total("dropped", priority=ntfy.level2priority[logging.ERROR]) == 2
+    assert snapshot.queue_wait.samples == 2
+
+
+def test_profiler(caplog):
+    actions = [ntfy.ViewAction("label", "https://ntfy.sh")]
+    with NtfyStubServer() as server:
+        with ntfy.Profiler(keep=2, debug=True) as profiler:
+            with caplog.at_level(logging.DEBUG, logger="ntfy_lite.profiling"):
+                for _ in range(3):
+                    ntfy.push(
+                        "topic",
+                        "title",
+                        message="message",
+                        click="https://ntfy.sh",
+                        actions=actions,
+                        url=server.url,
+                    )
+            handler = ntfy.NtfyHandler("handler topic", url=server.url)
+            handler.emit(_record("message"))
+        # not active anymore
+        ntfy.push("topic", "title", message="message", url=server.url)
+        handler.emit(_record("message"))
+    stats = profiler.stats()
+    assert stats["push"].calls == 3
+    assert stats["emit"].calls == 1
+    # the push of the handler is part of the emit call
+    # (and its headers are built when the handler is created)
+    expected = {"validate": 3, "headers": 3, "actions": 3, "data": 4, "network": 4}
+    expected["handler"] = 1
+    for stage in ntfy.profiling.STAGES:
+        assert stats[stage].calls == expected[stage], stage
+        assert 0 <= stats[stage].max <= stats[stage].total
+    slowest = profiler.slowest()
+    assert len(slowest) == 2
+    assert slowest[0].duration >= slowest[1].duration
+    assert set(slowest[0].stages) <= set(ntfy.profiling.STAGES)
+    assert caplog.records and "network" in caplog.records[0].getMessage()
+    profiler.reset()
+    assert profiler.stats() == {}
+
+
+def test_notification_template():
+    action = ntfy.HttpAction("label", "https://ntfy.sh", headers={"key": "value"})
+    with NtfyStubServer() as server:
+        template = ntfy.NotificationTemplate(
+            "topic",
+            priority=ntfy.Priority.HIGH,
+            tags=["tag1", "tag2"],
+            click="https://ntfy.sh",
+            actions=[action],
+            url=server.url,
+        )
+        template.send("title1", "message1")
+        template.send("title2", "message2")
+        publishes = server.publishes
+    assert [p.message for p in publishes] == ["message1", "message2"]
+    assert [p.headers["Title"] for p in publishes] == ["title1", "title2"]
+    for publish in publishes:
+        assert publish.topic == "topic"
+        assert publish.headers["Priority"] == "4"
+        assert publish.headers["Tags"] == "tag1,tag2"
+        assert publish.headers["Actions"] == str(action)
+    assert "Title" not in template.headers
+    with pytest.raises(AttributeError):
+        template.topic = "other topic"  # type: ignore
+    with pytest.raises(ValueError):
+        ntfy.NotificationTemplate("topic", icon="no url")
+
+
+def test_action_str():
+    action = ntfy.Action("broadcast", "label", "https://ntfy.sh", clear=True)
+    assert str(action) == "broadcast, label=label, url=https://ntfy.sh, clear=true"
+
+
+def test_action_serialization_cache():
+    action = ntfy.ViewAction("label", "https://ntfy.sh")
+    serialized = str(action)
+    assert str(action) is serialized
+    action.label = "other label"
+    assert str(action) == serialized.replace("=label", "=other label")
+    with pytest.raises(AttributeError):
+        action.unknown = True  # type: ignore
+
+
+def test_message_size():
+    size = ntfy.MessageSize(max_bytes=100, marker="[...]")
+    attach = ntfy.MessageSize(
+        max_bytes=100,
+        oversize=ntfy.Oversize.attach,
+        marker="[...]",
+        max_attachment_bytes=1000,
+    )
+    with NtfyStubServer() as server:
+        ntfy.push("topic", "title", message="a" * 100, url=server.url, size=size)
+        ntfy.push("topic", "title", message="a" * 10**6, url=server.url, size=size)
+        ntfy.push("topic", "title", message="✓" * 200, url=server.url, size=attach)
+        ntfy.push("topic", "title", message="✓" * 10**6, url=server.url, size=attach)
+        handler = ntfy.NtfyHandler("topic", url=server.url, size=size)
+        handler.emit(_record("b" * 1000))
+        publishes = server.publishes
+    assert publishes[0].body == b"a" * 100
+    assert publishes[1].body == b"a" * 95 + b"[...]"
+    assert "Filename" not in publishes[1].headers
+    assert publishes[2].body == ("✓" * 200).encode("utf-8")
+    assert publishes[2].headers["Filename"] == "message.txt"
+    # not truncated within a character (3 bytes)
+    assert publishes[3].body == ("✓" * 331).encode("utf-8") + b"[...]"
+    assert publishes[4].body == b"b" * 95 + b"[...]"
+    with pytest.raises(ValueError):
+        ntfy.MessageSize(max_bytes=5, marker="[...]")
+
+
+def test_handler_throttling(monkeypatch):
+    client, sent = _capturing_client(monkeypatch)
+    metrics = ntfy.Metrics()
+    handler = ntfy.NtfyHandler(
+        "ntfy_lite_test",
+        client=client,
+        metrics=metrics,
+        throttling=ntfy.Throttling(
+            limits={"app.db": (2, 0.2), "": (1000, 60.0)},
+            sampling={logging.DEBUG: 0.0, logging.WARNING: 0.5, logging.ERROR: 1.0},
+            seed=0,
+        ),
+    )
+
+    def _emit(name, message, level=logging.ERROR):
+        handler.emit(logging.LogRecord(name, level, "", -1, message, None, None))
+
+    for index in range(5):
+        _emit("app.db.pool", f"db {index}")
+        _emit("app.dbx", f"dbx {index}")
+    assert [data for _, data in sent] == ["db 0", "dbx 0", "db 1"] + [
+        f"dbx {index}" for index in range(1, 5)
+    ]
+    time.sleep(0.25)
+    _emit("app.db", "db again")
+    assert sent[-1][1] == "db again"
+    sent.clear()
+    for index in range(200):
+        _emit("sampled", f"info {index}", logging.INFO)
+        _emit("sampled", f"warning {index}", logging.WARNING)
+    assert not any(data.startswith("info") for _, data in sent)
+    assert 50 < len(sent) < 150
+    stats = handler.throttling_stats()
+    assert stats.limited == {"app.db": 3}
+    assert stats.sampled[logging.INFO] == 200
+    assert sum(stats.sampled.values()) == 400 - len(sent)
+    assert metrics.snapshot().total("throttled") == 403 - len(sent)
+    with pytest.raises(ValueError):
+        ntfy.Throttling(sampling={logging.INFO: 2.0})
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_handler_throttling_deduplication(monkeypatch, shared):
+    client, sent = _capturing_client(monkeypatch)
+    with tempfile.TemporaryDirectory() as tmp:
+        handler = ntfy.NtfyHandler(
+            "ntfy_lite_test",
+            client=client,
+            deduplication=ntfy.Deduplication(
+                ttl=60.0, path=Path(tmp) / "dedup" if shared else None
+            ),
+            throttling=ntfy.Throttling(limits={"": (1, 0.2)}),
+        )
+        handler.emit(_record("message a"))
+        handler.emit(_record("message b"))
+        time.sleep(0.25)
+        # message b was throttled (not pushed): its duplicate is not suppressed
+        handler.emit(_record("message b"))
+        handler.close()
+    assert [data for _, data in sent] == ["message a", "message b"]
+
+
+def test_handler_formatting(monkeypatch):
+    client, sent = _capturing_client(monkeypatch)
+    handler = ntfy.NtfyHandler(
+        "ntfy_lite_test",
+        client=client,
+        deduplication=ntfy.Deduplication(ttl=60.0),
+    )
+    formatted: typing.List[str] = []
+
+    class _Formatter(logging.Formatter):
+        def format(self, record):
+            formatted.append(record.getMessage())
+            return super().format(record)
+
+    handler.setFormatter(_Formatter("[%(levelname)s] %(message)s"))
+    for index in range(3):
+        handler.emit(
+            logging.LogRecord("test", logging.INFO, "", -1, "value %d", (index,), None)
+        )
+    try:
+        raise RuntimeError("failure")
+    except RuntimeError:
+        handler.emit(
+            logging.LogRecord(
+                "test", logging.ERROR, "", -1, "error", None, sys.exc_info()
+            )
+        )
+    # duplicates (same template) are not formatted
+    assert formatted == ["value 0", "error"]
+    assert sent[0][1] == "[INFO] value 0"
+    assert sent[1][1].startswith("[ERROR] error\nTraceback")
+    assert "RuntimeError: failure" in sent[1][1]
+
+
+def _log_shared_dedup(url, path, barrier):
+    handler = ntfy.NtfyHandler(
+        "topic", url=url, deduplication=ntfy.Deduplication(path=path)
+    )
+    barrier.wait()
+    for _ in range(10):
+        handler.emit(_record("dependency down", logging.ERROR))
+    handler.close()
+
+
+@pytest.mark.parametrize("method", ["fork", "spawn"])
+def test_shared_deduplication(method):
+    if method not in multiprocessing.get_all_start_methods():
+        pytest.skip(f"{method} not supported")
+    context = multiprocessing.get_context(method)
+    with tempfile.TemporaryDirectory() as tmp, NtfyStubServer() as server:
+        path = Path(tmp) / "dedup"
+        barrier = context.Barrier(4)
+        processes = [
+            context.Process(target=_log_shared_dedup, args=(server.url, path, barrier))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            assert process.exitcode == 0
+        # one notification for all the processes
+        assert [p.message for p in server.publishes] == ["dependency down"]
+        handler = ntfy.NtfyHandler(
+            "topic",
+            url=server.url,
+            deduplication=ntfy.Deduplication(ttl=0.2, path=path),
+        )
+        assert handler._dedup is not None
+        assert len(handler._dedup) == 1
+        handler.emit(_record("dependency down", logging.ERROR))
+        handler.emit(_record("other message", logging.ERROR))
+        assert len(server.publishes) == 2
+        # (the ttl of the entry created by the other processes is 60 seconds)
+        handler.emit(_record("other message", logging.ERROR))
+        time.sleep(0.25)
+        handler.emit(_record("other message", logging.ERROR))
+        assert server.publishes[-1].message == (
+            "other message\n(1 similar records suppressed)"
+        )
+        handler.close()
+        with pytest.raises(ValueError):
+            ntfy.NtfyHandler(
+                "topic", deduplication=ntfy.Deduplication(max_size=10, path=path)
+            )
+
+
+def test_shared_deduplication_invalid_expiry():
+    # the expiries are not monotonic times, which restart after a reboot
+    # (e.g. an entry written 60 seconds after the previous boot would
+    # suppress its duplicates until 60 seconds after the next boot)
+    with tempfile.TemporaryDirectory() as tmp:
+        deduplication = ntfy.Deduplication(ttl=60.0, path=Path(tmp) / "dedup")
+        cache = ntfy.dedup._SharedDedupCache(deduplication)
+        assert cache.check("name", logging.ERROR, "message") == 0
+        assert cache.check("name", logging.ERROR, "message") is None
+        key = ntfy.dedup._stable_fingerprint("name", logging.ERROR, "message")
+        offset = ntfy.dedup._HEADER.size + (key % cache._buckets) * 96
+        found, slot, _, suppressed = cache._lookup(key, offset)
+        assert found
+        ntfy.dedup._SLOT.pack_into(cache._map, slot, key, time.monotonic() + 60.0, 1)
+        assert len(cache) == 0
+        assert cache.check("name", logging.ERROR, "message") == 1
+        cache.close()
+
+
+def test_subscribe():
+    with NtfyStubServer() as server:
+        ntfy.push("topic1", "title", message="before", url=server.url)
+        received: typing.List[ntfy.ReceivedMessage] = []
+
+        def _subscribe():
+            for message in ntfy.subscribe(
+                ["topic1", "topic2"], since="all", url=server.url, reconnect_delay=0.05
+            ):
+                received.append(message)
+                if len(received) == 4:
+                    return
+
+        thread = threading.Thread(target=_subscribe, daemon=True)
+        thread.start()
+        ntfy.push(
+            "topic2",
+            "title",
+            message="second",
+            priority=ntfy.Priority.HIGH,
+            tags=["tag1", "tag2"],
+            url=server.url,
+        )
+        ntfy.push("topic3", "title", message="not subscribed", url=server.url)
+        for _ in range(100):
+            if len(received) == 2:
+                break
+            time.sleep(0.01)
+        # the messages published while reconnecting are not missed
+        server.disconnect_subscribers()
+        ntfy.push("topic1", "title", message="third", url=server.url)
+        ntfy.push("topic1", "title", message="fourth", url=server.url)
+        thread.join(5.0)
+        assert not thread.is_alive()
+    assert [m.message for m in received] == ["before", "second", "third", "fourth"]
+    assert received[1].topic == "topic2"
+    assert received[1].title == "title"
+    assert received[1].priority == ntfy.Priority.HIGH
+    assert received[1].tags == ("tag1", "tag2")
+    assert len({m.id for m in received}) == 4
+
+
+def test_subscribe_stub_server_clear():
+    with NtfyStubServer(max_stored=2) as server:
+        ntfy.push("topic", "title", message="first", url=server.url)
+        messages = ntfy.subscribe("topic", since="all", url=server.url)
+        assert next(messages).message == "first"
+        server.clear()
+        for index in range(2):
+            ntfy.push("topic", "title", message=f"after clear {index}", url=server.url)
+        assert next(messages).message == "after clear 0"
+        assert next(messages).message == "after clear 1"
+        messages.close()
+
+
+def test_subscribe_errors():
+    with NtfyStubServer() as server:
+        server.fail_next(403)
+        with pytest.raises(NtfyError):
+            next(ntfy.subscribe("topic", url=server.url))
+
+
+def test_subscribe_lines():
+    subscription = ntfy.subscription._Subscription(
+        "topic", None, "https://ntfy.sh", 1.0, 60.0, max_line_bytes=100
+    )
+    event = b'{"id": "%d", "time": 1, "event": "message", "message": "%s"}\n'
+    stream = event % (1, b"a") + event % (2, b"b" * 200) + event % (3, b"c")
+    messages = [
+        message
+        for start in range(0, len(stream), 7)
+        for message in subscription.feed(stream[start : start + 7])
+    ]
+    # the line longer than max_line_bytes is skipped
+    assert [m.message for m in messages] == ["a", "c"]
+    assert subscription.since == "3"
+    assert len(subscription._buffer) == 0
+
+
+def test_received_message_event():
+    message = ntfy.ReceivedMessage("id", 1, "topic", "message")
+    assert message.event == {}
+    # the default event is shared by the messages: read only
+    with pytest.raises(TypeError):
+        message.event["click"] = "https://ntfy.sh"  # type: ignore
+    assert ntfy.ReceivedMessage("id", 1, "topic", "message").event == {}
+
+
+def test_async_subscribe():
+    pytest.importorskip("aiohttp")
+
+    async def _run(url):
+        received = []
+        async for message in ntfy.async_subscribe(
+            "topic", since="all", url=url, reconnect_delay=0.05
+        ):
+            received.append(message.message)
+            if len(received) == 2:
+                return received
+
+    with NtfyStubServer() as server:
+        for index in range(2):
+            ntfy.push("topic", "title", message=f"message {index}", url=server.url)
+        server.fail_next(502)
+        received = asyncio.run(asyncio.wait_for(_run(server.url), 5.0))
+    assert received == ["message 0", "message 1"]